@@ -140,7 +140,7 @@ def run_evaluation(
     
     # Setup checkpoint manager
     checkpoint_dir = output_dir / "checkpoints"
-    checkpoint_mgr = CheckpointManager(checkpoint_dir)
+    checkpoint_mgr = CheckpointManager(checkpoint_dir, background=True)
     evaluation_id = f"{model_safe_name}-{timestamp}"
     
     # Generate evaluation hash for verification
@@ -403,6 +403,7 @@ def run_evaluation(
                 results=results_dict,
                 metadata=eval_config
             )
+            checkpoint_mgr.flush()
             logger.info("Partial checkpoint created")
         raise
     
@@ -570,6 +571,9 @@ def run_evaluation(
     with open(eval_file, 'w') as f:
         json.dump(evaluation, f, indent=2)
     
+    # Checkpoint files are written in the background; make sure they are on disk
+    checkpoint_mgr.close()
+    
     # Print results
     print_results(evaluation)
     print(f"\n💾 Legacy results saved to: {eval_file}")
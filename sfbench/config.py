@@ -31,6 +31,9 @@ class Config:
     DEFAULT_POOL_CONNECTIONS = 10
     DEFAULT_POOL_MAXSIZE = 20
     
+    # Default clone settings
+    DEFAULT_CLONE_DEPTH = 1
+    
     def __init__(self, config_file: Optional[Path] = None):
         """
         Initialize configuration.
@@ -140,6 +143,13 @@ class Config:
         """Maximum size of connection pool."""
         return self.get('pool_maxsize', self.DEFAULT_POOL_MAXSIZE)
     
+    @property
+    def clone_depth(self) -> int:
+        """History depth for shallow, blobless repository clones (0 = full clone)."""
+        if self.get('clone_full', False):
+            return 0
+        return self.get('clone_depth', self.DEFAULT_CLONE_DEPTH)
+    
     @property
     def deterministic_mode(self) -> bool:
         """Whether to run in deterministic mode (temperature=0, fixed seed)."""
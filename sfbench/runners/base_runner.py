@@ -5,7 +5,7 @@ import time
 
 from sfbench import Task
 from sfbench.utils.scoring import TestResult, TestStatus
-from sfbench.utils.git import clone_repository, checkout_commit, apply_patch, PatchApplicationError
+from sfbench.utils.git import clone_repository, checkout_commit, reset_repository, apply_patch, GitError, PatchApplicationError
 from sfbench.utils.sfdx import PlatformLimitationError
 from sfbench.utils.retry import retry_with_backoff
 
@@ -109,8 +109,9 @@ class BenchmarkRunner(ABC):
         if not has_diff_markers:
             logger.warning(f"Patch for {self.task.instance_id} may not contain valid diff markers")
         
-        # Apply patch with retry logic for transient failures
-        @retry_with_backoff(max_retries=3, initial_delay=1.0, retry_on=(Exception,))
+        # Apply patch with retry logic for transient failures; a patch every
+        # strategy rejected fails the same way again, so it is not retried
+        @retry_with_backoff(max_retries=3, initial_delay=1.0, retry_on=(Exception,), give_up_on=(PatchApplicationError,))
         def _apply_patch_with_retry():
             try:
                 apply_patch(self.repo_dir, patch_diff, timeout=60)
@@ -145,7 +146,7 @@ class BenchmarkRunner(ABC):
                     f"   Root Cause: AI model generated a corrupt, incomplete, or malformed patch.\n"
                     f"   Error: {error_msg[:500]}\n"
                     f"   Patch Size: {len(patch_diff)} chars, {len(patch_diff.splitlines())} lines\n"
-                    f"   All 4 patch application strategies were attempted.\n"
+                    f"   Every applicable patch application strategy was attempted.\n"
                     f"   Patch validation and cleaning were performed, but patch structure is fundamentally invalid.\n"
                     f"   This is NOT a tool issue - the benchmark correctly identified an invalid patch from the AI model."
                 )
@@ -178,6 +179,20 @@ class BenchmarkRunner(ABC):
         pass
     
     def _clone_and_checkout(self) -> None:
+        # Reuse a clone left by an earlier run of this task instead of downloading it again
+        if (self.repo_dir / ".git").is_dir():
+            try:
+                reset_repository(
+                    self.repo_dir,
+                    self.task.base_commit,
+                    repo_url=self.task.repo_url,
+                    timeout=self.task.timeouts.setup
+                )
+                return
+            except GitError as e:
+                import logging
+                logger = logging.getLogger(__name__)
+                logger.info(f"Re-cloning {self.task.instance_id}: {e}")
         clone_repository(
             self.task.repo_url,
             self.repo_dir,
@@ -8,23 +8,130 @@ Supports multiple AI providers including:
 - Hugging Face
 - Local models (Ollama, etc.)
 """
-import json
+import asyncio
+import concurrent.futures
+import gzip
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import logging
 import os
+import re
+import threading
 import time
-from typing import Optional, Dict, Any, List, Callable, TypeVar
+import weakref
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Callable, Iterator, TypeVar, Union
 from pathlib import Path
 from functools import wraps
+from urllib.parse import urlsplit
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from sfbench.config import get_config
+from sfbench.utils import json_utils
+from sfbench.utils.response_cache import ResponseCache, make_cache_key
+from sfbench.utils.rate_limiter import TokenBucket
+from sfbench.utils.retry import CircuitBreaker
+from sfbench.utils.semantic_cache import SemanticCache
+from sfbench.utils.token_budget import allocate_budget, count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
 
 
+# HTTP statuses worth retrying elsewhere (rate limits, server errors); 4xx client
+# errors such as 400/401 will fail the same way on every provider
+RETRYABLE_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+# First line of a diff: a git header, a hunk header, or a ---/+++ file header pair
+_DIFF_START_RE = re.compile(r"^(?:diff --git|@@.* @@|--- [^\n]*\n\+\+\+)", re.MULTILINE)
+
+
+# backoff_jitter arrived in urllib3 2.0; requests still allows 1.26
+_RETRY_SUPPORTS_JITTER = "backoff_jitter" in inspect.signature(Retry.__init__).parameters
+
+
+def _build_session() -> requests.Session:
+    """Create a keep-alive session with pooled connections and transient-error retries."""
+    config = get_config()
+    session = requests.Session()
+    # Configure retry strategy: transient 429/5xx are retried with jittered
+    # exponential backoff, honouring Retry-After when the server sends it.
+    # Jitter keeps parallel agents from retrying a rate limit in lockstep.
+    retry_kwargs: Dict[str, Any] = {}
+    if _RETRY_SUPPORTS_JITTER:
+        retry_kwargs["backoff_jitter"] = 1.0
+    retry_strategy = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=RETRYABLE_STATUS_CODES,
+        allowed_methods=frozenset(["POST", "GET"]),
+        respect_retry_after_header=True,
+        **retry_kwargs
+    )
+    # Configure HTTP adapter with connection pooling
+    adapter = HTTPAdapter(
+        pool_connections=config.pool_connections,
+        pool_maxsize=config.pool_maxsize,
+        max_retries=retry_strategy
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _close_session(session: Optional[requests.Session]) -> None:
+    """Close a session, ignoring errors during cleanup."""
+    if session is None:
+        return
+    try:
+        session.close()
+    except Exception:
+        pass
+
+
+_shared_session: Optional[requests.Session] = None
+_shared_session_lock = threading.Lock()
+
+
+def _get_shared_session() -> requests.Session:
+    """Process-wide pooled session for module-level helpers without an agent."""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            _shared_session = _build_session()
+        return _shared_session
+
+
 class AIAgentError(Exception):
-    """Base exception for AI agent errors."""
-    pass
+    """
+    Base exception for AI agent errors.
+    
+    Attributes:
+        status_code: HTTP status returned by the provider, if any
+        retryable: Whether the failure is transient (rate limit, server error,
+            timeout, connection failure) and another attempt or provider may succeed
+    """
+    
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: Optional[bool] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        if retryable is None:
+            retryable = status_code in RETRYABLE_STATUS_CODES
+        self.retryable = retryable
+
+
+def _is_transient_error(error: Exception) -> bool:
+    """Whether an HTTP client exception is a timeout or connection failure."""
+    return isinstance(error, (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.RetryError,
+    ))
 
 
 class AIAgent:
@@ -34,15 +141,129 @@ class AIAgent:
     Supports multiple providers for flexibility in model testing.
     """
     
+    # Tokens of file content included in a prompt, shared across all files
+    DEFAULT_FILE_TOKEN_BUDGET = 12000
+    
+    # Sampling temperature unless the task context overrides it
+    DEFAULT_TEMPERATURE = 0.1
+    
+    # System prompt sent with every request
+    SYSTEM_PROMPT = """You are an expert Salesforce developer. Generate solutions as unified diff patches.
+
+OUTPUT FORMAT - Follow this EXACT structure:
+
+diff --git a/force-app/main/default/classes/Example.cls b/force-app/main/default/classes/Example.cls
+--- a/force-app/main/default/classes/Example.cls
++++ b/force-app/main/default/classes/Example.cls
+@@ -1,6 +1,8 @@
+ public class Example {
+     public void existingMethod() {
+         System.debug('existing');
+     }
++
++    public void newMethod() {
++        System.debug('new code');
++    }
+ }
+
+CRITICAL RULES:
+1. Output ONLY the raw patch - NO markdown fences, NO explanations
+2. First line MUST be: diff --git a/path b/path
+3. Then: --- a/path (original file)
+4. Then: +++ b/path (modified file)
+5. Then: @@ -startline,count +startline,count @@ (hunk header)
+6. Context lines (unchanged) start with a SPACE character
+7. Added lines start with + (no space after +)
+8. Removed lines start with - (no space after -)
+9. Include 3 lines of context before and after changes
+10. The patch MUST apply cleanly with 'git apply'"""
+    
+    # Closing instruction appended to every prompt
+    PROMPT_FOOTER = (
+        "\nGenerate a COMPLETE unified diff patch that solves this task. "
+        "The patch MUST be in standard git diff format and ready to apply with 'git apply'. "
+        "Include ALL file changes needed. Do not truncate."
+    )
+    
+    # Generator method used for each provider, resolved once per agent
+    _GENERATORS = {
+        "openai": "_generate_openai",
+        "anthropic": "_generate_anthropic",
+        "gemini": "_generate_gemini",
+        "google": "_generate_gemini",
+        "openrouter": "_generate_openrouter",
+        "routellm": "_generate_routellm",
+        "huggingface": "_generate_huggingface",
+        "ollama": "_generate_ollama",
+        "local": "_generate_local",
+    }
+    
     # Supported providers
-    PROVIDERS = ["openai", "anthropic", "gemini", "google", "openrouter", "routellm", "huggingface", "local", "ollama"]
+    PROVIDERS = frozenset(_GENERATORS)
+    
+    # Environment variables holding each provider's API key, in priority order
+    _API_KEY_ENV = {
+        "openai": ("OPENAI_API_KEY",),
+        "anthropic": ("ANTHROPIC_API_KEY",),
+        "gemini": ("GOOGLE_API_KEY", "GEMINI_API_KEY"),
+        "google": ("GOOGLE_API_KEY", "GEMINI_API_KEY"),
+        "openrouter": ("OPENROUTER_API_KEY",),
+        "routellm": ("ROUTELLM_API_KEY",),
+        "huggingface": ("HUGGINGFACE_API_KEY",),
+    }
+    
+    # Error bodies are parsed for a message only below this size, and raw
+    # text is truncated to keep huge proxy error pages out of logs
+    _MAX_ERROR_BODY = 65536
+    _MAX_ERROR_TEXT = 1000
+    
+    # Providers whose HTTP APIs can stream the response as it is generated
+    _STREAMERS = {
+        "openrouter": "_stream_openrouter",
+        "routellm": "_stream_routellm",
+        "ollama": "_stream_ollama",
+    }
+    
+    # Maximum in-flight calls per agent; local servers serve one GPU
+    DEFAULT_MAX_CONCURRENCY = 16
+    _MAX_CONCURRENCY = {"ollama": 2, "local": 1}
+    
+    # Providers whose endpoints accept gzip-compressed request bodies, and the
+    # body size above which compressing is worth the CPU
+    _GZIP_PROVIDERS = frozenset(["openrouter", "routellm"])
+    GZIP_MIN_BYTES = 4096
+    
+    # Providers that get a pooled keep-alive HTTP session
+    _HTTP_PROVIDERS = frozenset(["openrouter", "routellm", "openai", "anthropic", "ollama", "huggingface"])
+    
+    # Circuit breakers shared by all agents hitting the same endpoint
+    _BREAKERS: Dict[str, CircuitBreaker] = {}
+    
+    # Rate limiters shared by all agents using the same provider account
+    _RATE_LIMITERS: Dict[str, TokenBucket] = {}
+    
+    # SDK clients shared process-wide per (provider, API key[, model]);
+    # OpenAI/Anthropic clients own an HTTP connection pool worth reusing
+    _CLIENTS: Dict[str, Any] = {}
+    _CLIENTS_LOCK = threading.Lock()
+    
+    # Optional SDK module required by each SDK-backed provider
+    _SDK_MODULES = {
+        "openai": "openai",
+        "anthropic": "anthropic",
+        "gemini": "google.generativeai",
+        "google": "google.generativeai",
+    }
     
     def __init__(
         self, 
         provider: str = "openai", 
         model: str = "gpt-3.5-turbo", 
         api_key: Optional[str] = None,
-        base_url: Optional[str] = None
+        base_url: Optional[str] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        prewarm: bool = False,
+        response_cache: Optional[ResponseCache] = None
     ):
         """
         Initialize AI agent.
@@ -52,52 +273,223 @@ class AIAgent:
             model: Model name/identifier
             api_key: API key (if required)
             base_url: Custom base URL (for OpenRouter or self-hosted)
+            semantic_cache: Optional cache returning stored solutions for near-duplicate tasks
+            prewarm: Open the provider connection now instead of on the first call
+            response_cache: Optional exact-match cache of responses (default: a disk
+                cache in SF_BENCH_LLM_CACHE_DIR if that is set)
         """
         self.provider = provider.lower()
+        if self.provider not in self.PROVIDERS:
+            raise AIAgentError(f"Unsupported provider: {self.provider}. Supported: {sorted(self.PROVIDERS)}")
+        config = get_config()
         self.model = model
         self.base_url = base_url
+        self.semantic_cache = semantic_cache
+        self._file_token_budget = config.get('prompt_file_token_budget', self.DEFAULT_FILE_TOKEN_BUDGET)
+        if response_cache is None:
+            cache_dir = config.get('llm_cache_dir')
+            if cache_dir:
+                response_cache = ResponseCache(
+                    Path(cache_dir),
+                    max_entries=config.get('llm_cache_max_entries', 0) or None,
+                    ttl=config.get('llm_cache_ttl', 0.0) or None
+                )
+        self.response_cache = response_cache
         
-        # Resolve API key based on provider
-        if api_key:
-            self.api_key = api_key
-        elif self.provider in ["gemini", "google"]:
-            self.api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-        elif self.provider == "openrouter":
-            self.api_key = os.getenv("OPENROUTER_API_KEY")
-        elif self.provider == "routellm":
-            self.api_key = os.getenv("ROUTELLM_API_KEY")
-        elif self.provider == "ollama":
-            self.api_key = None  # Ollama doesn't need API key
-        else:
-            self.api_key = os.getenv(f"{provider.upper()}_API_KEY")
+        # In-flight bound, shared by the worker threads of agenerate_solution
+        # and generate_solutions_batch
+        max_concurrency = config.get(
+            'max_concurrency',
+            self._MAX_CONCURRENCY.get(self.provider, self.DEFAULT_MAX_CONCURRENCY)
+        )
+        self._concurrency = threading.BoundedSemaphore(max_concurrency)
+        
+        self._compress_requests = (
+            self.provider in self._GZIP_PROVIDERS and config.get('compress_requests', True)
+        )
+        
+        # Identical requests currently in flight, keyed like the response cache
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Resolve API key based on provider (first variable that is set wins)
+        self.api_key = api_key or next(
+            (os.environ[name] for name in self._API_KEY_ENV.get(self.provider, ()) if os.environ.get(name)),
+            None
+        )
         
         # Create session with connection pooling for HTTP-based providers
         # This improves performance by reusing connections across multiple API calls
-        if self.provider in ["openrouter", "routellm", "openai", "anthropic"]:
-            self.session = requests.Session()
-            # Configure retry strategy
-            retry_strategy = Retry(
-                total=3,
-                backoff_factor=1,
-                status_forcelist=[429, 500, 502, 503, 504],
-                allowed_methods=["POST"]
-            )
-            # Configure HTTP adapter with connection pooling
-            adapter = HTTPAdapter(
-                pool_connections=10,
-                pool_maxsize=20,
-                max_retries=retry_strategy
-            )
-            self.session.mount('https://', adapter)
-            self.session.mount('http://', adapter)
+        if self.provider in self._HTTP_PROVIDERS:
+            self.session = _build_session()
         else:
             self.session = None
+        # Close the pool when the agent is garbage collected or at interpreter
+        # exit; unlike __del__ this never runs on a half torn-down module
+        self._finalizer = weakref.finalize(self, _close_session, self.session)
+        
+        # Resolve the generator, SDK and client once so misconfiguration surfaces
+        # here instead of on the first generate_solution call
+        self._generate = getattr(self, self._GENERATORS[self.provider])
+        self._sdk = self._import_sdk()
+        self._client = self._build_client()
+        
+        self.capabilities = set()
+        if self._sdk is not None:
+            self.capabilities.add("sdk")
+        if self._client is not None:
+            self.capabilities.add("client")
+        if self.api_key:
+            self.capabilities.add("api_key")
+        if self.session is not None:
+            self.capabilities.add("session")
+        
+        # Providers that would silently fall back to the local template are
+        # switched over here, once, instead of on every call
+        self.ready = self._check_ready()
+        if not self.ready and self._falls_back_to_local():
+            logger.warning(
+                f"{self.provider} is not available (missing API key or SDK); "
+                f"using the local solution template"
+            )
+            self._generate = self._generate_local
+        
+        # One breaker per endpoint, shared by every agent pointing at it
+        breaker_key = f"{self.provider}|{self.base_url or ''}"
+        self._breaker = self._BREAKERS.setdefault(breaker_key, CircuitBreaker(
+            failure_threshold=config.get('circuit_breaker_threshold', 5),
+            reset_timeout=config.get('circuit_breaker_timeout', 30.0)
+        ))
+        
+        # One rate limit per account: every agent using the same provider and
+        # key draws from the same calls/minute quota
+        key_digest = hashlib.sha256((self.api_key or "").encode('utf-8')).hexdigest()[:16]
+        self._rate_limiter = self._RATE_LIMITERS.setdefault(f"{self.provider}|{key_digest}", TokenBucket.per_minute(
+            config.get('calls_per_minute', 60),
+            burst=config.get('rate_limit_burst', 1)
+        ))
+        
+        if prewarm:
+            self.prewarm()
+    
+    def _prewarm_url(self) -> Optional[str]:
+        """Cheap URL on the same host as the provider's generation endpoint."""
+        if self.provider == "ollama":
+            return f"{self.base_url or 'http://localhost:11434'}/api/tags"
+        defaults = {
+            "openrouter": "https://openrouter.ai/api/v1/models",
+            "routellm": "https://routellm.abacus.ai/v1/models",
+            "huggingface": "https://api-inference.huggingface.co",
+        }
+        if self.provider not in defaults:
+            return None  # SDK clients manage their own connections
+        if self.base_url:
+            parts = urlsplit(self.base_url)
+            return f"{parts.scheme}://{parts.netloc}/"
+        return defaults[self.provider]
+    
+    def prewarm(self) -> None:
+        """
+        Establish the pooled TCP/TLS connection to the provider ahead of time.
         
+        Issues a HEAD request through the agent's session so the first real
+        generation reuses a warm keep-alive connection. Failures are ignored;
+        the next real request simply opens the connection itself.
+        """
+        url = self._prewarm_url()
+        if self.session is None or url is None:
+            return
+        try:
+            self.session.head(url, timeout=5)
+        except Exception as e:
+            logger.debug(f"Connection prewarm to {url} failed: {e}")
+    
+    def _import_sdk(self) -> Optional[Any]:
+        """Import the provider SDK once, returning None if it is not installed."""
+        module_name = self._SDK_MODULES.get(self.provider)
+        if module_name is None:
+            return None
+        try:
+            return importlib.import_module(module_name)
+        except ImportError:
+            return None
+    
+    def _build_client(self) -> Optional[Any]:
+        """Construct the SDK client reused by every call, if the provider has one."""
+        if self._sdk is None or not self.api_key:
+            return None
+        key_digest = hashlib.sha256(self.api_key.encode('utf-8')).hexdigest()[:16]
+        client_key = f"{self.provider}|{key_digest}"
+        if self.provider in ["gemini", "google"]:
+            # Gemini models are per model name; configure() sets the key globally
+            client_key = f"gemini|{key_digest}|{self._gemini_model_name()}"
+        with self._CLIENTS_LOCK:
+            client = self._CLIENTS.get(client_key)
+            if client is None:
+                client = self._create_sdk_client()
+                self._CLIENTS[client_key] = client
+        return client
+        
+    def _gemini_model_name(self) -> str:
+        """Gemini model name without the optional "models/" prefix."""
+        model_name = self.model if self.model else "gemini-2.5-flash"
+        if model_name.startswith("models/"):
+            model_name = model_name.replace("models/", "")
+        return model_name
+    
+    def _create_sdk_client(self) -> Any:
+        """
+        Construct the provider's SDK client, with a pool sized from config where supported.
+        
+        OpenAI/Anthropic clients multiplex concurrent requests over HTTP/2 when
+        the h2 package is installed (the 'http2' extra), avoiding head-of-line
+        blocking on a shared connection.
+        """
+        if self.provider in ["gemini", "google"]:
+            self._sdk.configure(api_key=self.api_key)
+            return self._sdk.GenerativeModel(self._gemini_model_name(), system_instruction=self.SYSTEM_PROMPT)
+        kwargs: Dict[str, Any] = {"api_key": self.api_key}
+        try:
+            import httpx  # Installed with both SDKs
+            pool_maxsize = get_config().pool_maxsize
+            kwargs["http_client"] = httpx.Client(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize)
+            )
+        except ImportError:
+            pass  # Let the SDK build its default client
+        if self.provider == "openai":
+            return self._sdk.OpenAI(**kwargs)
+        return self._sdk.Anthropic(**kwargs)
+    
+    def _is_sdk_transient_error(self, error: Exception) -> bool:
+        """Whether an OpenAI/Anthropic SDK exception is a timeout or connection failure."""
+        connection_error = getattr(self._sdk, "APIConnectionError", None)
+        return connection_error is not None and isinstance(error, connection_error)
+    
+    def _check_ready(self) -> bool:
+        """Whether the agent can reach a real model without a network probe."""
+        if self.provider in self._SDK_MODULES:
+            return self._client is not None
+        if self.provider == "local":
+            return False
+        if self.provider == "ollama":
+            return True  # No key needed; connection errors surface on the first call
+        return bool(self.api_key)
+    
+    def _falls_back_to_local(self) -> bool:
+        """Whether an unready provider degrades to the local template instead of raising."""
+        if self.provider in ["openai", "anthropic", "huggingface"]:
+            return True
+        # Gemini only raises when the SDK itself is missing
+        return self.provider in ["gemini", "google"] and self._sdk is not None
+    
     def generate_solution(
         self,
         task_description: str,
         context: Optional[Dict[str, Any]] = None,
-        files: Optional[Dict[str, str]] = None
+        files: Optional[Dict[str, str]] = None,
+        use_cache: bool = True
     ) -> str:
         """
         Generate a solution (patch/diff) for a given task.
@@ -108,91 +500,412 @@ class AIAgent:
             task_description: Description of the task/problem
             context: Additional context (task type, repo info, etc.)
             files: Relevant files with their contents
+            use_cache: Serve and store responses via the configured caches and
+                share identical in-flight calls; pass False to draw a fresh
+                sample, e.g. at high temperature
             
         Returns:
             Unified diff string (patch format)
         """
-        # Rate limiting: ensure minimum interval between calls
-        if not hasattr(self, '_last_call_time'):
-            self._last_call_time = 0.0
+        # Serve repeated and near-duplicate requests from cache before paying
+        # for rate limiting or a network call. Unready agents only produce the
+        # local template, which must never be cached under a real model.
+        if not self.ready or not use_cache:
+            with self._provider_call():
+                return self._generate(task_description, context, files)
         
-        # Get rate limit from config or use default (60 calls/minute = 1 second interval)
-        config = get_config()
-        calls_per_minute = 60  # Default
-        min_interval = 60.0 / calls_per_minute
-        
-        elapsed = time.time() - self._last_call_time
-        if elapsed < min_interval:
-            sleep_time = min_interval - elapsed
-            time.sleep(sleep_time)
-        
-        self._last_call_time = time.time()
-        
-        # Perform actual generation
-        generators = {
-            "openai": self._generate_openai,
-            "anthropic": self._generate_anthropic,
-            "gemini": self._generate_gemini,
-            "google": self._generate_gemini,
-            "openrouter": self._generate_openrouter,
-            "routellm": self._generate_routellm,
-            "huggingface": self._generate_huggingface,
-            "ollama": self._generate_ollama,
-            "local": self._generate_local,
-        }
+        prompt = self._build_prompt(task_description, context, files)
+        cache_key = make_cache_key(self.provider, self.model, self._temperature(context), self.SYSTEM_PROMPT, prompt)
+        cache_namespace = f"{self.provider}|{self.model}"
+        if self.response_cache is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        if self.semantic_cache is not None:
+            cached = self.semantic_cache.lookup(task_description, cache_namespace)
+            if cached is not None:
+                return cached
         
-        generator = generators.get(self.provider)
-        if generator:
-            return generator(task_description, context, files)
+        # Single-flight: concurrent identical requests wait on the first one
+        # instead of each paying for its own provider call
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            is_leader = future is None
+            if is_leader:
+                future = self._inflight[cache_key] = concurrent.futures.Future()
+        if not is_leader:
+            return future.result()
+        
+        try:
+            # The generator sends the prompt already built for the cache key
+            with self._provider_call():
+                result = self._generate(task_description, context, files, prompt=prompt)
+            if result:
+                if self.response_cache is not None:
+                    self.response_cache.put(cache_key, result)
+                if self.semantic_cache is not None:
+                    self.semantic_cache.add(task_description, result, cache_namespace)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
         else:
-            raise AIAgentError(f"Unsupported provider: {self.provider}. Supported: {self.PROVIDERS}")
+            future.set_result(result)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[cache_key]
+        return result
     
-    def _generate_openai(self, task_description: str, context: Optional[Dict], files: Optional[Dict]) -> str:
-        """Generate solution using OpenAI API."""
+    def generate_solution_stream(
+        self,
+        task_description: str,
+        context: Optional[Dict[str, Any]] = None,
+        files: Optional[Dict[str, str]] = None
+    ) -> Iterator[str]:
+        """
+        Generate a solution, yielding raw response text as it arrives.
+        
+        Lets callers overlap downstream work (writing, linting) with network
+        time on long responses. Chunks are the model's raw output; join them
+        and pass the text through the usual patch cleaning before applying.
+        Providers without a streaming API (and unready agents) yield the
+        complete generate_solution result as a single chunk.
+        
+        Args:
+            task_description: Description of the task/problem
+            context: Additional context (task type, repo info, etc.)
+            files: Relevant files with their contents
+            
+        Yields:
+            Response text chunks
+        """
+        streamer_name = self._STREAMERS.get(self.provider)
+        if streamer_name is None or not self.ready:
+            yield self.generate_solution(task_description, context, files)
+            return
+        
+        with self._provider_call():
+            yield from getattr(self, streamer_name)(task_description, context, files)
+    
+    def _temperature(self, context: Optional[Dict]) -> float:
+        """Sampling temperature for a call: context["temperature"] if given (deterministic mode), else the default."""
+        if context and "temperature" in context:
+            return context["temperature"]
+        return self.DEFAULT_TEMPERATURE
+    
+    @contextmanager
+    def _provider_call(self) -> Iterator[None]:
+        """
+        Guard a single provider call with the circuit breaker, rate limiter
+        and concurrency cap, recording the outcome on the breaker.
+        """
+        # Skip endpoints that have failed repeatedly until their cooldown expires,
+        # without waiting for a rate-limit slot first
+        if not self._breaker.allow():
+            raise AIAgentError(
+                f"Circuit open for {self.provider}: too many consecutive failures, "
+                f"retry after {self._breaker.reset_timeout:.0f}s",
+                retryable=True
+            )
+        
+        # Rate limiting: ensure minimum interval between calls
+        # (SF_BENCH_CALLS_PER_MINUTE, default 60 calls/minute = 1 second interval).
+        # The local template spends no provider quota.
+        if self.ready:
+            self._rate_limiter.acquire()
+        
+        # Bounded to max_concurrency calls in flight
         try:
-            import openai
+            with self._concurrency:
+                yield
+        except AIAgentError as e:
+            # Only transient failures say anything about endpoint health
+            if e.retryable:
+                self._breaker.record_failure()
+            raise
+        self._breaker.record_success()
+    
+    async def agenerate_solution(
+        self,
+        task_description: str,
+        context: Optional[Dict[str, Any]] = None,
+        files: Optional[Dict[str, str]] = None
+    ) -> str:
+        """
+        Async variant of generate_solution for concurrent task batches.
+        
+        The blocking provider call runs in a worker thread over the agent's
+        pooled session, so callers can overlap many requests with
+        ``asyncio.gather(*[agent.agenerate_solution(t) for t in tasks])``.
+        Rate limiting and the circuit breaker still apply.
+        
+        Args:
+            task_description: Description of the task/problem
+            context: Additional context (task type, repo info, etc.)
+            files: Relevant files with their contents
             
-            if not self.api_key:
-                return self._generate_local(task_description, context, files)
+        Returns:
+            Unified diff string (patch format)
+        """
+        return await asyncio.to_thread(self.generate_solution, task_description, context, files)
+    
+    async def agenerate_batch(self, tasks: List[Dict[str, Any]], concurrency: int = 16) -> List[Optional[str]]:
+        """
+        Generate solutions for many tasks concurrently from async code.
+        
+        Args:
+            tasks: Task dicts with "task_description" and optional "task_id",
+                "context" and "files" keys
+            concurrency: Maximum tasks in flight at once (default: 16)
+            
+        Returns:
+            One solution per task, in input order; None where that task failed
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run(task: Dict[str, Any]) -> Optional[str]:
+            async with semaphore:
+                try:
+                    return await self.agenerate_solution(
+                        task["task_description"], task.get("context"), task.get("files")
+                    )
+                except AIAgentError as e:
+                    logger.error(f"Failed to generate solution for {task.get('task_id', 'task')}: {e}")
+                    return None
+        
+        return await asyncio.gather(*(run(task) for task in tasks))
+    
+    def submit_batch(self, tasks: List[Dict[str, Any]]) -> str:
+        """
+        Submit many tasks to the provider's asynchronous batch API.
+        
+        OpenAI Batches and Anthropic Message Batches run at roughly half the
+        price of interactive calls and are not bound by per-request rate limits,
+        which suits fixed benchmark corpora. Results arrive within the provider's
+        batch window (up to 24 hours); collect them with poll_batch().
+        
+        Args:
+            tasks: Task dicts with "task_id", "task_description" and optional
+                "context" and "files" keys. task_id is used as the custom_id.
             
-            client = openai.OpenAI(api_key=self.api_key)
+        Returns:
+            Provider batch ID
+        """
+        if self.provider not in ["openai", "anthropic"]:
+            raise AIAgentError(f"Batch API not supported for provider: {self.provider}")
+        if self._client is None:
+            raise AIAgentError(f"{self.provider} batch API requires the SDK and an API key")
+        
+        system_prompt = self.SYSTEM_PROMPT
+        try:
+            if self.provider == "openai":
+                lines = []
+                for task in tasks:
+                    prompt = self._build_prompt(task["task_description"], task.get("context"), task.get("files"))
+                    lines.append(json_utils.dumps_bytes({
+                        "custom_id": str(task["task_id"]),
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": {
+                            "model": self.model,
+                            "messages": [
+                                {"role": "system", "content": system_prompt},
+                                {"role": "user", "content": prompt}
+                            ],
+                            "temperature": self._temperature(task.get("context")),
+                            "max_tokens": 8192
+                        }
+                    }))
+                input_file = self._client.files.create(
+                    file=("sfbench_batch.jsonl", b"\n".join(lines)),
+                    purpose="batch"
+                )
+                batch = self._client.batches.create(
+                    input_file_id=input_file.id,
+                    endpoint="/v1/chat/completions",
+                    completion_window="24h"
+                )
+            else:
+                requests_payload = []
+                for task in tasks:
+                    prompt = self._build_prompt(task["task_description"], task.get("context"), task.get("files"))
+                    requests_payload.append({
+                        "custom_id": str(task["task_id"]),
+                        "params": {
+                            "model": self.model,
+                            "max_tokens": 8192,
+                            "temperature": self._temperature(task.get("context")),
+                            "system": system_prompt,
+                            "messages": [{"role": "user", "content": prompt}]
+                        }
+                    })
+                batch = self._client.messages.batches.create(requests=requests_payload)
+        except Exception as e:
+            raise AIAgentError(f"{self.provider} batch submission failed: {str(e)}")
+        
+        logger.info(f"Submitted {len(tasks)} tasks as {self.provider} batch {batch.id}")
+        return batch.id
+    
+    def poll_batch(self, batch_id: str) -> Optional[Dict[str, str]]:
+        """
+        Check a batch submitted with submit_batch().
+        
+        Args:
+            batch_id: Provider batch ID
             
-            prompt = self._build_prompt(task_description, context, files)
+        Returns:
+            Mapping of task_id to cleaned patch once the batch has finished, or
+            None while it is still running. Requests that failed inside the
+            batch are logged and omitted.
+        """
+        if self.provider not in ["openai", "anthropic"] or self._client is None:
+            raise AIAgentError(f"Batch API not available for provider: {self.provider}")
+        
+        results: Dict[str, str] = {}
+        try:
+            if self.provider == "openai":
+                batch = self._client.batches.retrieve(batch_id)
+                if batch.status in ["validating", "in_progress", "finalizing", "cancelling"]:
+                    return None
+                if batch.status != "completed":
+                    raise AIAgentError(f"OpenAI batch {batch_id} ended with status: {batch.status}")
+                if not batch.output_file_id:
+                    return results
+                output = self._client.files.content(batch.output_file_id).content
+                for line in output.splitlines():
+                    if not line.strip():
+                        continue
+                    record = json_utils.loads(line)
+                    response = record.get("response") or {}
+                    if record.get("error") or response.get("status_code") != 200:
+                        logger.warning(f"Batch request {record.get('custom_id')} failed: {record.get('error') or response}")
+                        continue
+                    content = response["body"]["choices"][0]["message"]["content"]
+                    results[record["custom_id"]] = self._clean_response(content)
+            else:
+                batch = self._client.messages.batches.retrieve(batch_id)
+                if batch.processing_status != "ended":
+                    return None
+                for entry in self._client.messages.batches.results(batch_id):
+                    if entry.result.type != "succeeded":
+                        logger.warning(f"Batch request {entry.custom_id} failed: {entry.result.type}")
+                        continue
+                    results[entry.custom_id] = self._clean_response(entry.result.message.content[0].text)
+        except AIAgentError:
+            raise
+        except Exception as e:
+            raise AIAgentError(f"{self.provider} batch polling failed: {str(e)}")
+        
+        return results
+    
+    def generate_solutions_batch(
+        self,
+        tasks: List[Dict[str, Any]],
+        poll_interval: float = 30.0,
+        timeout: Optional[float] = None
+    ) -> List[Optional[str]]:
+        """
+        Generate solutions for many tasks, returning them in input order.
+        
+        OpenAI and Anthropic agents go through the provider batch API
+        (submit_batch/poll_batch), polling every ``poll_interval`` seconds.
+        Other providers fall back to concurrent individual calls over the
+        pooled session.
+        
+        Args:
+            tasks: Task dicts with "task_description" and optional "task_id",
+                "context" and "files" keys
+            poll_interval: Seconds between batch status checks (default: 30)
+            timeout: Maximum seconds to wait for a batch (default: no limit)
+            
+        Returns:
+            One solution per task; None where that task failed
+        """
+        if not tasks:
+            return []
+        
+        if self.provider in ["openai", "anthropic"] and self._client is not None:
+            keyed = [dict(task, task_id=str(task.get("task_id", i))) for i, task in enumerate(tasks)]
+            batch_id = self.submit_batch(keyed)
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            results = self.poll_batch(batch_id)
+            while results is None:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise AIAgentError(f"{self.provider} batch {batch_id} did not finish within {timeout}s")
+                time.sleep(poll_interval)
+                results = self.poll_batch(batch_id)
+            return [results.get(task["task_id"]) for task in keyed]
+        
+        def run(task: Dict[str, Any]) -> Optional[str]:
+            try:
+                return self.generate_solution(task["task_description"], task.get("context"), task.get("files"))
+            except AIAgentError as e:
+                logger.error(f"Failed to generate solution for {task.get('task_id', 'task')}: {e}")
+                return None
+        
+        max_workers = min(len(tasks), get_config().pool_maxsize)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run, tasks))
+    
+    def _generate_openai(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> str:
+        """Generate solution using OpenAI API."""
+        if self._client is None:
+            # Unready agents are switched to _generate_local at construction time
+            raise AIAgentError(f"{self.provider} client is not configured (missing API key or SDK)")
+        
+        try:
+            client = self._client
+            
+            if prompt is None:
+                prompt = self._build_prompt(task_description, context, files)
             
             response = client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1,
+                temperature=self._temperature(context),
                 max_tokens=8192
             )
             
             return self._clean_response(response.choices[0].message.content)
             
-        except ImportError:
-            return self._generate_local(task_description, context, files)
         except Exception as e:
-            raise AIAgentError(f"OpenAI generation failed: {str(e)}")
+            raise AIAgentError(
+                f"OpenAI generation failed: {str(e)}",
+                status_code=getattr(e, "status_code", None),
+                retryable=self._is_sdk_transient_error(e) or None
+            )
     
-    def _generate_anthropic(self, task_description: str, context: Optional[Dict], files: Optional[Dict]) -> str:
+    def _generate_anthropic(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> str:
         """Generate solution using Anthropic Claude API."""
+        if self._client is None:
+            # Unready agents are switched to _generate_local at construction time
+            raise AIAgentError(f"{self.provider} client is not configured (missing API key or SDK)")
+        
         try:
-            import anthropic
-            
-            if not self.api_key:
-                return self._generate_local(task_description, context, files)
+            client = self._client
             
-            client = anthropic.Anthropic(api_key=self.api_key)
-            
-            prompt = self._build_prompt(task_description, context, files)
+            if prompt is None:
+                prompt = self._build_prompt(task_description, context, files)
             
             message = client.messages.create(
                 model=self.model,
                 max_tokens=8192,
-                temperature=0.1,
-                system=self._get_system_prompt(),
+                temperature=self._temperature(context),
+                system=self.SYSTEM_PROMPT,
                 messages=[
                     {"role": "user", "content": prompt}
                 ]
@@ -200,46 +913,54 @@ class AIAgent:
             
             return self._clean_response(message.content[0].text)
             
-        except ImportError:
-            return self._generate_local(task_description, context, files)
         except Exception as e:
-            raise AIAgentError(f"Anthropic generation failed: {str(e)}")
+            raise AIAgentError(
+                f"Anthropic generation failed: {str(e)}",
+                status_code=getattr(e, "status_code", None),
+                retryable=self._is_sdk_transient_error(e) or None
+            )
     
-    def _generate_gemini(self, task_description: str, context: Optional[Dict], files: Optional[Dict]) -> str:
+    def _generate_gemini(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> str:
         """Generate solution using Google Gemini API (AI Studio)."""
+        if self._sdk is None:
+            raise AIAgentError("google-generativeai package not installed. Install with: pip install google-generativeai")
+        if self._client is None:
+            # Unready agents are switched to _generate_local at construction time
+            raise AIAgentError(f"{self.provider} client is not configured (missing API key or SDK)")
+        
         try:
-            import google.generativeai as genai
-            
-            if not self.api_key:
-                return self._generate_local(task_description, context, files)
+            model = self._client
             
-            genai.configure(api_key=self.api_key)
-            
-            model_name = self.model if self.model else "gemini-2.5-flash"
-            if model_name.startswith("models/"):
-                model_name = model_name.replace("models/", "")
-            
-            model = genai.GenerativeModel(model_name)
-            
-            prompt = self._build_prompt(task_description, context, files)
-            full_prompt = f"{self._get_system_prompt()}\n\n{prompt}"
+            if prompt is None:
+                prompt = self._build_prompt(task_description, context, files)
             
+            # The system prompt is set once on the model as its system instruction
             response = model.generate_content(
-                full_prompt,
+                prompt,
                 generation_config={
-                    "temperature": 0.1,
+                    "temperature": self._temperature(context),
                     "max_output_tokens": 16384,
                 }
             )
             
             return self._clean_response(response.text)
             
-        except ImportError:
-            raise AIAgentError("google-generativeai package not installed. Install with: pip install google-generativeai")
         except Exception as e:
-            raise AIAgentError(f"Gemini generation failed: {str(e)}")
+            raise AIAgentError(f"Gemini generation failed: {str(e)}", status_code=getattr(e, "code", None))
     
-    def _generate_openrouter(self, task_description: str, context: Optional[Dict], files: Optional[Dict]) -> str:
+    def _generate_openrouter(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> str:
         """
         Generate solution using OpenRouter API.
         
@@ -252,56 +973,37 @@ class AIAgent:
         
         See: https://openrouter.ai/docs
         """
+        return self._clean_response("".join(self._stream_openrouter(task_description, context, files, prompt)))
+    
+    def _stream_openrouter(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream the OpenRouter completion as server-sent events."""
         if not self.api_key:
             raise AIAgentError("OpenRouter API key required. Set OPENROUTER_API_KEY environment variable.")
-        
-        try:
-            prompt = self._build_prompt(task_description, context, files)
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
+        return self._stream_chat_completion(
+            "OpenRouter",
+            self.base_url or "https://openrouter.ai/api/v1/chat/completions",
+            task_description, context, files,
+            prompt=prompt,
+            max_tokens=6000,  # Reduced for free tier compatibility
+            extra_headers={
                 "HTTP-Referer": "https://github.com/yasarshaikh/SF-bench",
                 "X-Title": "SF-Bench"
             }
-            
-            # Get temperature from context if provided (for deterministic mode)
-            temperature = 0.1  # Default
-            if context and "temperature" in context:
-                temperature = context["temperature"]
-            
-            data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": temperature,
-                "max_tokens": 6000  # Reduced for free tier compatibility
-            }
-            
-            response = requests.post(
-                self.base_url or "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=data,
-                timeout=120
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return self._clean_response(result["choices"][0]["message"]["content"])
-            else:
-                error_msg = response.json().get("error", {}).get("message", response.text)
-                raise AIAgentError(f"OpenRouter API error: {error_msg}")
-                
-        except requests.exceptions.Timeout:
-            raise AIAgentError("OpenRouter request timed out after 120 seconds")
-        except Exception as e:
-            if "AIAgentError" in str(type(e)):
-                raise
-            raise AIAgentError(f"OpenRouter generation failed: {str(e)}")
+        )
     
-    def _generate_routellm(self, task_description: str, context: Optional[Dict], files: Optional[Dict]) -> str:
+    def _generate_routellm(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> str:
         """
         Generate solution using RouteLLM API.
         
@@ -310,130 +1012,260 @@ class AIAgent:
         
         See: https://routellm.abacus.ai
         """
+        return self._clean_response("".join(self._stream_routellm(task_description, context, files, prompt)))
+    
+    def _stream_routellm(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream the RouteLLM completion as server-sent events."""
         if not self.api_key:
             raise AIAgentError("RouteLLM API key required. Set ROUTELLM_API_KEY environment variable.")
-        
+        return self._stream_chat_completion(
+            "RouteLLM",
+            self.base_url or "https://routellm.abacus.ai/v1/chat/completions",
+            task_description, context, files,
+            prompt=prompt,
+            max_tokens=8192
+        )
+    
+    def _stream_chat_completion(
+        self,
+        provider_name: str,
+        url: str,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        max_tokens: int,
+        extra_headers: Optional[Dict[str, str]] = None,
+        prompt: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream a completion from an OpenAI-compatible chat completions endpoint."""
+        response = None
         try:
-            prompt = self._build_prompt(task_description, context, files)
+            if prompt is None:
+                prompt = self._build_prompt(task_description, context, files)
             
-            url = self.base_url or "https://routellm.abacus.ai/v1/chat/completions"
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
+                "Content-Type": "application/json",
+                **(extra_headers or {})
             }
             
-            # Get temperature from context if provided (for deterministic mode)
-            temperature = 0.1  # Default
-            if context and "temperature" in context:
-                temperature = context["temperature"]
-            
             data = {
                 "model": self.model,
                 "messages": [
-                    {"role": "system", "content": self._get_system_prompt()},
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
-                "temperature": temperature,
-                "max_tokens": 8192,
-                "stream": False
+                "temperature": self._temperature(context),
+                "max_tokens": max_tokens,
+                "stream": True
             }
             
-            response = requests.post(
+            response = self.session.post(
                 url,
                 headers=headers,
-                json=data,
-                timeout=120
+                data=self._request_body(data, headers),
+                timeout=120,
+                stream=True
             )
             
             if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, dict) and "choices" in result:
-                    return self._clean_response(result["choices"][0]["message"]["content"])
-                else:
-                    raise AIAgentError(f"RouteLLM API returned unexpected response format: {result}")
+                yield from self._iter_sse_content(response, provider_name)
             else:
-                # Handle error response
-                try:
-                    error_data = response.json()
-                    if isinstance(error_data, dict):
-                        error_msg = error_data.get("error", {}).get("message", response.text) if isinstance(error_data.get("error"), dict) else str(error_data)
-                    else:
-                        error_msg = str(error_data)
-                except:
-                    error_msg = response.text or f"HTTP {response.status_code}"
-                raise AIAgentError(f"RouteLLM API error ({response.status_code}): {error_msg}")
+                error_msg = self._error_message(response)
+                raise AIAgentError(
+                    f"{provider_name} API error ({response.status_code}): {error_msg}",
+                    status_code=response.status_code
+                )
                 
+        except AIAgentError:
+            raise
         except requests.exceptions.Timeout:
-            raise AIAgentError("RouteLLM request timed out after 120 seconds")
+            raise AIAgentError(f"{provider_name} request timed out after 120 seconds", retryable=True)
         except Exception as e:
-            if "AIAgentError" in str(type(e)):
-                raise
-            raise AIAgentError(f"RouteLLM generation failed: {str(e)}")
+            raise AIAgentError(f"{provider_name} generation failed: {str(e)}", retryable=_is_transient_error(e))
+        finally:
+            if response is not None:
+                response.close()
+    
+    def _request_body(self, data: Dict[str, Any], headers: Dict[str, str]) -> bytes:
+        """Encode a JSON request body, gzip-compressing large ones where supported."""
+        body = json_utils.dumps_bytes(data)
+        if self._compress_requests and len(body) > self.GZIP_MIN_BYTES:
+            headers["Content-Encoding"] = "gzip"
+            return gzip.compress(body, compresslevel=6)
+        return body
+    
+    @classmethod
+    def _error_message(cls, response: requests.Response) -> str:
+        """
+        Best-effort error message from a failed HTTP response.
+        
+        Only small JSON bodies are parsed; HTML error pages from proxies and
+        oversized bodies fall back to (truncated) raw text.
+        """
+        content_type = response.headers.get("Content-Type", "")
+        if content_type.startswith("application/json") and len(response.content) < cls._MAX_ERROR_BODY:
+            try:
+                error_data = json_utils.loads(response.content)
+                if isinstance(error_data, dict) and isinstance(error_data.get("error"), dict):
+                    return error_data["error"].get("message") or str(error_data)
+                return str(error_data)
+            except Exception:
+                pass
+        return response.text[:cls._MAX_ERROR_TEXT] or f"HTTP {response.status_code}"
+    
+    @staticmethod
+    def _iter_sse_content(response: requests.Response, provider_name: str) -> Iterator[str]:
+        """Yield delta.content from an OpenAI-style chat completion event stream."""
+        for line in response.iter_lines():
+            # Skip keep-alive comments (": PROCESSING") and blank separators
+            if not line.startswith(b"data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == b"[DONE]":
+                break
+            event = json_utils.loads(payload)
+            if "error" in event:
+                error = event["error"]
+                message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+                raise AIAgentError(f"{provider_name} API error: {message}")
+            choices = event.get("choices") or []
+            if choices:
+                content = (choices[0].get("delta") or {}).get("content")
+                if content:
+                    yield content
     
-    def _generate_ollama(self, task_description: str, context: Optional[Dict], files: Optional[Dict]) -> str:
+    def _generate_ollama(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> str:
         """
         Generate solution using local Ollama instance.
         
         Requires Ollama running locally: https://ollama.ai
         """
+        return self._clean_response("".join(self._stream_ollama(task_description, context, files, prompt)))
+    
+    def _stream_ollama(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream the Ollama completion (one JSON object per line)."""
+        response = None
         try:
-            prompt = self._build_prompt(task_description, context, files)
+            if prompt is None:
+                prompt = self._build_prompt(task_description, context, files)
             
             base_url = self.base_url or "http://localhost:11434"
             
-            response = requests.post(
+            data = {
+                "model": self.model or "codellama",
+                "system": self.SYSTEM_PROMPT,
+                "prompt": prompt,
+                "stream": True,
+                "options": {
+                    "temperature": self._temperature(context),
+                    "num_predict": 8192
+                }
+            }
+            
+            response = self.session.post(
                 f"{base_url}/api/generate",
-                json={
-                    "model": self.model or "codellama",
-                    "prompt": f"{self._get_system_prompt()}\n\n{prompt}",
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,
-                        "num_predict": 8192
-                    }
-                },
-                timeout=300
+                headers={"Content-Type": "application/json"},
+                data=json_utils.dumps_bytes(data),
+                timeout=300,
+                stream=True
             )
             
-            if response.status_code == 200:
-                return self._clean_response(response.json()["response"])
-            else:
-                raise AIAgentError(f"Ollama error: {response.text}")
+            if response.status_code != 200:
+                raise AIAgentError(f"Ollama error: {response.text}", status_code=response.status_code)
+            
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json_utils.loads(line)
+                if "error" in chunk:
+                    raise AIAgentError(f"Ollama error: {chunk['error']}")
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
                 
+        except AIAgentError:
+            raise
         except requests.exceptions.ConnectionError:
-            raise AIAgentError("Ollama not running. Start with: ollama serve")
+            raise AIAgentError("Ollama not running. Start with: ollama serve", retryable=True)
         except Exception as e:
-            raise AIAgentError(f"Ollama generation failed: {str(e)}")
+            raise AIAgentError(f"Ollama generation failed: {str(e)}", retryable=_is_transient_error(e))
+        finally:
+            if response is not None:
+                response.close()
     
-    def _generate_huggingface(self, task_description: str, context: Optional[Dict], files: Optional[Dict]) -> str:
+    def _generate_huggingface(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> str:
         """Generate solution using Hugging Face Inference API."""
         try:
             if not self.api_key:
                 return self._generate_local(task_description, context, files)
             
-            prompt = self._build_prompt(task_description, context, files)
+            if prompt is None:
+                prompt = self._build_prompt(task_description, context, files)
             
             api_url = f"https://api-inference.huggingface.co/models/{self.model}"
-            headers = {"Authorization": f"Bearer {self.api_key}"}
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
             
-            response = requests.post(
+            response = self.session.post(
                 api_url,
                 headers=headers,
-                json={"inputs": prompt, "parameters": {"max_length": 4000}},
+                data=json_utils.dumps_bytes({"inputs": prompt, "parameters": {"max_length": 4000}}),
                 timeout=60
             )
             
-            if response.status_code == 200:
-                result = response.json()
-                if isinstance(result, list) and len(result) > 0:
-                    return self._clean_response(result[0].get("generated_text", ""))
+            if response.status_code != 200:
+                raise AIAgentError(
+                    f"Hugging Face API error: {self._error_message(response)}",
+                    status_code=response.status_code
+                )
             
-            return self._generate_local(task_description, context, files)
+            result = json_utils.loads(response.content)
+            if not (isinstance(result, list) and result and isinstance(result[0], dict)):
+                raise AIAgentError(f"Hugging Face API returned an unexpected response: {str(result)[:200]}")
+            return self._clean_response(result[0].get("generated_text", ""))
             
+        except AIAgentError:
+            raise
         except Exception as e:
-            return self._generate_local(task_description, context, files)
+            # Failures of a configured agent are errors, never the local template,
+            # which generate_solution would otherwise cache under this model
+            raise AIAgentError(f"Hugging Face generation failed: {str(e)}", retryable=_is_transient_error(e))
     
-    def _generate_local(self, task_description: str, context: Optional[Dict], files: Optional[Dict]) -> str:
+    def _generate_local(
+        self,
+        task_description: str,
+        context: Optional[Dict],
+        files: Optional[Dict],
+        prompt: Optional[str] = None
+    ) -> str:
         """
         Fallback for when no AI provider is available.
         Returns a template for manual completion.
@@ -463,35 +1295,7 @@ class AIAgent:
     
     def _get_system_prompt(self) -> str:
         """Get the system prompt for AI models."""
-        return """You are an expert Salesforce developer. Generate solutions as unified diff patches.
-
-OUTPUT FORMAT - Follow this EXACT structure:
-
-diff --git a/force-app/main/default/classes/Example.cls b/force-app/main/default/classes/Example.cls
---- a/force-app/main/default/classes/Example.cls
-+++ b/force-app/main/default/classes/Example.cls
-@@ -1,6 +1,8 @@
- public class Example {
-     public void existingMethod() {
-         System.debug('existing');
-     }
-+
-+    public void newMethod() {
-+        System.debug('new code');
-+    }
- }
-
-CRITICAL RULES:
-1. Output ONLY the raw patch - NO markdown fences, NO explanations
-2. First line MUST be: diff --git a/path b/path
-3. Then: --- a/path (original file)
-4. Then: +++ b/path (modified file)
-5. Then: @@ -startline,count +startline,count @@ (hunk header)
-6. Context lines (unchanged) start with a SPACE character
-7. Added lines start with + (no space after +)
-8. Removed lines start with - (no space after -)
-9. Include 3 lines of context before and after changes
-10. The patch MUST apply cleanly with 'git apply'"""
+        return self.SYSTEM_PROMPT
     
     def _build_prompt(self, task_description: str, context: Optional[Dict], files: Optional[Dict]) -> str:
         """Build the prompt for AI generation."""
@@ -503,79 +1307,68 @@ CRITICAL RULES:
         
         if context:
             prompt_parts.append("Context:")
-            prompt_parts.append(json.dumps(context, indent=2))
+            # Compact JSON: indentation only costs prompt tokens
+            prompt_parts.append(json_utils.dumps(context))
             prompt_parts.append("\n")
         
         if files:
             prompt_parts.append("Relevant Files:")
+            # Group identical contents (generated manifests, boilerplate) so each
+            # body is sent once under all of its paths
+            groups: Dict[str, List] = {}
             for file_path, content in files.items():
-                prompt_parts.append(f"\n--- {file_path} ---")
-                prompt_parts.append(content[:3000])  # Limit file content
+                digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+                groups.setdefault(digest, [content, []])[1].append(file_path)
+            # Split the token budget so short files are sent whole and only
+            # the largest ones are truncated
+            sizes = [count_tokens(content, self.model) for content, _ in groups.values()]
+            allocation = allocate_budget(sizes, self._file_token_budget)
+            for (content, paths), size, allotted in zip(groups.values(), sizes, allocation):
+                prompt_parts.append(f"\n--- {', '.join(paths)} ---")
+                prompt_parts.append(content if allotted >= size else truncate_to_tokens(content, allotted, self.model))
             prompt_parts.append("\n")
         
-        prompt_parts.append(
-            "\nGenerate a COMPLETE unified diff patch that solves this task. "
-            "The patch MUST be in standard git diff format and ready to apply with 'git apply'. "
-            "Include ALL file changes needed. Do not truncate."
-        )
+        prompt_parts.append(self.PROMPT_FOOTER)
         
         return "\n".join(prompt_parts)
 
+    # Fence languages that mark a code block as patch content
+    _FENCE_LANGUAGES = ("diff", "patch", "apex", "cls", "js", "html", "xml")
+
     def _clean_response(self, response: str) -> str:
         """Clean the AI response, extracting diff content and normalizing format."""
         result = response.strip()
         
         # Step 1: Extract diff content from markdown code blocks
         if "```" in result:
-            lines = result.split("\n")
-            cleaned_lines = []
-            in_diff_block = False
-            
-            for line in lines:
-                stripped = line.strip()
-                
-                if stripped.startswith("```"):
-                    if any(x in stripped.lower() for x in ["diff", "patch", "apex", "cls", "js", "html", "xml"]):
-                        in_diff_block = True
-                        continue
-                    elif stripped == "```" and in_diff_block:
-                        in_diff_block = False
-                        continue
-                    elif stripped == "```":
-                        in_diff_block = True
-                        continue
-                    else:
-                        continue
-                
-                if in_diff_block:
-                    cleaned_lines.append(line)
-            
-            if cleaned_lines:
-                result = "\n".join(cleaned_lines)
+            result = self._extract_fenced(result)
         
-        # Step 2: Find diff start (handle multiple patterns)
-        lines = result.split("\n")
-        diff_start = -1
-        for i, line in enumerate(lines):
-            if line.startswith("diff --git"):
-                diff_start = i
-                break
-            elif line.startswith("--- a/") or line.startswith("--- "):
-                if i + 1 < len(lines) and lines[i + 1].startswith("+++"):
-                    diff_start = i
-                    break
-            elif line.startswith("@@") and " @@" in line:
-                diff_start = i
-                break
-        
-        if diff_start > 0:
-            result = "\n".join(lines[diff_start:])
+        # Step 2: Skip any preamble before the first diff marker
+        match = _DIFF_START_RE.search(result)
+        if match:
+            result = result[match.start():]
         
         # Step 3: Normalize - add missing diff --git header if we have --- and +++
         result = self._normalize_patch_headers(result)
         
         return result.strip()
 
+    def _extract_fenced(self, text: str) -> str:
+        """Return the lines inside patch-like code fences, or text if there are none."""
+        fenced_lines = []
+        in_diff_block = False
+        for line in text.split("\n"):
+            stripped = line.strip()
+            if stripped.startswith("```"):
+                if any(x in stripped.lower() for x in self._FENCE_LANGUAGES):
+                    in_diff_block = True
+                elif stripped == "```":
+                    in_diff_block = not in_diff_block
+                continue
+            if in_diff_block:
+                fenced_lines.append(line)
+        return "\n".join(fenced_lines) if fenced_lines else text
+
     def _normalize_patch_headers(self, patch: str) -> str:
         """Add missing diff --git header if patch has file headers but no diff line."""
         lines = patch.split('\n')
@@ -610,36 +1403,173 @@ CRITICAL RULES:
         
         return patch
     
-    def __del__(self):
-        """Cleanup session on object destruction."""
-        if hasattr(self, 'session') and self.session:
+    def close(self) -> None:
+        """Close the HTTP session and release pooled connections (idempotent)."""
+        self._finalizer()
+    
+    def __enter__(self) -> 'AIAgent':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class FallbackAgent:
+    """
+    Chain of agents tried in turn until one produces a solution.
+    
+    Exposes the generation entry points of AIAgent (generate_solution,
+    agenerate_solution, close) so it can stand in for a single agent; it holds
+    no provider state of its own.
+    
+    Transient failures (rate limits, 5xx, timeouts, connection errors, open
+    circuit breakers) move on to the next agent; non-retryable errors such as
+    400/401 are raised immediately since every provider would reject the
+    request the same way.
+    
+    Strategies:
+    - first_success: try agents in the given order
+    - lowest_latency: try agents in order of their recent (EWMA) latency
+    """
+    
+    STRATEGIES = ["first_success", "lowest_latency"]
+    
+    # Weight of the newest sample in the latency moving average
+    LATENCY_ALPHA = 0.3
+    
+    def __init__(self, agents: List[AIAgent], strategy: str = "first_success"):
+        """
+        Initialize fallback chain.
+        
+        Args:
+            agents: Agents to try, in priority order
+            strategy: Ordering strategy (first_success, lowest_latency)
+        """
+        if not agents:
+            raise AIAgentError("FallbackAgent requires at least one agent")
+        if strategy not in self.STRATEGIES:
+            raise AIAgentError(f"Unsupported strategy: {strategy}. Supported: {self.STRATEGIES}")
+        self.agents = list(agents)
+        self.strategy = strategy
+        self.provider = "fallback"
+        self.model = " -> ".join(f"{a.provider}:{a.model}" for a in self.agents)
+        self._latency: Dict[int, float] = {}
+    
+    @property
+    def ready(self) -> bool:
+        """True if any agent in the chain can reach its provider."""
+        return any(a.ready for a in self.agents)
+    
+    def _ordered_agents(self) -> List[AIAgent]:
+        if self.strategy == "lowest_latency":
+            # Agents without a sample yet sort first so each gets measured
+            return sorted(self.agents, key=lambda a: self._latency.get(id(a), 0.0))
+        return self.agents
+    
+    def _record_latency(self, agent: AIAgent, seconds: float) -> None:
+        previous = self._latency.get(id(agent))
+        if previous is None:
+            self._latency[id(agent)] = seconds
+        else:
+            self._latency[id(agent)] = self.LATENCY_ALPHA * seconds + (1 - self.LATENCY_ALPHA) * previous
+    
+    def generate_solution(
+        self,
+        task_description: str,
+        context: Optional[Dict[str, Any]] = None,
+        files: Optional[Dict[str, str]] = None,
+        use_cache: bool = True
+    ) -> str:
+        """
+        Generate a solution with the first agent that succeeds.
+        
+        Raises:
+            AIAgentError: The first non-retryable error, or the last error if
+                every agent failed transiently
+        """
+        last_error: Optional[AIAgentError] = None
+        for agent in self._ordered_agents():
+            start = time.monotonic()
             try:
-                self.session.close()
-            except Exception:
-                pass  # Ignore errors during cleanup
+                result = agent.generate_solution(task_description, context, files, use_cache=use_cache)
+            except AIAgentError as e:
+                if not e.retryable:
+                    raise
+                # Time lost to a failing provider counts against it too
+                self._record_latency(agent, time.monotonic() - start)
+                logger.warning(f"{agent.provider}:{agent.model} failed transiently, trying next agent: {e}")
+                last_error = e
+                continue
+            self._record_latency(agent, time.monotonic() - start)
+            return result
+        raise last_error
+    
+    async def agenerate_solution(
+        self,
+        task_description: str,
+        context: Optional[Dict[str, Any]] = None,
+        files: Optional[Dict[str, str]] = None
+    ) -> str:
+        """Async variant of generate_solution; the chain runs in a worker thread."""
+        return await asyncio.to_thread(self.generate_solution, task_description, context, files)
+    
+    def close(self) -> None:
+        """Close every agent in the chain."""
+        for agent in self.agents:
+            agent.close()
+    
+    def __enter__(self) -> 'FallbackAgent':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+async def generate_solutions_multi(
+    agents: List[Union[AIAgent, FallbackAgent]],
+    task_description: str,
+    context: Optional[Dict[str, Any]] = None,
+    files: Optional[Dict[str, str]] = None
+) -> List[Any]:
+    """
+    Ask several agents for a solution to the same task concurrently.
+    
+    Useful for A/B comparisons across providers or models: wall-clock time is
+    that of the slowest agent rather than the sum of all of them.
+    
+    Args:
+        agents: Agents to query (wrap one in FallbackAgent for per-call resilience)
+        task_description: Description of the task/problem
+        context: Additional context (task type, repo info, etc.)
+        files: Relevant files with their contents
+    
+    Returns:
+        One entry per agent, in the same order as ``agents``: the solution, or
+        the exception that agent raised
+    """
+    return await asyncio.gather(
+        *(agent.agenerate_solution(task_description, context, files) for agent in agents),
+        return_exceptions=True
+    )
 
 
-def rate_limit(calls_per_minute: int = 60):
+def rate_limit(calls_per_minute: int = 60, burst: int = 1):
     """
     Decorator for rate limiting API calls.
     
     Args:
         calls_per_minute: Maximum number of calls allowed per minute (default: 60)
+        burst: Calls allowed back-to-back after an idle period (default: 1)
     
     Returns:
         Decorator function
     """
-    min_interval = 60.0 / calls_per_minute
-    last_called = [0.0]
+    bucket = TokenBucket.per_minute(calls_per_minute, burst=burst)
     
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> T:
-            elapsed = time.time() - last_called[0]
-            if elapsed < min_interval:
-                sleep_time = min_interval - elapsed
-                time.sleep(sleep_time)
-            last_called[0] = time.time()
+            bucket.acquire()
             return func(*args, **kwargs)
         return wrapper
     return decorator
@@ -716,22 +1646,42 @@ def create_ollama_agent(model: str = "codellama", base_url: str = "http://localh
     return AIAgent(provider="ollama", model=model, base_url=base_url)
 
 
-def list_openrouter_models(api_key: Optional[str] = None) -> List[Dict]:
+# Last model list and its ETag; the list changes rarely, so revalidate instead of refetching
+_models_cache: Dict[str, Any] = {"etag": None, "data": None}
+
+
+def list_openrouter_models(api_key: Optional[str] = None, session: Optional[requests.Session] = None) -> List[Dict]:
     """
     List available models from OpenRouter.
     
-    Returns list of models with pricing and capabilities.
+    Args:
+        api_key: OpenRouter API key (default: OPENROUTER_API_KEY)
+        session: Pooled session to reuse, e.g. an agent's ``session``
+            (default: a process-wide pooled session)
+    
+    Returns list of models with pricing and capabilities. Repeated calls send
+    If-None-Match and reuse the previous list when OpenRouter answers 304.
     """
     key = api_key or os.getenv("OPENROUTER_API_KEY")
     if not key:
         raise AIAgentError("OpenRouter API key required")
     
-    response = requests.get(
+    headers = {"Authorization": f"Bearer {key}"}
+    if _models_cache["etag"]:
+        headers["If-None-Match"] = _models_cache["etag"]
+    
+    http = session or _get_shared_session()
+    response = http.get(
         "https://openrouter.ai/api/v1/models",
-        headers={"Authorization": f"Bearer {key}"}
+        headers=headers,
+        timeout=30
     )
     
-    if response.status_code == 200:
-        return response.json().get("data", [])
+    if response.status_code == 304 and _models_cache["data"] is not None:
+        return _models_cache["data"]
+    elif response.status_code == 200:
+        data = json_utils.loads(response.content).get("data", [])
+        _models_cache.update(etag=response.headers.get("ETag"), data=data)
+        return data
     else:
         raise AIAgentError(f"Failed to fetch models: {response.text}")
@@ -4,16 +4,72 @@ Audit logging system for SF-Bench evaluations.
 Provides comprehensive audit trails with cryptographic hashing for result verification.
 All critical operations are logged with timestamps, context, and integrity verification.
 """
+import functools
 import hashlib
-import json
 import logging
-from dataclasses import dataclass, field, asdict
-from datetime import datetime
+import re
+import time
+import weakref
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
+
+from sfbench.utils import json_utils
+from sfbench.utils.background_io import atomic_write_bytes, get_background_writer
 
 logger = logging.getLogger(__name__)
 
+# Last formatted event timestamp; bursts within one millisecond reuse it
+_last_ts_ns = 0
+_last_ts_str = ''
+
+
+def _utcnow() -> datetime:
+    """Current UTC time as a naive datetime (the format audits have always used)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _now_iso() -> str:
+    """ISO-8601 UTC timestamp for an audit event, formatted at most once per millisecond."""
+    global _last_ts_ns, _last_ts_str
+    now_ns = time.time_ns()
+    if not 0 <= now_ns - _last_ts_ns < 1_000_000:  # also reformat if the clock stepped back
+        _last_ts_str = datetime.fromtimestamp(now_ns / 1e9, timezone.utc).replace(tzinfo=None).isoformat()
+        _last_ts_ns = now_ns
+    return _last_ts_str
+
+
+# Header names containing any of these are redacted
+_SENSITIVE_HEADER_PARTS = ('key', 'token', 'authorization')
+# Body keys such as api_key, x-api-key, access_token, client_secret (but not max_tokens)
+_SENSITIVE_KEY_RE = re.compile(r'(?:^|[_-])(?:api_?key|key|token|secret|password|authorization)$', re.IGNORECASE)
+_REDACTED = '***REDACTED***'
+
+# Per-audit event lists totalled in the audit report
+_COUNTED_EVENTS = ('api_calls', 'sfdx_commands', 'git_operations')
+
+# Payloads up to this size are memoized; larger ones (e.g. CLI output) are hashed directly
+_HASH_CACHE_MAX_BYTES = 64 * 1024
+
+
+@functools.lru_cache(maxsize=1024)
+def _sha256_hex(data: bytes) -> str:
+    """SHA-256 hex digest, memoized for payloads repeated across a sweep."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_sha256_hex(path: Path) -> str:
+    """SHA-256 hex digest of a file, read in chunks."""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
 
 @dataclass
 class EvaluationAudit:
@@ -39,11 +95,28 @@ class EvaluationAudit:
     git_operations: List[Dict[str, Any]] = field(default_factory=list)
     
     def to_dict(self) -> Dict[str, Any]:
-        """Convert audit record to dictionary for JSON serialization."""
-        data = asdict(self)
-        # Convert datetime to ISO format string
-        data['timestamp'] = self.timestamp.isoformat()
-        return data
+        """
+        Convert audit record to dictionary for JSON serialization.
+        
+        Event lists are shared, not copied (unlike dataclasses.asdict), since
+        this runs on every audit file write; serialize the result, don't mutate it.
+        """
+        return {
+            'evaluation_id': self.evaluation_id,
+            'timestamp': self.timestamp.isoformat(),
+            'model_name': self.model_name,
+            'task_id': self.task_id,
+            'input_hash': self.input_hash,
+            'output_hash': self.output_hash,
+            'scratch_org_id': self.scratch_org_id,
+            'execution_logs': self.execution_logs,
+            'validation_results': self.validation_results,
+            'final_status': self.final_status,
+            'checkpoint_hash': self.checkpoint_hash,
+            'api_calls': self.api_calls,
+            'sfdx_commands': self.sfdx_commands,
+            'git_operations': self.git_operations
+        }
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'EvaluationAudit':
@@ -61,15 +134,28 @@ class AuditLogger:
     Provides methods to log all critical operations during evaluation,
     including AI provider API calls, Salesforce CLI commands, git operations,
     and validation results.
+    
+    Every event is appended as one JSON line to ``events.jsonl``, the
+    source of truth from which the audits are rebuilt on restart. A finalized
+    audit is written on its own to ``tasks/``; the aggregated ``audit.json``
+    is rewritten every ``flush_interval`` events and on ``flush()``/``close()``.
     """
     
-    def __init__(self, evaluation_id: str, audit_dir: Optional[Path] = None):
+    def __init__(
+        self,
+        evaluation_id: str,
+        audit_dir: Optional[Path] = None,
+        flush_interval: int = 50,
+        background: bool = False
+    ):
         """
         Initialize audit logger.
         
         Args:
             evaluation_id: Unique identifier for this evaluation
             audit_dir: Directory to store audit logs (default: logs/{evaluation_id}/audit)
+            flush_interval: Write the audit file after this many buffered events (default: 50)
+            background: Write audit.json on the shared background writer thread (default: False)
         """
         self.evaluation_id = evaluation_id
         if audit_dir is None:
@@ -78,17 +164,40 @@ class AuditLogger:
         self.audit_dir.mkdir(parents=True, exist_ok=True)
         
         self.audit_file = self.audit_dir / "audit.json"
+        self.events_file = self.audit_dir / "events.jsonl"
+        self.tasks_dir = self.audit_dir / "tasks"
+        self.tasks_dir.mkdir(exist_ok=True)
         self.audits: List[EvaluationAudit] = []
+        self._audit_index: Dict[int, int] = {}  # id(audit) -> position in self.audits
+        self._flush_interval = max(1, flush_interval)
+        self._pending = 0
+        self._writer = get_background_writer() if background else None
         
-        # Load existing audits if file exists
-        if self.audit_file.exists():
+        # Rebuild from the event log, or load an audit file written without one
+        seed_events = False
+        if self.events_file.exists():
+            self._replay_events()
+        elif self.audit_file.exists():
             try:
-                with open(self.audit_file) as f:
-                    data = json.load(f)
-                    self.audits = [EvaluationAudit.from_dict(a) for a in data]
+                data = json_utils.loads(self.audit_file.read_bytes())
+                self.audits = [EvaluationAudit.from_dict(a) for a in data]
+                seed_events = True
             except Exception as e:
                 logger.warning(f"Failed to load existing audit file: {e}")
                 self.audits = []
+        self._audit_index = {id(a): i for i, a in enumerate(self.audits)}
+        
+        # Running totals so generate_audit_report does not rescan every audit
+        self._status_counts: Counter = Counter()
+        self._event_totals: Counter = Counter()
+        for audit in self.audits:
+            self._count_audit(audit)
+        
+        self._events = open(self.events_file, 'ab', buffering=1 << 16)
+        self._finalizer = weakref.finalize(self, self._events.close)
+        if seed_events:
+            for audit in self.audits:
+                self._write_event(audit, 'audit', audit.to_dict())
     
     def create_audit(
         self,
@@ -113,14 +222,14 @@ class AuditLogger:
         """
         audit = EvaluationAudit(
             evaluation_id=self.evaluation_id,
-            timestamp=datetime.utcnow(),
+            timestamp=_utcnow(),
             model_name=model_name,
             task_id=task_id,
             input_hash=self._hash_data(input_data),
             output_hash=self._hash_data(output_data),
             scratch_org_id=scratch_org_id
         )
-        self.audits.append(audit)
+        self._add_audit(audit)
         return audit
     
     def log_api_call(
@@ -146,16 +255,18 @@ class AuditLogger:
         # Remove sensitive data from request
         safe_request = self._sanitize_request(request_data)
         
-        audit.api_calls.append({
-            'timestamp': datetime.utcnow().isoformat(),
+        entry = {
+            'timestamp': _now_iso(),
             'provider': provider,
             'model': model,
-            'request_hash': self._hash_data(json.dumps(safe_request, sort_keys=True)),
-            'response_hash': self._hash_data(json.dumps(response_data, sort_keys=True)),
+            'request_hash': self._hash_data(json_utils.dumps_canonical(safe_request)),
+            'response_hash': self._hash_data(json_utils.dumps_canonical(response_data)),
             'duration_ms': duration_ms,
             'status': 'success' if 'error' not in response_data else 'error'
-        })
-        self._save_audits()
+        }
+        self._track(audit)
+        audit.api_calls.append(entry)
+        self._record(audit, 'api_calls', entry)
     
     def log_sfdx_command(
         self,
@@ -177,15 +288,52 @@ class AuditLogger:
             stderr: Standard error
             duration_ms: Command duration in milliseconds
         """
-        audit.sfdx_commands.append({
-            'timestamp': datetime.utcnow().isoformat(),
+        entry = {
+            'timestamp': _now_iso(),
             'command': command,
             'exit_code': exit_code,
             'stdout_hash': self._hash_data(stdout),
             'stderr_hash': self._hash_data(stderr),
             'duration_ms': duration_ms
-        })
-        self._save_audits()
+        }
+        self._track(audit)
+        audit.sfdx_commands.append(entry)
+        self._record(audit, 'sfdx_commands', entry)
+    
+    def log_sfdx_command_stream(
+        self,
+        audit: EvaluationAudit,
+        command: str,
+        exit_code: int,
+        stdout_path: Path,
+        stderr_path: Path,
+        duration_ms: float
+    ) -> None:
+        """
+        Log a Salesforce CLI command whose output was redirected to files.
+        
+        The files are hashed in chunks, so large outputs are never loaded
+        into memory. Hashes match those of log_sfdx_command for the same output.
+        
+        Args:
+            audit: Audit record to update
+            command: Command that was executed
+            exit_code: Exit code from command
+            stdout_path: File holding standard output
+            stderr_path: File holding standard error
+            duration_ms: Command duration in milliseconds
+        """
+        entry = {
+            'timestamp': _now_iso(),
+            'command': command,
+            'exit_code': exit_code,
+            'stdout_hash': _file_sha256_hex(stdout_path),
+            'stderr_hash': _file_sha256_hex(stderr_path),
+            'duration_ms': duration_ms
+        }
+        self._track(audit)
+        audit.sfdx_commands.append(entry)
+        self._record(audit, 'sfdx_commands', entry)
     
     def log_git_operation(
         self,
@@ -205,14 +353,16 @@ class AuditLogger:
             success: Whether operation succeeded
             duration_ms: Operation duration in milliseconds
         """
-        audit.git_operations.append({
-            'timestamp': datetime.utcnow().isoformat(),
+        entry = {
+            'timestamp': _now_iso(),
             'operation': operation,
             'command': command,
             'success': success,
             'duration_ms': duration_ms
-        })
-        self._save_audits()
+        }
+        self._track(audit)
+        audit.git_operations.append(entry)
+        self._record(audit, 'git_operations', entry)
     
     def log_execution(
         self,
@@ -228,12 +378,14 @@ class AuditLogger:
             message: Log message
             level: Log level (INFO, WARNING, ERROR)
         """
-        audit.execution_logs.append({
-            'timestamp': datetime.utcnow().isoformat(),
+        entry = {
+            'timestamp': _now_iso(),
             'level': level,
             'message': message
-        })
-        self._save_audits()
+        }
+        self._track(audit)
+        audit.execution_logs.append(entry)
+        self._record(audit, 'execution_logs', entry)
     
     def update_validation_results(
         self,
@@ -247,8 +399,9 @@ class AuditLogger:
             audit: Audit record to update
             results: Validation results dictionary
         """
+        self._track(audit)
         audit.validation_results = results
-        self._save_audits()
+        self._record(audit, 'validation_results', results)
     
     def finalize_audit(
         self,
@@ -264,31 +417,152 @@ class AuditLogger:
             status: Final status (passed, failed, error, etc.)
             checkpoint_hash: Optional checkpoint hash for integrity verification
         """
+        self._track(audit)
+        self._status_counts[audit.final_status] -= 1
+        self._status_counts[status] += 1
         audit.final_status = status
         audit.checkpoint_hash = checkpoint_hash
-        self._save_audits()
+        self._record(audit, 'final_status', {'status': status, 'checkpoint_hash': checkpoint_hash})
+        self._save_one(audit)
+    
+    def flush(self) -> None:
+        """Write buffered audit events to the audit file."""
+        if self._pending:
+            self._save_audits()
+        elif not self._events.closed:
+            self._events.flush()
+        if self._writer is not None:
+            self._writer.flush()
+    
+    def close(self) -> None:
+        """Flush buffered events and close the event log; call when the evaluation ends."""
+        self.flush()
+        self._finalizer()
+    
+    def __enter__(self) -> 'AuditLogger':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+    
+    def _add_audit(self, audit: EvaluationAudit) -> None:
+        self._audit_index[id(audit)] = len(self.audits)
+        self.audits.append(audit)
+        self._count_audit(audit)
+        self._write_event(audit, 'audit', audit.to_dict())
+    
+    def _track(self, audit: EvaluationAudit) -> None:
+        """Adopt a record built outside create_audit, before it is changed, so replay sees each event once."""
+        if id(audit) not in self._audit_index:
+            self._add_audit(audit)
+    
+    def _count_audit(self, audit: EvaluationAudit) -> None:
+        self._status_counts[audit.final_status] += 1
+        for kind in _COUNTED_EVENTS:
+            self._event_totals[kind] += len(getattr(audit, kind))
     
-    def _hash_data(self, data: str) -> str:
+    def _record(self, audit: EvaluationAudit, kind: str, entry: Dict[str, Any]) -> None:
+        """Append an event to the log, rewriting audit.json every flush_interval events."""
+        self._write_event(audit, kind, entry)
+        if kind in _COUNTED_EVENTS:
+            self._event_totals[kind] += 1
+        self._pending += 1
+        if self._pending >= self._flush_interval:
+            self._save_audits()
+    
+    def _write_event(self, audit: EvaluationAudit, kind: str, entry: Dict[str, Any]) -> None:
+        event = {'audit': self._audit_index[id(audit)], 'kind': kind, 'data': entry}
+        try:
+            self._events.write(json_utils.dumps_bytes(event) + b'\n')
+        except Exception as e:
+            logger.error(f"Failed to write audit event: {e}")
+    
+    def _replay_events(self) -> None:
+        """Rebuild audits from events.jsonl, skipping a torn final line."""
+        with open(self.events_file, 'rb') as f:
+            for line in f:
+                try:
+                    event = json_utils.loads(line)
+                    kind, data = event['kind'], event['data']
+                    if kind == 'audit':
+                        self.audits.append(EvaluationAudit.from_dict(data))
+                        continue
+                    audit = self.audits[event['audit']]
+                    if kind == 'validation_results':
+                        audit.validation_results = data
+                    elif kind == 'final_status':
+                        audit.final_status = data['status']
+                        audit.checkpoint_hash = data['checkpoint_hash']
+                    else:
+                        getattr(audit, kind).append(data)
+                except Exception as e:
+                    logger.warning(f"Skipping unreadable audit event: {e}")
+    
+    def _hash_data(self, data: Union[str, bytes]) -> str:
         """Generate SHA-256 hash of data."""
-        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if len(data) <= _HASH_CACHE_MAX_BYTES:
+            return _sha256_hex(data)
+        return hashlib.sha256(data).hexdigest()
     
     def _sanitize_request(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Remove sensitive data from request for logging."""
-        sanitized = request_data.copy()
+        """Remove sensitive data from request for logging, including nested bodies."""
+        sanitized = dict(request_data)
         # Remove API keys and tokens
-        if 'headers' in sanitized:
-            headers = sanitized['headers'].copy()
-            for key in list(headers.keys()):
-                if 'key' in key.lower() or 'token' in key.lower() or 'authorization' in key.lower():
-                    headers[key] = '***REDACTED***'
-            sanitized['headers'] = headers
+        headers = sanitized.get('headers')
+        if isinstance(headers, dict):
+            sanitized['headers'] = {
+                key: _REDACTED if any(part in key.lower() for part in _SENSITIVE_HEADER_PARTS) else value
+                for key, value in headers.items()
+            }
+        # Walk the rest with an explicit stack, copying each container before editing it
+        stack = [(sanitized, key) for key in sanitized if key != 'headers']
+        while stack:
+            parent, key = stack.pop()
+            value = parent[key]
+            if isinstance(key, str) and _SENSITIVE_KEY_RE.search(key):
+                parent[key] = _REDACTED
+            elif isinstance(value, dict):
+                parent[key] = value = dict(value)
+                stack.extend((value, k) for k in value)
+            elif isinstance(value, list):
+                parent[key] = value = list(value)
+                stack.extend((value, i) for i in range(len(value)))
         return sanitized
     
+    def _save_one(self, audit: EvaluationAudit) -> None:
+        """
+        Write one finished audit to tasks/<n>_<task_id>.json.
+        
+        Finalizing a task costs one small file plus an event-log flush instead of
+        rewriting every audit; audit.json catches up on the regular schedule.
+        """
+        try:
+            self._events.flush()
+            safe_task_id = re.sub(r'[^\w.-]', '_', audit.task_id)
+            task_file = self.tasks_dir / f"{self._audit_index[id(audit)]}_{safe_task_id}.json"
+            payload = json_utils.dumps_bytes(audit.to_dict(), indent=True)
+            if self._writer is not None:
+                self._writer.write([(task_file, payload)], atomic=True)
+            else:
+                atomic_write_bytes(task_file, payload)
+        except Exception as e:
+            logger.error(f"Failed to save audit for {audit.task_id}: {e}")
+    
     def _save_audits(self) -> None:
         """Save all audit records to file."""
         try:
-            with open(self.audit_file, 'w') as f:
-                json.dump([a.to_dict() for a in self.audits], f, indent=2)
+            if not self._events.closed:
+                self._events.flush()
+            # Snapshot to bytes now; the file is replaced atomically so a crash
+            # mid-write never leaves a torn audit.json
+            payload = json_utils.dumps_bytes([a.to_dict() for a in self.audits], indent=True)
+            if self._writer is not None:
+                self._writer.write([(self.audit_file, payload)], atomic=True)
+            else:
+                atomic_write_bytes(self.audit_file, payload)
+            self._pending = 0
         except Exception as e:
             logger.error(f"Failed to save audit file: {e}")
     
@@ -299,6 +573,7 @@ class AuditLogger:
         Returns:
             Dictionary with audit summary statistics
         """
+        self.flush()
         if not self.audits:
             return {
                 'evaluation_id': self.evaluation_id,
@@ -309,23 +584,12 @@ class AuditLogger:
                 'total_git_operations': 0
             }
         
-        status_counts = {}
-        total_api_calls = 0
-        total_sfdx_commands = 0
-        total_git_operations = 0
-        
-        for audit in self.audits:
-            status_counts[audit.final_status] = status_counts.get(audit.final_status, 0) + 1
-            total_api_calls += len(audit.api_calls)
-            total_sfdx_commands += len(audit.sfdx_commands)
-            total_git_operations += len(audit.git_operations)
-        
         return {
             'evaluation_id': self.evaluation_id,
             'total_tasks': len(self.audits),
-            'status_counts': status_counts,
-            'total_api_calls': total_api_calls,
-            'total_sfdx_commands': total_sfdx_commands,
-            'total_git_operations': total_git_operations,
+            'status_counts': dict(+self._status_counts),
+            'total_api_calls': self._event_totals['api_calls'],
+            'total_sfdx_commands': self._event_totals['sfdx_commands'],
+            'total_git_operations': self._event_totals['git_operations'],
             'audit_file': str(self.audit_file)
         }
@@ -0,0 +1,86 @@
+"""
+Background file writes for audit and checkpoint persistence.
+
+A single shared daemon thread writes queued files in submission order, so the
+evaluation loop pays only for serialization and not for disk latency, which is
+noticeable on network and parallel filesystems. Callers snapshot their data
+to bytes before queueing, so later mutations never race with the write.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def atomic_write_bytes(path: Path, content: bytes) -> None:
+    """
+    Write content to a sibling temp file and rename it over path.
+
+    The temp name is unique per call, so concurrent writers of the same file
+    (other processes, or a synchronous and a background write) never share it.
+    """
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+class BackgroundWriter:
+    """Writes queued files on a dedicated thread, in the order they were queued."""
+
+    def __init__(self):
+        self.queue: "queue.Queue[Tuple[List[Tuple[Path, bytes]], bool]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, files: List[Tuple[Path, bytes]], atomic: bool = False) -> None:
+        """
+        Queue files to be written together, in order.
+
+        Args:
+            files: (path, content) pairs
+            atomic: Replace each file via a temp file and rename
+        """
+        self.queue.put((files, atomic))
+
+    def flush(self) -> None:
+        """Block until every queued write has reached the filesystem."""
+        self.queue.join()
+
+    def _run(self) -> None:
+        while True:
+            files, atomic = self.queue.get()
+            try:
+                for path, content in files:
+                    if atomic:
+                        atomic_write_bytes(path, content)
+                    else:
+                        path.write_bytes(content)
+            except Exception as e:
+                logger.error(f"Background write failed: {e}")
+            finally:
+                self.queue.task_done()
+
+
+_shared_writer: Optional[BackgroundWriter] = None
+_shared_writer_lock = threading.Lock()
+
+
+def get_background_writer() -> BackgroundWriter:
+    """Process-wide writer shared by audit logging and checkpoints."""
+    global _shared_writer
+    with _shared_writer_lock:
+        if _shared_writer is None:
+            _shared_writer = BackgroundWriter()
+            # Drain pending writes before the interpreter stops the daemon thread
+            atexit.register(_shared_writer.flush)
+        return _shared_writer
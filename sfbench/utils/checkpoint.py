@@ -7,26 +7,52 @@ on long-running evaluations.
 import json
 import hashlib
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 import logging
 
+from sfbench.utils import json_utils
+from sfbench.utils.background_io import atomic_write_bytes, get_background_writer
+
 logger = logging.getLogger(__name__)
 
+# Tasks file digests keyed by (path, mtime_ns, size); a changed file gets a new key
+_file_hash_cache: Dict[Tuple[str, int, int], str] = {}
+
 
 class CheckpointManager:
     """Manages checkpoints for evaluation runs."""
     
-    def __init__(self, checkpoint_dir: Path):
+    def __init__(self, checkpoint_dir: Path, background: bool = False):
         """
         Initialize checkpoint manager.
         
         Args:
             checkpoint_dir: Directory to store checkpoint files
+            background: Write checkpoint files on the shared background writer thread (default: False).
+                Call flush() or close() before relying on them from another process.
         """
         self.checkpoint_dir = Path(checkpoint_dir)
         self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
         self.current_checkpoint: Optional[str] = None
+        self._writer = get_background_writer() if background else None
+        # Verified checkpoints keyed by path; reused while file and sidecar are unchanged
+        self._checkpoint_cache: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+    
+    def flush(self) -> None:
+        """Wait for queued checkpoint writes to finish."""
+        if self._writer is not None:
+            self._writer.flush()
+    
+    def close(self) -> None:
+        """Flush pending writes."""
+        self.flush()
+    
+    def __enter__(self) -> 'CheckpointManager':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
     
     def create_checkpoint(
         self,
@@ -59,16 +85,18 @@ class CheckpointManager:
         checkpoint_file = self.checkpoint_dir / f"{evaluation_id}_checkpoint.json"
         hash_file = self.checkpoint_dir / f"{evaluation_id}_checkpoint.sha256"
         
-        # Calculate hash BEFORE adding hash field (to avoid circular dependency)
-        checkpoint_content_no_hash = json.dumps(checkpoint_data, indent=2, sort_keys=True)
-        checkpoint_hash = hashlib.sha256(checkpoint_content_no_hash.encode()).hexdigest()
-        
-        # Add hash to data
-        checkpoint_data["checkpoint_hash"] = checkpoint_hash
-        checkpoint_content = json.dumps(checkpoint_data, indent=2, sort_keys=True)
+        # Serialize once and hash the exact bytes written; the hash lives only
+        # in the sidecar file, so verification never re-serializes the data
+        checkpoint_content = json_utils.dumps_bytes(checkpoint_data, indent=True, sort_keys=True)
+        checkpoint_hash = hashlib.sha256(checkpoint_content).hexdigest()
         
-        checkpoint_file.write_text(checkpoint_content)
-        hash_file.write_text(checkpoint_hash)
+        # Replace both files atomically so a crash never leaves either one torn
+        files = [(checkpoint_file, checkpoint_content), (hash_file, checkpoint_hash.encode())]
+        if self._writer is not None:
+            self._writer.write(files, atomic=True)
+        else:
+            for path, content in files:
+                atomic_write_bytes(path, content)
         
         self.current_checkpoint = str(checkpoint_file)
         logger.info(f"Checkpoint created: {checkpoint_file} (hash: {checkpoint_hash[:16]}...)")
@@ -85,6 +113,7 @@ class CheckpointManager:
         Returns:
             Checkpoint data dictionary or None if not found/invalid
         """
+        self.flush()
         if checkpoint_file is None:
             checkpoint_file = self.current_checkpoint
         
@@ -97,27 +126,55 @@ class CheckpointManager:
             return None
         
         try:
-            checkpoint_data = json.loads(checkpoint_path.read_text())
+            stat = checkpoint_path.stat()
+            hash_file = checkpoint_path.with_suffix(".sha256")
+            hash_mtime = hash_file.stat().st_mtime_ns if hash_file.exists() else 0
+            version = (stat.st_mtime_ns, stat.st_size, hash_mtime)
+            cached = self._checkpoint_cache.get(str(checkpoint_path))
+            if cached is not None and cached[0] == version:
+                return dict(cached[1])
             
-            # Verify checkpoint integrity
-            stored_hash = checkpoint_data.get("checkpoint_hash")
-            if stored_hash:
-                # Recalculate hash (excluding the hash field itself)
-                checkpoint_data_no_hash = {k: v for k, v in checkpoint_data.items() if k != "checkpoint_hash"}
-                checkpoint_content = json.dumps(checkpoint_data_no_hash, indent=2, sort_keys=True)
-                calculated_hash = hashlib.sha256(checkpoint_content.encode()).hexdigest()
-                
-                if calculated_hash != stored_hash:
+            checkpoint_content = checkpoint_path.read_bytes()
+            checkpoint_data = json_utils.loads(checkpoint_content)
+            
+            # Verify checkpoint integrity against the sidecar hash of the file bytes
+            stored_hash = hash_file.read_text().strip() if hash_file.exists() else None
+            checkpoint_hash = hashlib.sha256(checkpoint_content).hexdigest()
+            if stored_hash != checkpoint_hash:
+                # Older checkpoints embed a hash of the re-serialized data instead
+                checkpoint_hash = checkpoint_data.pop("checkpoint_hash", None)
+                if (checkpoint_hash or stored_hash) and checkpoint_hash not in (
+                    _checkpoint_hash(checkpoint_data),
+                    _legacy_checkpoint_hash(checkpoint_data)
+                ):
                     logger.error(f"Checkpoint integrity check failed: hash mismatch")
                     return None
+            if checkpoint_hash:
+                checkpoint_data["checkpoint_hash"] = checkpoint_hash
             
+            self._checkpoint_cache[str(checkpoint_path)] = (version, checkpoint_data)
             logger.info(f"Checkpoint loaded: {checkpoint_file} (evaluation: {checkpoint_data.get('evaluation_id')})")
-            return checkpoint_data
+            return dict(checkpoint_data)
             
         except Exception as e:
             logger.error(f"Failed to load checkpoint: {str(e)}")
             return None
     
+    def bulk_load(self, checkpoint_file: Optional[str] = None) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        Get completed task IDs and results from one checkpoint load.
+        
+        Args:
+            checkpoint_file: Path to checkpoint file
+            
+        Returns:
+            (completed task IDs, results dictionary); empty if the checkpoint is missing or invalid
+        """
+        checkpoint = self.load_checkpoint(checkpoint_file)
+        if checkpoint:
+            return checkpoint.get("completed_tasks", []), checkpoint.get("results", {})
+        return [], {}
+    
     def get_completed_tasks(self, checkpoint_file: Optional[str] = None) -> List[str]:
         """
         Get list of completed task IDs from checkpoint.
@@ -155,10 +212,11 @@ class CheckpointManager:
         Returns:
             List of checkpoint metadata dictionaries
         """
+        self.flush()
         checkpoints = []
         for checkpoint_file in self.checkpoint_dir.glob("*_checkpoint.json"):
             try:
-                data = json.loads(checkpoint_file.read_text())
+                data = json_utils.loads(checkpoint_file.read_bytes())
                 checkpoints.append({
                     "file": str(checkpoint_file),
                     "evaluation_id": data.get("evaluation_id"),
@@ -171,6 +229,36 @@ class CheckpointManager:
         return sorted(checkpoints, key=lambda x: x.get("timestamp", ""), reverse=True)
 
 
+def _file_sha256(path: Path) -> str:
+    """SHA-256 of a file, read in chunks and cached until the file changes."""
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    if key not in _file_hash_cache:
+        _file_hash_cache[key] = _read_file_sha256(path)
+    return _file_hash_cache[key]
+
+
+def _read_file_sha256(path: Path) -> str:
+    """SHA-256 of a file, read in chunks rather than loaded whole."""
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+def _checkpoint_hash(checkpoint_data: Dict[str, Any]) -> str:
+    """SHA-256 of the compact, key-sorted encoding embedded by older checkpoints."""
+    return hashlib.sha256(json_utils.dumps_canonical(checkpoint_data)).hexdigest()
+
+
+def _legacy_checkpoint_hash(checkpoint_data: Dict[str, Any]) -> str:
+    """SHA-256 of the indented stdlib encoding embedded by the oldest checkpoints."""
+    return hashlib.sha256(json.dumps(checkpoint_data, indent=2, sort_keys=True).encode()).hexdigest()
+
+
 def generate_evaluation_hash(
     model_name: str,
     tasks_file: Path,
@@ -193,7 +281,7 @@ def generate_evaluation_hash(
     hash_input = {
         "model_name": model_name,
         "tasks_file": str(tasks_file),
-        "tasks_file_hash": hashlib.sha256(tasks_file.read_bytes()).hexdigest() if tasks_file.exists() else "",
+        "tasks_file_hash": _file_sha256(tasks_file) if tasks_file.exists() else "",
         "config": config
     }
     
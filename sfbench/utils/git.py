@@ -1,9 +1,87 @@
+import atexit
+import hashlib
+import os
+import re
+import select
 import subprocess
 import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from sfbench.config import get_config
 
+try:
+    import fcntl
+except ImportError:  # Windows: the clone cache is then unlocked
+    fcntl = None
+
+# Resolve binaries once instead of searching PATH on every subprocess call
+GIT = shutil.which('git') or 'git'
+# Every git call runs with these settings: no alternate-refs connectivity walk
+# (costly once clones borrow objects from a mirror), no auto-gc or commit-graph
+# writes in throwaway checkouts, and protocol v2 for ref negotiation
+_GIT_FAST = [
+    GIT,
+    '-c', 'core.alternateRefsCommand=exit 0',
+    '-c', 'gc.auto=0',
+    '-c', 'fetch.writeCommitGraph=false',
+    '-c', 'protocol.version=2',
+    # HTTP/2 lets curl multiplex a transfer's requests over one connection; a
+    # transfer stalled below 1 KB/s for a minute is abandoned instead of
+    # holding a worker until the overall timeout
+    '-c', 'http.version=HTTP/2',
+    '-c', 'http.lowSpeedLimit=1000',
+    '-c', 'http.lowSpeedTime=60',
+]
+PATCH = shutil.which('patch') or 'patch'
+# A complete SHA-1 or SHA-256 object name, as opposed to a branch, tag or abbreviation
+_FULL_SHA_RE = re.compile(r'[0-9a-f]{40}(?:[0-9a-f]{24})?')
+# select() only accepts pipes on POSIX; elsewhere GitWorker uses rev-parse per lookup
+_CAN_POLL_PIPES = os.name != 'nt'
+
+# Line-start patterns scanned over the whole patch text in one regex call
+_DIFF_CONTENT_RE = re.compile(r'^(?:@@|\+(?!\+\+)|-(?!--))', re.MULTILINE)
+_DIFF_HEADER_RE = re.compile(r'^diff --git', re.MULTILINE)
+_DIFF_GIT_LINE_RE = re.compile(r'^\s*diff --git', re.MULTILINE)
+_OLD_FILE_RE = re.compile(r'^---', re.MULTILINE)
+_NEW_FILE_RE = re.compile(r'^\+\+\+', re.MULTILINE)
+_HUNK_RE = re.compile(r'^@@', re.MULTILINE)
+_CONTENT_LINE_RE = re.compile(r'^[ +-]', re.MULTILINE)
+# A single-file patch whose every line _clean_patch would keep unchanged: diff
+# metadata and headers, non-empty context lines, and +/- lines starting with a
+# letter or with three or more characters beginning with ASCII punctuation.
+# No line may be empty or end in whitespace
+_WELL_FORMED_PATCH_RE = re.compile(
+    r'diff --git [^\n]*\S'
+    r'(?:\n(?:'
+    r'(?:---|\+\+\+|@@|\\|index|new file|deleted file|similarity|rename|diff)(?:[^\n]*\S)?'
+    r'| [^\n]*\S'
+    r'|[+-][^\S\n]*(?:[A-Za-z](?:[^\n]*\S)?|(?![.*-] )[!-/:-@\[-`{-~][^\n]+\S)'
+    r'))*\n?'
+)
+# Patch files go to memory-backed /dev/shm where it exists (Linux)
+_PATCH_TMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+# Markdown fence lines (leading whitespace allowed) together with their line break
+_FENCE_LINE_RE = re.compile(r'^[^\S\n]*```[^\n]*\n', re.MULTILINE)
+
+_FILE_HEADER_PREFIXES = ('---', '+++')
+_PRE_DIFF_PREFIXES = ('diff', '---', '+++', '@@', 'index')
+_DIFF_LINE_CHARS = frozenset(' +-')
+_LAST_LINE_CHARS = frozenset(' +-\\')
+_HUNK_LINE_PREFIXES = (' ', '+', '-', '\\')
+_INCOMPLETE_TAIL_PREFIXES = ('@@', '---', '+++')
+_DIFF_METADATA_PREFIXES = ('index', 'new file', 'deleted file', 'similarity', 'rename', 'diff', '---', '+++')
+
+
+def _decode(output: Optional[bytes]) -> str:
+    """Decode captured process output for error messages."""
+    return output.decode('utf-8', errors='replace') if output else ''
+
 
 class GitError(Exception):
     """Base exception for Git operations."""
@@ -25,25 +103,174 @@ class PatchApplicationError(GitError):
     pass
 
 
-def clone_repository(repo_url: str, target_dir: Path, timeout: Optional[int] = None) -> None:
-    """Clone a repository with configurable timeout."""
+class GitWorker:
+    """
+    Long-running `git cat-file --batch-check` process for one repository.
+    
+    Object lookups are written to the process's stdin and answered one line at
+    a time, so repeated checks against the same repository share one fork. Use
+    it as a context manager so the process is stopped when the caller is done.
+    """
+    
+    def __init__(self, repo_dir: Path, timeout: Optional[int] = None):
+        self.repo_dir = Path(repo_dir)
+        self.timeout = timeout
+        self._proc: Optional[subprocess.Popen] = None
+    
+    def resolve(self, rev: str) -> Optional[str]:
+        """
+        Resolve a revision to a commit SHA.
+        
+        In a blobless clone the lookup may fetch from origin; if no answer arrives
+        within the timeout, the process is killed and the lookup is retried once
+        with `git rev-parse` under the same timeout.
+        
+        Args:
+            rev: Commit hash, branch, tag or HEAD
+            
+        Returns:
+            Full commit SHA, or None if the revision does not name a commit in this repository
+        
+        Raises:
+            GitError: If the rev-parse fallback also times out
+        """
+        if not rev or any(c.isspace() for c in rev):
+            return None
+        if not _CAN_POLL_PIPES:
+            return self._rev_parse(rev)
+        try:
+            if self._proc is None or self._proc.poll() is not None:
+                self._proc = subprocess.Popen(
+                    [*_GIT_FAST, 'cat-file', '--batch-check'],
+                    cwd=str(self.repo_dir),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    bufsize=0
+                )
+            self._proc.stdin.write(f"{rev}^{{commit}}\n".encode())
+            ready, _, _ = select.select([self._proc.stdout], [], [], self.timeout)
+            if not ready:
+                self.close(kill=True)
+                return self._rev_parse(rev)
+            line = self._proc.stdout.readline().decode('utf-8', errors='replace').split()
+        except (BrokenPipeError, OSError):
+            self.close()
+            return None
+        # "<sha> commit <size>" on success; "<rev> missing" or "<rev> ambiguous" otherwise
+        if len(line) == 3 and line[1] == 'commit':
+            return line[0]
+        return None
+    
+    def _rev_parse(self, rev: str) -> Optional[str]:
+        """Resolve rev with a one-off `git rev-parse`, bounded by the timeout."""
+        try:
+            result = subprocess.run(
+                [*_GIT_FAST, 'rev-parse', '--verify', '--quiet', f"{rev}^{{commit}}"],
+                cwd=str(self.repo_dir),
+                capture_output=True,
+                timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired:
+            raise GitError(f"Git rev-parse of {rev} timed out after {self.timeout} seconds")
+        except OSError:
+            return None
+        sha = _decode(result.stdout).strip()
+        return sha if result.returncode == 0 and sha else None
+    
+    def close(self, kill: bool = False) -> None:
+        """Stop the cat-file process; kill it outright if it may be stuck."""
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            if kill:
+                proc.kill()
+            else:
+                proc.stdin.close()
+            proc.wait(timeout=5)
+        except Exception:
+            proc.kill()
+        finally:
+            for pipe in (proc.stdin, proc.stdout):
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+    
+    def __enter__(self) -> 'GitWorker':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def clone_repository(
+    repo_url: str,
+    target_dir: Path,
+    timeout: Optional[int] = None,
+    depth: Optional[int] = None
+) -> None:
+    """
+    Clone a repository with configurable timeout.
+    
+    By default the clone is shallow, blobless and limited to the default branch;
+    checkout_commit fetches the requested commit if it is not in that history.
+    When clone_cache_dir is configured, a bare mirror per repository is kept
+    there and refreshed, and the task clone is made from it locally.
+    
+    Args:
+        repo_url: Repository URL
+        target_dir: Directory to clone into (replaced if it exists)
+        timeout: Timeout in seconds (default: config timeout_git)
+        depth: Commits of history to fetch; 0 clones full history (default: config clone_depth).
+            Ignored when the clone cache is used.
+    """
+    config = get_config()
     if timeout is None:
-        timeout = get_config().timeout_git
-    if target_dir.exists():
-        shutil.rmtree(target_dir)
+        timeout = config.timeout_git
+    if depth is None:
+        depth = config.clone_depth
+    _remove_tree_in_background(target_dir)
     
     target_dir.parent.mkdir(parents=True, exist_ok=True)
     
+    cache_dir = config.get('clone_cache_dir')
+    reference = _refresh_clone_cache(repo_url, Path(cache_dir).expanduser(), timeout) if cache_dir else None
+    if reference is not None:
+        # The mirror was just brought up to date, so clone it locally (objects are
+        # hard-linked, no network) and point origin back at the real remote after
+        cmd = [*_GIT_FAST, 'clone', str(reference), str(target_dir)]
+    elif depth > 0:
+        cmd = [
+            *_GIT_FAST, 'clone',
+            '--filter=blob:none', '--no-tags', '--single-branch', '--depth', str(depth),
+            repo_url, str(target_dir)
+        ]
+    else:
+        cmd = [*_GIT_FAST, 'clone', repo_url, str(target_dir)]
+    
     try:
         result = subprocess.run(
-            ['git', 'clone', repo_url, str(target_dir)],
-            capture_output=True,
-            text=True,
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             timeout=timeout
         )
         
         if result.returncode != 0:
-            raise GitError(f"Failed to clone repository: {result.stderr}")
+            raise GitError(f"Failed to clone repository: {_decode(result.stderr)}")
+        
+        if reference is not None:
+            result = subprocess.run(
+                [*_GIT_FAST, 'remote', 'set-url', 'origin', repo_url],
+                cwd=str(target_dir),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=timeout
+            )
+            if result.returncode != 0:
+                raise GitError(f"Failed to set origin of cloned repository: {_decode(result.stderr)}")
             
     except subprocess.TimeoutExpired:
         raise GitError(f"Git clone timed out after {timeout} seconds")
@@ -51,21 +278,156 @@ def clone_repository(repo_url: str, target_dir: Path, timeout: Optional[int] = N
         raise GitError(f"Unexpected error cloning repository: {str(e)}")
 
 
+def clone_repositories_bulk(
+    specs: Sequence[Tuple[str, Path]],
+    max_workers: int = 8,
+    timeout: Optional[int] = None
+) -> Dict[Path, GitError]:
+    """
+    Clone several repositories concurrently.
+    
+    Clones are subprocess-bound, so threads overlap them fully. Repositories that
+    share a URL also share the clone cache mirror when one is configured.
+    
+    Args:
+        specs: (repo_url, target_dir) pairs
+        max_workers: Maximum concurrent clones (default: 8)
+        timeout: Timeout in seconds per clone (default: config timeout_git)
+        
+    Returns:
+        Errors keyed by target directory for the clones that failed; empty if all succeeded
+    """
+    def clone(spec: Tuple[str, Path]) -> Optional[GitError]:
+        try:
+            clone_repository(spec[0], spec[1], timeout=timeout)
+        except GitError as e:
+            return e
+        return None
+    
+    if not specs:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(specs)))) as executor:
+        outcomes = list(executor.map(clone, specs))
+    return {target_dir: error for (_, target_dir), error in zip(specs, outcomes) if error is not None}
+
+
+# Trash directories being deleted by this process, and how long interpreter exit
+# waits for them; whatever is left is swept by the next clone of the same path
+_trash_removers: Dict[Path, threading.Thread] = {}
+_trash_lock = threading.Lock()
+_TRASH_EXIT_WAIT = 60
+
+
+def _remove_tree_in_background(path: Path) -> Optional[threading.Thread]:
+    """
+    Move a directory out of the way and delete it on a background thread.
+    
+    The rename is a single syscall on the same filesystem, so the caller can reuse
+    the path at once. Falls back to a synchronous delete if the rename fails.
+    Trash left next to path by earlier runs is deleted on the same thread.
+    
+    Returns:
+        The deleting thread, or None if there was nothing left to delete in the background
+    """
+    prefix = f".trash-{path.name}-"
+    with _trash_lock:
+        trash_dirs = [
+            sibling for sibling in path.parent.iterdir()
+            if sibling.name.startswith(prefix) and sibling not in _trash_removers
+        ] if path.parent.is_dir() else []
+    if path.exists():
+        trash = path.with_name(f"{prefix}{uuid.uuid4().hex}")
+        try:
+            os.rename(path, trash)
+            trash_dirs.append(trash)
+        except OSError:
+            shutil.rmtree(path)
+    if not trash_dirs:
+        return None
+    
+    def remove() -> None:
+        for trash_dir in trash_dirs:
+            shutil.rmtree(trash_dir, ignore_errors=True)
+            with _trash_lock:
+                _trash_removers.pop(trash_dir, None)
+    
+    thread = threading.Thread(target=remove, name="git-trash-remover", daemon=True)
+    with _trash_lock:
+        _trash_removers.update(dict.fromkeys(trash_dirs, thread))
+    thread.start()
+    return thread
+
+
+@atexit.register
+def _join_trash_removers() -> None:
+    """Give pending background deletes a bounded time to finish before exit."""
+    deadline = time.monotonic() + _TRASH_EXIT_WAIT
+    with _trash_lock:
+        threads = set(_trash_removers.values())
+    for thread in threads:
+        thread.join(timeout=max(0.0, deadline - time.monotonic()))
+
+
+def _refresh_clone_cache(repo_url: str, cache_root: Path, timeout: int) -> Optional[Path]:
+    """
+    Create or update the bare mirror of repo_url under cache_root.
+    
+    Returns:
+        Path to the mirror, or None if it could not be created or updated
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+    
+    cache_root.mkdir(parents=True, exist_ok=True)
+    mirror = cache_root / hashlib.sha1(repo_url.encode()).hexdigest()
+    # Parallel workers cloning the same repository wait for one refresh
+    with open(cache_root / f"{mirror.name}.lock", 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        exists = mirror.exists()
+        if exists:
+            cmd = [*_GIT_FAST, '-C', str(mirror), 'fetch', '--prune', 'origin']
+        else:
+            cmd = [*_GIT_FAST, 'clone', '--mirror', repo_url, str(mirror)]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout)
+            error = _decode(result.stderr) if result.returncode != 0 else None
+        except (subprocess.TimeoutExpired, OSError) as e:
+            error = str(e)
+        if error is not None and not exists:
+            shutil.rmtree(mirror, ignore_errors=True)
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    if error is None:
+        return mirror
+    logger.warning(f"Clone cache update failed for {repo_url}: {error}")
+    # A stale mirror still saves most of the download; a half-made one was removed
+    return mirror if exists else None
+
+
 def checkout_commit(repo_dir: Path, commit_hash: str, timeout: Optional[int] = None) -> None:
     """Checkout a commit with configurable timeout."""
     if timeout is None:
         timeout = get_config().timeout_git
+    # Validate the commit through one cat-file worker; a commit that cannot be
+    # found or fetched fails before checkout, and a checkout that is already in
+    # place is skipped
+    with GitWorker(repo_dir, timeout) as worker:
+        target = _resolve_commit(worker, commit_hash, "checkout")
+        if worker.resolve('HEAD') == target:
+            return
     try:
         result = subprocess.run(
-            ['git', 'checkout', commit_hash],
+            [*_GIT_FAST, 'checkout', commit_hash],
             cwd=str(repo_dir),
-            capture_output=True,
-            text=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             timeout=timeout
         )
         
         if result.returncode != 0:
-            raise GitError(f"Failed to checkout commit {commit_hash}: {result.stderr}")
+            raise GitError(f"Failed to checkout commit {commit_hash}: {_decode(result.stderr)}")
             
     except subprocess.TimeoutExpired:
         raise GitError(f"Git checkout timed out after {timeout} seconds")
@@ -73,6 +435,115 @@ def checkout_commit(repo_dir: Path, commit_hash: str, timeout: Optional[int] = N
         raise GitError(f"Unexpected error checking out commit: {str(e)}")
 
 
+def reset_repository(
+    repo_dir: Path,
+    commit_hash: str,
+    repo_url: Optional[str] = None,
+    timeout: Optional[int] = None
+) -> None:
+    """
+    Return an existing clone to a commit, discarding local changes and untracked files.
+    
+    A full commit SHA already in the clone needs no network access, so reusing
+    a task's repository this way is much cheaper than clone_repository followed
+    by checkout_commit. Any other revision, such as a branch name, is fetched
+    from origin first so a stale local ref is never used.
+    
+    Args:
+        repo_dir: Existing clone
+        commit_hash: Commit SHA or branch to reset to
+        repo_url: If given, the clone's origin must point here
+        timeout: Timeout in seconds for each git command (default: config timeout_git)
+    
+    Raises:
+        GitError: If repo_dir is not a matching clone or the reset fails
+    """
+    if timeout is None:
+        timeout = get_config().timeout_git
+    try:
+        if repo_url is not None:
+            result = subprocess.run(
+                [*_GIT_FAST, 'remote', 'get-url', 'origin'],
+                cwd=str(repo_dir),
+                capture_output=True,
+                timeout=timeout
+            )
+            if result.returncode != 0 or _decode(result.stdout).strip() != repo_url:
+                raise GitError(f"Cannot reset {repo_dir}: not a clone of {repo_url}")
+        
+        if _FULL_SHA_RE.fullmatch(commit_hash):
+            with GitWorker(repo_dir, timeout) as worker:
+                target = _resolve_commit(worker, commit_hash, "reset to")
+        else:
+            # Branches move: reset to what origin has now, not to the local ref
+            fetch = [*_GIT_FAST, 'fetch', '--no-tags', 'origin', commit_hash]
+            if (Path(repo_dir) / '.git' / 'shallow').exists():
+                fetch[-2:-2] = ['--depth=1']
+            result = subprocess.run(
+                fetch,
+                cwd=str(repo_dir),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=timeout
+            )
+            if result.returncode != 0:
+                raise GitError(f"Failed to fetch {commit_hash} from origin: {_decode(result.stderr)}")
+            target = 'FETCH_HEAD'
+        
+        for cmd in ([*_GIT_FAST, 'reset', '--hard', '-q', target], [*_GIT_FAST, 'clean', '-ffdxq']):
+            result = subprocess.run(
+                cmd,
+                cwd=str(repo_dir),
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=timeout
+            )
+            if result.returncode != 0:
+                raise GitError(f"Failed to reset repository to {commit_hash}: {_decode(result.stderr)}")
+    
+    except GitError:
+        raise
+    except subprocess.TimeoutExpired:
+        raise GitError(f"Git reset timed out after {timeout} seconds")
+    except Exception as e:
+        raise GitError(f"Unexpected error resetting repository: {str(e)}")
+
+
+def _resolve_commit(worker: GitWorker, commit_hash: str, action: str) -> str:
+    """Full SHA of commit_hash, fetching it from origin if the clone lacks it."""
+    target = worker.resolve(commit_hash)
+    if target is None:
+        # Shallow clones only hold the tip of the default branch. Blobless clones
+        # fetch a missing commit lazily on lookup; anything else is fetched here
+        _fetch_commit(worker.repo_dir, commit_hash, worker.timeout)
+        worker.close()
+        target = worker.resolve(commit_hash)
+    if target is None:
+        raise GitError(f"Failed to {action} commit {commit_hash}: commit not found in repository")
+    return target
+
+
+def _fetch_commit(repo_dir: Path, commit_hash: str, timeout: int) -> None:
+    """Fetch a single commit from origin; failures surface as a missing commit in the caller."""
+    import logging
+    logger = logging.getLogger(__name__)
+    
+    try:
+        result = subprocess.run(
+            [*_GIT_FAST, 'fetch', '--depth=1', '--no-tags', 'origin', commit_hash],
+            cwd=str(repo_dir),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=timeout
+        )
+        if result.returncode != 0:
+            logger.debug(f"Fetching {commit_hash} failed: {_decode(result.stderr)}")
+    except subprocess.TimeoutExpired:
+        raise GitError(f"Git fetch timed out after {timeout} seconds")
+    except OSError as e:
+        logger.debug(f"Fetching {commit_hash} failed: {e}")
+
+
 def apply_patch(repo_dir: Path, patch_diff: str, timeout: Optional[int] = None) -> None:
     """Apply a patch with configurable timeout."""
     if timeout is None:
@@ -85,11 +556,13 @@ def apply_patch(repo_dir: Path, patch_diff: str, timeout: Optional[int] = None)
     Only fails if ALL strategies fail.
     
     Strategies (in order):
-    1. git apply --check (validation only)
-    2. git apply --whitespace=fix --ignore-whitespace (strict)
-    3. git apply --whitespace=fix --ignore-whitespace --reject (allows partial)
-    4. git apply --3way --whitespace=fix (3-way merge for context mismatches)
-    5. patch --batch --fuzz=5 -p1 (fuzzy matching, SWE-bench fallback)
+    1. git apply --recount --whitespace=fix --ignore-whitespace (strict, atomic; doubles as validation)
+    2. git apply --recount --whitespace=fix --ignore-whitespace --reject (allows partial; skipped if 1 failed)
+    3. git apply --recount --3way --whitespace=fix (3-way merge for context mismatches)
+    4. patch --batch --fuzz=5 -p1 (fuzzy matching, SWE-bench fallback)
+    
+    Strategies 3 and 4 are dry-run concurrently once 1 fails, and only those whose
+    dry run succeeds are applied, so a failed fallback never leaves partial changes.
     """
     import logging
     logger = logging.getLogger(__name__)
@@ -114,181 +587,239 @@ def apply_patch(repo_dir: Path, patch_diff: str, timeout: Optional[int] = None)
         raise PatchApplicationError("Patch is empty after cleaning - AI model generated empty or invalid patch")
     
     # Check if patch has valid diff format (at least one line starting with +, -, or @@)
-    has_diff_content = any(
-        line.startswith(('+', '-', '@@')) and not line.startswith('+++') and not line.startswith('---')
-        for line in cleaned_patch.split('\n')
-    )
+    has_diff_content = _DIFF_CONTENT_RE.search(cleaned_patch) is not None
     
     if not has_diff_content:
         raise PatchApplicationError("Patch does not contain valid diff content - AI model did not generate a valid diff")
     
     # VALIDATE PATCH STRUCTURE: Check for complete hunks
     # "unexpected end of file" errors occur when hunks are incomplete (missing context lines)
-    patch_lines = cleaned_patch.split('\n')
-    hunk_headers = [i for i, line in enumerate(patch_lines) if line.startswith('@@')]
-    
-    if hunk_headers:
-        # Validate each hunk is complete
-        for i, hunk_idx in enumerate(hunk_headers):
-            # Get hunk end (next hunk header or end of patch)
-            hunk_end = hunk_headers[i + 1] if i + 1 < len(hunk_headers) else len(patch_lines)
-            hunk_lines = patch_lines[hunk_idx:hunk_end]
-            
-            # A valid hunk should have:
-            # 1. Hunk header (@@ ... @@)
-            # 2. At least one context line (starting with space) or diff line (+/-)
-            # 3. Should not end abruptly (last line should be context or diff, not empty)
-            
-            if len(hunk_lines) < 2:
-                # Hunk with only header - incomplete
-                logger.warning(f"Detected incomplete hunk at line {hunk_idx + 1}: hunk header without content")
-                # Try to repair: if this is the last hunk and it's incomplete, remove it
-                if i == len(hunk_headers) - 1:
-                    logger.info(f"Removing incomplete final hunk (line {hunk_idx + 1})")
-                    cleaned_patch = '\n'.join(patch_lines[:hunk_idx])
-                    patch_lines = cleaned_patch.split('\n')  # Update for next iteration
-                    break
-            else:
-                # Check if hunk ends properly (last line should be context or diff)
-                last_hunk_line = hunk_lines[-1].strip()
-                if not last_hunk_line or (not last_hunk_line.startswith((' ', '+', '-', '\\'))):
-                    # Hunk ends with empty line or invalid content - might be truncated
-                    logger.warning(f"Detected potentially truncated hunk at line {hunk_idx + 1}: last line is '{last_hunk_line[:50] if last_hunk_line else 'empty'}'")
-                    # If this is the last hunk, try to repair by removing incomplete trailing lines
-                    if i == len(hunk_headers) - 1:
-                        # Find last valid diff line
-                        last_valid_idx = hunk_idx
-                        for j in range(len(hunk_lines) - 1, 0, -1):
-                            if hunk_lines[j].strip() and hunk_lines[j].startswith((' ', '+', '-', '\\')):
-                                last_valid_idx = hunk_idx + j + 1
-                                break
-                        if last_valid_idx < len(patch_lines):
-                            logger.info(f"Truncating incomplete final hunk: removing lines {last_valid_idx + 1} to {len(patch_lines)}")
-                            cleaned_patch = '\n'.join(patch_lines[:last_valid_idx])
-                            patch_lines = cleaned_patch.split('\n')  # Update for next iteration
-                            break
-    
-    # VALIDATION PIPELINE: Check patch validity before applying
-    try:
-        check_result = subprocess.run(
-            ['git', 'apply', '--check', '--whitespace=fix', '--ignore-whitespace'],
-            input=cleaned_patch,
-            cwd=str(repo_dir),
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
-        if check_result.returncode == 0:
-            logger.debug(f"Patch validation passed: git apply --check succeeded")
-        else:
-            # Log at INFO level (not WARNING) since fallback strategies will handle it
-            error_preview = check_result.stderr[:200] if check_result.stderr else "Unknown validation error"
-            logger.info(f"Patch validation check failed (will try fallback strategies): {error_preview}")
-    except subprocess.TimeoutExpired:
-        logger.warning("Patch validation timed out (will try fallback strategies)")
-    except Exception as e:
-        logger.warning(f"Patch validation error (will try fallback strategies): {str(e)}")
+    cleaned_patch = _check_hunks(cleaned_patch)
     
-    # Multi-strategy patch application (inspired by SWE-bench)
+    # Multi-strategy patch application (inspired by SWE-bench). Each command
+    # gets the path of the cleaned patch, written once below, appended to "cmd".
+    # --recount takes hunk sizes from the hunk bodies rather than the @@ headers,
+    # which models often get wrong; for correctly counted hunks it changes nothing
     strategies = [
         {
             "name": "git_apply_strict",
-            "cmd": ['git', 'apply', '--whitespace=fix', '--ignore-whitespace'],
-            "use_stdin": True
+            "cmd": [*_GIT_FAST, 'apply', '--recount', '--whitespace=fix', '--ignore-whitespace']
         },
         {
             "name": "git_apply_reject",
-            "cmd": ['git', 'apply', '--whitespace=fix', '--ignore-whitespace', '--reject'],
-            "use_stdin": True
+            "cmd": [*_GIT_FAST, 'apply', '--recount', '--whitespace=fix', '--ignore-whitespace', '--reject']
         },
         {
             "name": "git_apply_3way",
-            "cmd": ['git', 'apply', '--3way', '--whitespace=fix'],
-            "use_stdin": True
+            "cmd": [*_GIT_FAST, 'apply', '--recount', '--3way', '--whitespace=fix'],
+            "probe_args": ['--check'],
+            # git apply's parser rejected the patch; a 3-way merge parses it the same way
+            "skip_on_check_error": ('corrupt patch',)
         },
         {
             "name": "patch_fuzzy",
-            "cmd": ['patch', '--batch', '--fuzz=5', '-p1'],
-            "use_stdin": True,
-            "requires_patch_file": False  # patch command can use stdin
+            "cmd": [PATCH, '--batch', '--fuzz=5', '-p1'],
+            "file_flag": '-i',  # patch takes its input file as an option
+            "errors_on_stdout": True,  # patch reports failed hunks on stdout
+            "probe_args": ['--dry-run']
         }
     ]
     
+    # git apply without --reject is atomic: it applies every hunk or none, so the
+    # strict strategy doubles as the validation check. When it fails, --reject
+    # (same flags, non-zero exit whenever a hunk is rejected) cannot succeed
+    # either; go straight to the strategies that tolerate context drift
+    check_error = None
     last_error = None
-    for strategy in strategies:
-        try:
-            if strategy["use_stdin"]:
+    probe_errors: Dict[str, str] = {}
+    attempted: List[str] = []
+    ruled_out: List[str] = []
+    # Write the patch once, to memory-backed storage where available, and hand
+    # every strategy the same file instead of piping the bytes to each one
+    with tempfile.TemporaryDirectory(prefix="sfbench-patch-", dir=_PATCH_TMP_DIR) as patch_dir:
+        patch_file = Path(patch_dir) / "cleaned.patch"
+        patch_file.write_bytes(cleaned_patch.encode('utf-8'))
+        
+        for strategy in strategies:
+            if check_error is not None and strategy["name"] == "git_apply_reject":
+                ruled_out.append(strategy["name"])
+                continue
+            if strategy["name"] in probe_errors:
+                ruled_out.append(strategy["name"])
+                last_error = probe_errors[strategy["name"]]
+                continue
+            attempted.append(strategy["name"])
+            # git reports errors on stderr; its stdout is never read, so it is discarded
+            stdout = subprocess.PIPE if strategy.get("errors_on_stdout") else subprocess.DEVNULL
+            try:
                 result = subprocess.run(
-                    strategy["cmd"],
-                    input=cleaned_patch,
+                    _strategy_argv(strategy, patch_file),
                     cwd=str(repo_dir),
-                    capture_output=True,
-                    text=True,
+                    stdout=stdout,
+                    stderr=subprocess.PIPE,
                     timeout=timeout
                 )
-            else:
-                # For strategies that need file input (future use)
-                import tempfile
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.patch', delete=False) as f:
-                    f.write(cleaned_patch)
-                    patch_file = f.name
                 
-                try:
-                    result = subprocess.run(
-                        strategy["cmd"] + [patch_file],
-                        cwd=str(repo_dir),
-                        capture_output=True,
-                        text=True,
-                        timeout=timeout
-                    )
-                finally:
-                    import os
-                    os.unlink(patch_file)
-            
-            if result.returncode == 0:
-                # Success! Log which strategy worked (for debugging)
-                if strategy["name"] != "git_apply_strict":
-                    logger.info(f"Patch applied using fallback strategy: {strategy['name']}")
-                else:
-                    logger.debug(f"Patch applied successfully using strict strategy")
-                return  # Success
-            
-            # Store error for final reporting
-            last_error = result.stderr or result.stdout or f"Exit code: {result.returncode}"
-            
-        except subprocess.TimeoutExpired:
-            last_error = f"Strategy {strategy['name']} timed out after {timeout} seconds"
-            continue
-        except Exception as e:
-            last_error = f"Strategy {strategy['name']} failed: {str(e)}"
-            continue
+                if result.returncode == 0:
+                    # Success! Log which strategy worked (for debugging)
+                    if strategy["name"] != "git_apply_strict":
+                        logger.info(f"Patch applied using fallback strategy: {strategy['name']}")
+                    else:
+                        logger.debug(f"Patch applied successfully using strict strategy")
+                    return  # Success
+                
+                # Store error for final reporting
+                last_error = _decode(result.stderr or result.stdout) or f"Exit code: {result.returncode}"
+                if strategy["name"] == "git_apply_strict":
+                    # The strict apply is the validation check; keep its diagnosis for the final error
+                    check_error = last_error
+                    # Log at INFO level (not WARNING) since fallback strategies will handle it
+                    logger.info(f"Patch validation failed (will try fallback strategies): {last_error[:200]}")
+                    # Fallbacks the strict error already rules out are not tried at all;
+                    # the rest are dry-run side by side so only one that can apply touches the tree
+                    probe_errors = {
+                        fallback["name"]: check_error for fallback in strategies
+                        if any(marker in check_error for marker in fallback.get("skip_on_check_error", ()))
+                    }
+                    probe_errors.update(_probe_strategies(
+                        [fallback for fallback in strategies if "probe_args" in fallback and fallback["name"] not in probe_errors],
+                        patch_file, repo_dir, timeout
+                    ))
+                
+            except subprocess.TimeoutExpired:
+                last_error = f"Strategy {strategy['name']} timed out after {timeout} seconds"
+                continue
+            except Exception as e:
+                last_error = f"Strategy {strategy['name']} failed: {str(e)}"
+                continue
     
     # All strategies failed - log detailed information for debugging
-    logger.error(f"All {len(strategies)} patch application strategies failed")
+    tried = f"applied: {', '.join(attempted) or 'none'}"
+    if ruled_out:
+        tried += f"; ruled out by check or dry run: {', '.join(ruled_out)}"
+    logger.error(f"All patch application strategies failed ({tried})")
     if last_error:
         logger.error(f"Last strategy error: {last_error[:500]}")
         logger.debug(f"Cleaned patch preview (first 1000 chars): {cleaned_patch[:1000]}")
     
-    # Create informative error message
-    error_msg = f"Failed to apply patch after trying {len(strategies)} strategies"
-    if last_error:
-        # Extract key error information without overwhelming the message
-        error_preview = last_error[:300] if len(last_error) > 300 else last_error
-        error_msg += f". Last error: {error_preview}"
     # FINAL ERROR MESSAGE: Clearly distinguish tool vs model issues
-    # If we tried all strategies and failed, it's a model issue (corrupt/incomplete patch)
-    # If we had validation errors, it's also a model issue
+    # If every strategy failed or was ruled out, it's a model issue (corrupt/incomplete patch)
+    if check_error and check_error != last_error:
+        last_error = f"{last_error}\ngit apply check: {check_error}"
     error_msg = (
-        f"Failed to apply patch after trying 4 strategies. "
+        f"Failed to apply patch ({tried}). "
         f"Last error: {last_error}\n"
         f"This indicates the AI model generated a corrupt, incomplete, or malformed patch. "
-        f"All patch application strategies (strict, reject, 3-way merge, fuzzy) were attempted. "
         f"Patch validation and cleaning were performed, but the patch structure is fundamentally invalid."
     )
     # Raise PatchApplicationError (not GitError) so it can be treated as FAIL, not ERROR
     raise PatchApplicationError(error_msg)
 
 
+def _check_hunks(cleaned_patch: str) -> str:
+    """
+    Warn about incomplete hunks and trim an incomplete final hunk.
+    
+    A valid hunk has its @@ header, at least one context or +/- line, and ends
+    with such a line rather than an empty or stray one. Hunk headers are located
+    with substring searches and only each hunk's last line is inspected, so the
+    patch is never split into a full line list.
+    
+    Returns:
+        cleaned_patch, with the final hunk trimmed or removed if it was incomplete
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+    
+    # The cleaned patch ends with a newline, which does not start another line of the final hunk
+    text = cleaned_patch[:-1] if cleaned_patch.endswith('\n') else cleaned_patch
+    starts = [0] if text.startswith('@@') else []
+    pos = text.find('\n@@')
+    while pos != -1:
+        starts.append(pos + 1)
+        pos = text.find('\n@@', pos + 3)
+    
+    for i, start in enumerate(starts):
+        is_last = i == len(starts) - 1
+        # Hunk text runs to the line break before the next header, or to the end
+        end = len(text) if is_last else starts[i + 1] - 1
+        last_break = text.rfind('\n', start, end)
+        
+        if last_break == -1:
+            line_no = text.count('\n', 0, start) + 1
+            # Hunk with only header - incomplete
+            logger.warning(f"Detected incomplete hunk at line {line_no}: hunk header without content")
+            # Try to repair: if this is the last hunk and it's incomplete, remove it
+            if is_last:
+                logger.info(f"Removing incomplete final hunk (line {line_no})")
+                return text[:start] or '\n'
+            continue
+        
+        # Check if hunk ends properly (last line should be context or diff)
+        last_hunk_line = text[last_break + 1:end]
+        if last_hunk_line.strip() and last_hunk_line.startswith(_HUNK_LINE_PREFIXES):
+            continue
+        # Hunk ends with empty line or invalid content - might be truncated
+        line_no = text.count('\n', 0, start) + 1
+        logger.warning(f"Detected potentially truncated hunk at line {line_no}: last line is '{last_hunk_line[:50] if last_hunk_line else 'empty'}'")
+        if not is_last:
+            continue
+        
+        # Last hunk: repair by removing incomplete trailing lines after the last valid diff line
+        hunk_lines = text[start:end].split('\n')
+        keep = 0
+        for j in range(len(hunk_lines) - 1, 0, -1):
+            if hunk_lines[j].strip() and hunk_lines[j].startswith(_HUNK_LINE_PREFIXES):
+                keep = j + 1
+                break
+        total_lines = text.count('\n') + 1
+        logger.info(f"Truncating incomplete final hunk: removing lines {line_no + keep} to {total_lines}")
+        return (text[:start] + '\n'.join(hunk_lines[:keep]) + '\n') if keep else (text[:start] or '\n')
+    
+    return cleaned_patch
+
+
+def _strategy_argv(strategy: Dict[str, Any], patch_file: Path, probe: bool = False) -> List[str]:
+    """Command line for a patch strategy reading patch_file, optionally as a dry run."""
+    argv = strategy["cmd"] + (strategy["probe_args"] if probe else [])
+    if "file_flag" in strategy:
+        argv.append(strategy["file_flag"])
+    argv.append(str(patch_file))
+    return argv
+
+
+def _probe_strategies(strategies: List[Dict[str, Any]], patch_file: Path, repo_dir: Path, timeout: int) -> Dict[str, str]:
+    """
+    Dry-run fallback strategies concurrently without modifying the working tree.
+    
+    Returns:
+        Error output keyed by the name of each strategy whose dry run failed
+    """
+    def probe(strategy: Dict[str, Any]) -> Optional[str]:
+        try:
+            result = subprocess.run(
+                _strategy_argv(strategy, patch_file, probe=True),
+                cwd=str(repo_dir),
+                stdout=subprocess.PIPE if strategy.get("errors_on_stdout") else subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return f"Strategy {strategy['name']} timed out after {timeout} seconds"
+        except Exception as e:
+            return f"Strategy {strategy['name']} failed: {str(e)}"
+        # git apply --3way --check exits 0 even when the merge would leave conflicts
+        if result.returncode != 0 or b"with conflicts" in (result.stderr or b""):
+            return _decode(result.stderr or result.stdout) or f"Exit code: {result.returncode}"
+        return None
+    
+    if not strategies:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(strategies)) as executor:
+        outcomes = list(executor.map(probe, strategies))
+    return {strategy["name"]: error for strategy, error in zip(strategies, outcomes) if error is not None}
+
+
 def _pre_normalize_patch(patch: str) -> str:
     """
     Pre-normalize patch to fix structural issues before main cleaning.
@@ -300,12 +831,11 @@ def _pre_normalize_patch(patch: str) -> str:
     import logging
     logger = logging.getLogger(__name__)
     
-    lines = patch.split('\n')
-    has_diff_git = any(l.strip().startswith('diff --git') for l in lines)
-    
-    if has_diff_git:
+    if _DIFF_GIT_LINE_RE.search(patch):
         return patch
     
+    lines = patch.split('\n')
+    
     normalized_lines = []
     i = 0
     while i < len(lines):
@@ -338,7 +868,55 @@ def _pre_normalize_patch(patch: str) -> str:
     return '\n'.join(normalized_lines)
 
 
+# Cleaned patches keyed by a digest of the raw patch, so large inputs are not kept as keys
+_CLEAN_PATCH_CACHE_SIZE = 256
+_clean_patch_cache: "OrderedDict[bytes, str]" = OrderedDict()
+_clean_patch_lock = threading.Lock()
+
+
 def _clean_patch(patch_diff: str) -> str:
+    """
+    Clean patch content, reusing the result for a patch seen recently.
+    
+    Resubmitted and duplicate patches (common when sampling a model several
+    times) skip the cleaning pass. Patches rejected as malformed are not cached.
+    """
+    if _is_well_formed_patch(patch_diff):
+        return patch_diff if patch_diff.endswith('\n') else patch_diff + '\n'
+    
+    key = hashlib.blake2b(patch_diff.encode('utf-8', errors='surrogatepass'), digest_size=16).digest()
+    with _clean_patch_lock:
+        cleaned = _clean_patch_cache.get(key)
+        if cleaned is not None:
+            _clean_patch_cache.move_to_end(key)
+            return cleaned
+    
+    cleaned = _clean_patch_uncached(patch_diff)
+    with _clean_patch_lock:
+        _clean_patch_cache[key] = cleaned
+        if len(_clean_patch_cache) > _CLEAN_PATCH_CACHE_SIZE:
+            _clean_patch_cache.popitem(last=False)
+    return cleaned
+
+
+def _is_well_formed_patch(patch_diff: str) -> bool:
+    """
+    Whether cleaning would return patch_diff unchanged (apart from a final newline).
+    
+    Holds for a single diff --git section with no fences, empty lines or trailing
+    whitespace, whose lines are all kept as-is and which does not end in a header.
+    """
+    if not patch_diff.startswith('diff --git ') or '```' in patch_diff:
+        return False
+    if '\ndiff --git' in patch_diff:
+        return False
+    if _WELL_FORMED_PATCH_RE.fullmatch(patch_diff) is None:
+        return False
+    last_line = patch_diff[patch_diff.rfind('\n', 0, len(patch_diff) - 1) + 1:]
+    return last_line[:1] in _LAST_LINE_CHARS and not last_line.strip().startswith(_INCOMPLETE_TAIL_PREFIXES)
+
+
+def _clean_patch_uncached(patch_diff: str) -> str:
     """
     Clean patch content to handle common formatting issues from AI models.
     
@@ -358,133 +936,114 @@ def _clean_patch(patch_diff: str) -> str:
     # Pre-normalize to fix structural issues
     patch_diff = _pre_normalize_patch(patch_diff)
     
-    lines = patch_diff.split('\n')
+    # Remove markdown code fences in one pass over the whole text
+    if '```' in patch_diff:
+        patch_diff = _FENCE_LINE_RE.sub('', patch_diff)
+        # A fence on the last line has no line break after it; drop the one before
+        head, _, last = patch_diff.rpartition('\n')
+        if last.lstrip().startswith('```'):
+            patch_diff = head
+    
     cleaned_lines = []
+    append = cleaned_lines.append
     in_diff = False
     last_was_hunk_header = False
-    diff_count = 0
     seen_first_diff = False
+    seen_diff_header = False
     
-    for i, line in enumerate(lines):
-        # Remove markdown code fences if present
-        if line.strip().startswith('```'):
-            continue
+    for line in patch_diff.split('\n'):
+        first = line[:1]
         
         # Detect new diff header - if we've already seen one, skip subsequent ones
         # (AI models sometimes include multiple diffs or explanations)
-        if line.startswith('diff --git'):
-            diff_count += 1
-            if diff_count > 1:
+        if first == 'd' and line.startswith('diff --git'):
+            if seen_diff_header:
                 # Multiple diff headers detected - stop at first complete diff
                 # This handles cases where AI includes explanations or multiple patches
                 break
             in_diff = True
             last_was_hunk_header = False
-            seen_first_diff = True
-            cleaned_lines.append(line.rstrip())
+            seen_first_diff = seen_diff_header = True
+            append(line.rstrip())
             continue
         
+        is_file_header = line.startswith(_FILE_HEADER_PREFIXES)
+        
         # Start collecting when we see diff header components
-        if not seen_first_diff and (line.startswith('---') or line.startswith('+++')):
+        if not seen_first_diff and is_file_header:
             in_diff = True
-            last_was_hunk_header = False
             seen_first_diff = True
         
-        if in_diff:
-            # Handle file headers (--- and +++)
-            if line.startswith('---') or line.startswith('+++'):
-                cleaned_lines.append(line.rstrip())
+        if not in_diff:
+            # Before diff starts, skip instructions/explanations
+            # Only keep if it looks like it might be part of a diff
+            if line.startswith(_PRE_DIFF_PREFIXES):
+                append(line)
+            continue
+        
+        # Handle file headers (--- and +++)
+        if is_file_header:
+            append(line.rstrip())
+            last_was_hunk_header = False
+            continue
+        
+        # Handle hunk headers (@@ ... @@)
+        if first == '@' and line.startswith('@@'):
+            append(line.rstrip())
+            last_was_hunk_header = True
+            continue
+        
+        # Handle diff content lines
+        if first in _DIFF_LINE_CHARS:
+            # For diff lines, preserve the leading character but clean trailing whitespace
+            cleaned_line = line.rstrip()
+            if first == ' ':
+                if cleaned_line:  # Don't add empty lines
+                    append(cleaned_line)
                 last_was_hunk_header = False
                 continue
             
-            # Handle hunk headers (@@ ... @@)
-            if line.startswith('@@'):
-                cleaned_lines.append(line.rstrip())
-                last_was_hunk_header = True
+            # Fix malformed lines: "+" or "-" with nothing after them
+            # (these cause "malformed patch" errors)
+            if len(cleaned_line) <= 1:
+                logger.debug("Skipping malformed single-character diff line: %r", cleaned_line)
                 continue
             
-            # Handle diff content lines
-            if line.startswith(' ') or line.startswith('-') or line.startswith('+'):
-                # For diff lines, preserve the leading character but clean trailing whitespace
-                cleaned_line = line.rstrip()
-                
-                # Fix malformed lines: if line is just "+" or "-" or "+ " or "- ", skip it
-                # (these cause "malformed patch" errors)
-                if cleaned_line in ('+', '-', '+ ', '- '):
-                    # Skip malformed single-character lines
-                    logger.debug(f"Skipping malformed single-character diff line: '{cleaned_line}'")
-                    continue
-                
-                # Fix lines that are just whitespace after + or -
-                if len(cleaned_line) == 1 and cleaned_line in ('+', '-'):
-                    logger.debug(f"Skipping malformed single-character line: '{cleaned_line}'")
-                    continue
-                
-                # Fix lines that start with + or - but have no actual content (just whitespace)
-                if cleaned_line.startswith(('+', '-')) and len(cleaned_line.strip()) <= 1:
-                    logger.debug(f"Skipping empty diff line: '{cleaned_line}'")
-                    continue
-                
-                # Fix lines that have + or - but are not valid diff lines (e.g., "+ Here's what to do:")
-                # Valid diff lines should have context (space) or actual code after +/-
-                if cleaned_line.startswith(('+', '-')) and len(cleaned_line) > 1:
-                    rest = cleaned_line[1:].strip()
-                    # If rest is empty or looks like prose/instructions, skip
-                    if not rest or (len(rest) < 3 and not rest[0].isalnum()):
-                        logger.debug(f"Skipping non-code diff line: '{cleaned_line[:50]}'")
-                        continue
-                
-                # Skip lines that look like instructions/explanations (not code)
-                # e.g., "+5. Deploy LWC bundle" - these are explanations, not code
-                if cleaned_line.startswith(('+', '-')) and len(cleaned_line) > 1:
-                    # Check if it looks like an instruction (starts with number, bullet, etc.)
-                    rest = cleaned_line[1:].strip()
-                    if rest and (rest[0].isdigit() or rest.startswith(('. ', '- ', '* '))):
-                        # Likely an instruction, not code - skip it
-                        continue
-                
-                if cleaned_line:  # Don't add empty lines
-                    cleaned_lines.append(cleaned_line)
-                last_was_hunk_header = False
-            elif line.startswith('\\'):
-                # Handle "No newline at end of file" markers
-                cleaned_lines.append(line.rstrip())
-                last_was_hunk_header = False
-            else:
-                # For non-diff lines (headers, etc.), just strip trailing whitespace
-                # But skip empty lines right after hunk headers (common malformation)
-                if last_was_hunk_header and not line.strip():
-                    continue
-                
-                # Skip lines that look like explanations or instructions (not diff content)
-                # These often appear in AI-generated patches
-                stripped = line.strip()
-                if stripped and not stripped.startswith(('index', 'new file', 'deleted file', 'similarity', 'rename')):
-                    # If it doesn't look like a valid diff metadata line, skip it
-                    # (unless we're in a valid diff context)
-                    if not (stripped.startswith('diff') or stripped.startswith('---') or stripped.startswith('+++')):
-                        continue
-                
-                cleaned_lines.append(line.rstrip())
-                last_was_hunk_header = False
+            # Fix lines that have + or - but are not valid diff lines (e.g., "+ Here's what to do:")
+            # Valid diff lines should have context (space) or actual code after +/-
+            rest = cleaned_line[1:].strip()
+            if not rest or (len(rest) < 3 and not rest[0].isalnum()):
+                logger.debug("Skipping non-code diff line: %r", cleaned_line[:50])
+                continue
+            
+            # Skip lines that look like instructions/explanations (not code)
+            # e.g., "+5. Deploy LWC bundle" - these are explanations, not code
+            if rest[0].isdigit() or rest.startswith(('. ', '- ', '* ')):
+                continue
+            
+            append(cleaned_line)
+            last_was_hunk_header = False
+        elif first == '\\':
+            # Handle "No newline at end of file" markers
+            append(line.rstrip())
+            last_was_hunk_header = False
         else:
-            # Before diff starts, skip instructions/explanations
-            # Only keep if it looks like it might be part of a diff
-            if line.startswith(('diff', '---', '+++', '@@', 'index')):
-                cleaned_lines.append(line)
-    
-    # Final pass: remove any remaining malformed lines
-    final_lines = []
-    for i, line in enumerate(cleaned_lines):
-        # Skip standalone + or - lines that aren't part of valid diff
-        if line in ('+', '-') and i > 0:
-            prev_line = final_lines[-1] if final_lines else ''
-            # If previous line doesn't look like diff context, skip this malformed line
-            if not (prev_line.startswith((' ', '+', '-', '@@', 'diff', '---', '+++'))):
+            # For non-diff lines (headers, etc.), just strip trailing whitespace
+            # But skip empty lines right after hunk headers (common malformation)
+            stripped = line.strip()
+            if last_was_hunk_header and not stripped:
+                continue
+            
+            # Skip lines that look like explanations or instructions (not diff content)
+            # These often appear in AI-generated patches, unless they are diff metadata
+            if stripped and not stripped.startswith(_DIFF_METADATA_PREFIXES):
                 continue
-        final_lines.append(line)
+            
+            append(line.rstrip())
+            last_was_hunk_header = False
     
-    result = '\n'.join(final_lines)
+    # Standalone "+"/"-" lines were already dropped above, so no second pass is needed
+    result = '\n'.join(cleaned_lines)
     
     # VALIDATE PATCH COMPLETENESS: Check for truncated patches
     # "unexpected end of file" errors often occur when patches are cut off mid-hunk
@@ -531,10 +1090,10 @@ def _clean_patch(patch_diff: str) -> str:
         
         # FINAL VALIDATION: Ensure patch has minimum required structure
         # Must have at least: diff header, file headers, one hunk, and some content
-        has_diff_header = any(line.startswith('diff --git') for line in result.split('\n'))
-        has_file_headers = any(line.startswith('---') for line in result.split('\n')) and any(line.startswith('+++') for line in result.split('\n'))
-        has_hunk = any(line.startswith('@@') for line in result.split('\n'))
-        has_content = any(line.startswith((' ', '+', '-')) for line in result.split('\n'))
+        has_diff_header = _DIFF_HEADER_RE.search(result) is not None
+        has_file_headers = _OLD_FILE_RE.search(result) is not None and _NEW_FILE_RE.search(result) is not None
+        has_hunk = _HUNK_RE.search(result) is not None
+        has_content = _CONTENT_LINE_RE.search(result) is not None
         
         if not (has_diff_header or (has_file_headers and has_hunk and has_content)):
             logger.error("Patch validation failed: missing required structure (diff header, file headers, hunk, or content)")
@@ -0,0 +1,65 @@
+"""
+Fast JSON encoding/decoding helpers.
+
+Uses orjson when it is installed (2-5x faster, encodes straight to bytes) and
+falls back to the standard library json module otherwise, so callers never need
+to care which backend is available.
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps_bytes(obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON bytes.
+
+    Args:
+        obj: Object to serialize
+        indent: Pretty-print with 2-space indentation (default: compact, no spaces)
+        sort_keys: Sort dictionary keys
+
+    Returns:
+        JSON document as bytes
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=str, option=option)
+    return json.dumps(
+        obj,
+        indent=2 if indent else None,
+        separators=None if indent else (',', ':'),
+        sort_keys=sort_keys,
+        default=str,
+        ensure_ascii=False
+    ).encode('utf-8')
+
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> str:
+    """Serialize an object to a JSON string (see dumps_bytes)."""
+    return dumps_bytes(obj, indent=indent, sort_keys=sort_keys).decode('utf-8')
+
+
+def dumps_canonical(obj: Any) -> bytes:
+    """
+    Serialize an object to compact, key-sorted JSON bytes for hashing.
+
+    The output is identical with and without orjson for plain JSON data, so
+    hashes computed on one machine verify on another.
+    """
+    return dumps_bytes(obj, sort_keys=True)
+
+
+def loads(data: Union[str, bytes, bytearray]) -> Any:
+    """Deserialize a JSON document from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,59 @@
+"""
+Rate limiting primitives for API calls.
+
+A token bucket refills continuously at ``rate`` tokens per second up to
+``capacity`` tokens; each call consumes one token and blocks until one is
+available. A capacity of 1 spaces calls evenly; larger capacities allow short
+bursts while holding the long-run average to ``rate``.
+"""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe blocking token bucket."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Initialize token bucket.
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held (burst size)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, calls_per_minute: float, burst: float = 1.0) -> 'TokenBucket':
+        """Create a bucket allowing ``calls_per_minute`` on average."""
+        return cls(rate=calls_per_minute / 60.0, capacity=burst)
+
+    def _reserve(self, tokens: float) -> float:
+        """Take tokens (possibly going negative) and return how long to wait for them."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until ``tokens`` are available and consume them."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        """Wait without blocking the event loop until ``tokens`` are available."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,102 @@
+"""
+Exact-match response cache for AI agents.
+
+Repeated benchmark runs send byte-identical prompts; caching the response keyed
+by a SHA-256 of everything that determines it (provider, model, temperature,
+system prompt and user prompt) skips the network call and token cost entirely.
+
+Entries live in a single SQLite database in WAL mode, so several benchmark
+processes can read and write the same cache concurrently without thousands of
+tiny files or lock files.
+
+Enable by passing ``response_cache`` to AIAgent or by setting
+SF_BENCH_LLM_CACHE_DIR.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(provider: str, model: str, temperature: float, system_prompt: str, prompt: str) -> str:
+    """Build the cache key for a generation request."""
+    material = "\x00".join([provider, model, repr(temperature), system_prompt, prompt])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed cache of generated responses."""
+
+    DB_NAME = "responses.db"
+
+    def __init__(self, cache_dir: Path, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Initialize response cache.
+
+        Args:
+            cache_dir: Directory holding the cache database
+            max_entries: Keep at most this many entries, evicting the oldest
+                (default: unbounded)
+            ttl: Seconds after which an entry is treated as a miss
+                (default: never expires)
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            self.cache_dir / self.DB_NAME,
+            isolation_level=None,  # autocommit: one transaction per statement
+            check_same_thread=False,
+            timeout=30
+        )
+        self._db.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS responses_created ON responses (created);"
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None on a miss."""
+        try:
+            with self._lock:
+                row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read response cache entry {key[:16]}: {e}")
+            return None
+        if row is None or (self.ttl and row[1] < time.time() - self.ttl):
+            return None
+        return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response, evicting the oldest entries beyond max_entries."""
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)",
+                    (key, response, time.time())
+                )
+                if self.max_entries:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY created DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                        (self.max_entries,)
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write response cache entry {key[:16]}: {e}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
@@ -6,8 +6,10 @@ that may fail due to network issues, rate limits, or temporary service unavailab
 """
 import functools
 import logging
+import random
+import threading
 import time
-from typing import Callable, TypeVar, Any
+from typing import Callable, TypeVar, Any, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +21,9 @@ def retry_with_backoff(
     initial_delay: float = 1.0,
     max_delay: float = 60.0,
     exponential_base: float = 2.0,
-    retry_on: tuple = (Exception,)
+    retry_on: tuple = (Exception,),
+    jitter: bool = False,
+    give_up_on: tuple = ()
 ):
     """
     Decorator for retrying functions with exponential backoff.
@@ -30,6 +34,10 @@ def retry_with_backoff(
         max_delay: Maximum delay between retries in seconds (default: 60.0)
         exponential_base: Base for exponential backoff calculation (default: 2.0)
         retry_on: Tuple of exception types to retry on (default: all exceptions)
+        jitter: Scale each delay by a random factor in [0.5, 1.5) so concurrent
+            callers do not retry in lockstep (default: False)
+        give_up_on: Exception types raised at once even if they match retry_on,
+            for failures a retry cannot fix (default: none)
     
     Returns:
         Decorated function that retries on failure
@@ -42,6 +50,9 @@ def retry_with_backoff(
             for attempt in range(max_retries):
                 try:
                     return func(*args, **kwargs)
+                except give_up_on as e:
+                    logger.error(f"{func.__name__} failed with non-retryable exception: {str(e)}")
+                    raise
                 except retry_on as e:
                     last_exception = e
                     
@@ -51,6 +62,8 @@ def retry_with_backoff(
                             initial_delay * (exponential_base ** attempt),
                             max_delay
                         )
+                        if jitter:
+                            delay *= 0.5 + random.random()
                         
                         logger.warning(
                             f"{func.__name__} failed (attempt {attempt + 1}/{max_retries}): {str(e)}. "
@@ -73,3 +86,66 @@ def retry_with_backoff(
         
         return wrapper
     return decorator
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    ``allow()`` returns False until ``reset_timeout`` seconds have passed, so
+    callers can skip a known-unhealthy endpoint instead of paying for another
+    round trip. The first call after the cooldown is let through as a probe;
+    a success closes the breaker, a failure re-opens it.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize circuit breaker.
+        
+        Args:
+            failure_threshold: Consecutive failures before the breaker opens (default: 5)
+            reset_timeout: Seconds to stay open before allowing a probe call (default: 30.0)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failure_count = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently being short-circuited."""
+        with self._lock:
+            return self._is_open()
+    
+    def _is_open(self) -> bool:
+        if self.opened_at is None:
+            return False
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Cooldown elapsed: half-open, let the next call probe the endpoint
+            self.opened_at = None
+            self.failure_count = self.failure_threshold - 1
+            return False
+        return True
+    
+    def allow(self) -> bool:
+        """Return True if a call may be attempted."""
+        return not self.is_open
+    
+    def record_success(self) -> None:
+        """Reset the breaker after a successful call."""
+        with self._lock:
+            self.failure_count = 0
+            self.opened_at = None
+    
+    def record_failure(self) -> None:
+        """Count a failed call, opening the breaker at the threshold."""
+        with self._lock:
+            self.failure_count += 1
+            if self.failure_count >= self.failure_threshold and self.opened_at is None:
+                self.opened_at = time.monotonic()
+                logger.warning(
+                    f"Circuit breaker opened after {self.failure_count} consecutive failures; "
+                    f"skipping calls for {self.reset_timeout:.0f}s"
+                )
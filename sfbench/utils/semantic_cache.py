@@ -0,0 +1,159 @@
+"""
+Semantic (embedding-based) response cache for AI agents.
+
+Catches near-duplicate task descriptions that an exact-match cache would miss:
+many tasks share boilerplate and differ only in naming. Each description is
+embedded with a small local sentence-transformers model and a cached response is
+returned when the nearest stored description has cosine similarity at or above
+the threshold.
+
+Optional dependencies (only needed when a cache is actually used):
+    pip install sentence-transformers numpy
+"""
+import logging
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sfbench.utils import json_utils
+
+logger = logging.getLogger(__name__)
+
+# Signature of an embedding function: list of texts -> array of shape (n, dim)
+Encoder = Callable[[List[str]], Any]
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of generated responses keyed by task description.
+
+    Entries are partitioned by namespace (typically "provider|model") so a
+    response from one model is never served for another. Embeddings are
+    L2-normalized, so a dot product is the cosine similarity.
+
+    Persisted as ``embeddings.npy`` plus ``payloads.jsonl`` in ``cache_dir``.
+    """
+
+    DEFAULT_MODEL = "all-MiniLM-L6-v2"
+    DEFAULT_THRESHOLD = 0.92
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        model: str = DEFAULT_MODEL,
+        threshold: float = DEFAULT_THRESHOLD,
+        encoder: Optional[Encoder] = None
+    ):
+        """
+        Initialize semantic cache.
+
+        Args:
+            cache_dir: Directory to persist the cache (in-memory only if None)
+            model: sentence-transformers model name used when no encoder is given
+            threshold: Minimum cosine similarity for a cache hit (default: 0.92)
+            encoder: Optional embedding function overriding the sentence-transformers model
+        """
+        import numpy as np
+
+        self._np = np
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.model = model
+        self.threshold = threshold
+        self._encoder = encoder
+        self._embeddings = None  # (n, dim) float32 matrix
+        self._payloads: List[Dict[str, str]] = []
+
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self._load()
+
+    @property
+    def _embeddings_file(self) -> Path:
+        return self.cache_dir / "embeddings.npy"
+
+    @property
+    def _payloads_file(self) -> Path:
+        return self.cache_dir / "payloads.jsonl"
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def _load(self) -> None:
+        """Load persisted entries, discarding them if the two files disagree."""
+        if not (self._embeddings_file.exists() and self._payloads_file.exists()):
+            return
+        try:
+            embeddings = self._np.load(self._embeddings_file)
+            with open(self._payloads_file, 'rb') as f:
+                payloads = [json_utils.loads(line) for line in f if line.strip()]
+            if len(payloads) != len(embeddings):
+                logger.warning("Semantic cache files out of sync, starting empty")
+                return
+            self._embeddings = embeddings
+            self._payloads = payloads
+        except Exception as e:
+            logger.warning(f"Failed to load semantic cache: {e}")
+
+    def _encode(self, text: str):
+        """Embed a single text as a normalized float32 vector."""
+        if self._encoder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise ImportError(
+                    "sentence-transformers package not installed. "
+                    "Install with: pip install sentence-transformers"
+                )
+            self._encoder = SentenceTransformer(self.model).encode
+        vector = self._np.asarray(self._encoder([text])[0], dtype=self._np.float32)
+        norm = self._np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, text: str, namespace: str = "") -> Optional[str]:
+        """
+        Return the cached response for the most similar text, if similar enough.
+
+        Args:
+            text: Task description to look up
+            namespace: Partition key (e.g. "provider|model")
+
+        Returns:
+            Cached response or None on a miss
+        """
+        if not self._payloads:
+            return None
+        scores = self._embeddings @ self._encode(text)
+        best_score = -1.0
+        best_index = -1
+        for i, payload in enumerate(self._payloads):
+            if payload["namespace"] == namespace and scores[i] > best_score:
+                best_score = float(scores[i])
+                best_index = i
+        if best_index < 0 or best_score < self.threshold:
+            return None
+        logger.debug(f"Semantic cache hit (similarity {best_score:.3f})")
+        return self._payloads[best_index]["response"]
+
+    def add(self, text: str, response: str, namespace: str = "") -> None:
+        """
+        Store a response for a text.
+
+        Args:
+            text: Task description
+            response: Generated response to cache
+            namespace: Partition key (e.g. "provider|model")
+        """
+        vector = self._encode(text)[None, :]
+        if self._embeddings is None:
+            self._embeddings = vector
+        else:
+            self._embeddings = self._np.vstack([self._embeddings, vector])
+        payload = {"namespace": namespace, "text": text, "response": response}
+        self._payloads.append(payload)
+
+        if self.cache_dir:
+            try:
+                self._np.save(self._embeddings_file, self._embeddings)
+                with open(self._payloads_file, 'ab') as f:
+                    f.write(json_utils.dumps_bytes(payload) + b"\n")
+            except Exception as e:
+                logger.warning(f"Failed to persist semantic cache: {e}")
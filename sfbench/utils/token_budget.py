@@ -0,0 +1,102 @@
+"""
+Token counting and budget allocation for prompt construction.
+
+Uses tiktoken for exact counts when it is installed and falls back to a
+characters-per-token estimate otherwise. The estimate is deliberately
+conservative for code, which tokenizes denser than prose.
+
+Optional dependency:
+    pip install tiktoken
+"""
+from functools import lru_cache
+from typing import Any, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Approximate characters per token when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: Optional[str]) -> Optional[Any]:
+    """Return the tiktoken encoding for a model (cached), or None without tiktoken."""
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model or "")
+    except KeyError:
+        # Non-OpenAI models: cl100k is a close enough proxy for budgeting
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Count (or estimate) the tokens in a text.
+
+    Args:
+        text: Text to measure
+        model: Model name used to pick the tokenizer
+
+    Returns:
+        Number of tokens
+    """
+    encoding = _encoding(model)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    Truncate a text to at most max_tokens tokens.
+
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum number of tokens to keep
+        model: Model name used to pick the tokenizer
+
+    Returns:
+        The text, or its longest prefix within the budget
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def allocate_budget(sizes: List[int], budget: int) -> List[int]:
+    """
+    Split a token budget across items of the given sizes.
+
+    Items smaller than an equal share keep their full size and the unused
+    remainder is redistributed among the larger ones, so short files are
+    never cut to make room that nobody uses.
+
+    Args:
+        sizes: Token count of each item
+        budget: Total tokens available
+
+    Returns:
+        Tokens allotted to each item, in the same order
+    """
+    allocation = [0] * len(sizes)
+    remaining = max(budget, 0)
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        if sizes[i] > share:
+            # Everything left is at least this large: split evenly
+            for j in order[position:]:
+                allocation[j] = share
+            break
+        allocation[i] = sizes[i]
+        remaining -= sizes[i]
+    return allocation
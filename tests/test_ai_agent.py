@@ -0,0 +1,300 @@
+"""
+Tests for AI agent prompt building and response handling.
+"""
+import asyncio
+import concurrent.futures
+import importlib.util
+import json
+import sys
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+from sfbench.utils.ai_agent import AIAgent, AIAgentError, FallbackAgent, generate_solutions_multi
+from sfbench.utils.rate_limiter import TokenBucket
+from sfbench.utils.retry import CircuitBreaker
+
+
+def test_build_prompt_deduplicates_identical_files():
+    """Test that identical file contents are sent once under all their paths."""
+    agent = AIAgent(provider="local", model="test-model")
+    files = {
+        "a/package.xml": "<Package/>",
+        "b/package.xml": "<Package/>",
+        "classes/Foo.cls": "public class Foo {}",
+    }
+
+    prompt = agent._build_prompt("Fix it", None, files)
+
+    assert prompt.count("<Package/>") == 1
+    assert "--- a/package.xml, b/package.xml ---" in prompt
+    assert "--- classes/Foo.cls ---" in prompt
+
+
+def test_clean_response_extracts_fenced_diff():
+    """Test that prose and code fences around a diff are stripped."""
+    agent = AIAgent(provider="local", model="test-model")
+    response = "Here is the fix:\n```diff\n--- a/x\n+++ b/x\n@@ -1 +1 @@\n-a\n+b\n```\nDone."
+
+    assert agent._clean_response(response) == "diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1 +1 @@\n-a\n+b"
+
+
+def test_clean_response_skips_preamble_without_fences():
+    """Test that text before the first diff marker is dropped."""
+    agent = AIAgent(provider="local", model="test-model")
+    response = "Sure, here it is\ndiff --git a/x b/x\n--- a/x\n+++ b/x"
+
+    assert agent._clean_response(response) == "diff --git a/x b/x\n--- a/x\n+++ b/x"
+
+
+def test_unsupported_provider_fails_at_construction():
+    """Test that an unknown provider is rejected when the agent is created."""
+    with pytest.raises(AIAgentError, match="Unsupported provider"):
+        AIAgent(provider="not-a-provider", model="test-model")
+
+
+def test_missing_api_key_falls_back_to_local(monkeypatch):
+    """Test that an SDK provider without a key has no client and uses the local template."""
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    agent = AIAgent(provider="anthropic", model="test-model")
+
+    assert "client" not in agent.capabilities
+    assert not agent.ready
+    assert agent.generate_solution("Fix it").startswith("# Solution Template")
+
+
+def test_ready_reflects_api_key(monkeypatch):
+    """Test that HTTP providers are ready only when an API key is configured."""
+    monkeypatch.delenv("OPENROUTER_API_KEY", raising=False)
+
+    assert not AIAgent(provider="openrouter", model="test-model").ready
+    assert AIAgent(provider="openrouter", model="test-model", api_key="sk-test").ready
+
+
+def test_sdk_client_shared_per_api_key(monkeypatch):
+    """Test that agents with the same provider and key reuse one SDK client."""
+    fake_openai = MagicMock()
+    fake_openai.OpenAI.side_effect = lambda **kwargs: MagicMock()
+    monkeypatch.setitem(sys.modules, "openai", fake_openai)
+    monkeypatch.setattr(AIAgent, "_CLIENTS", {})
+
+    first = AIAgent(provider="openai", model="gpt-4o-mini", api_key="sk-one")
+    second = AIAgent(provider="openai", model="gpt-4o", api_key="sk-one")
+    other = AIAgent(provider="openai", model="gpt-4o", api_key="sk-two")
+
+    assert first._client is second._client
+    assert other._client is not first._client
+    assert fake_openai.OpenAI.call_count == 2
+
+
+def test_sdk_client_uses_http2_when_h2_installed(monkeypatch):
+    """Test that the SDK's HTTP client enables HTTP/2 only when h2 is importable."""
+    fake_httpx = MagicMock()
+    monkeypatch.setitem(sys.modules, "httpx", fake_httpx)
+    monkeypatch.setitem(sys.modules, "anthropic", MagicMock())
+    monkeypatch.setattr(AIAgent, "_CLIENTS", {})
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: object() if name == "h2" else None)
+
+    AIAgent(provider="anthropic", model="claude", api_key="sk-test")
+
+    assert fake_httpx.Client.call_args.kwargs["http2"] is True
+
+
+def test_gemini_model_shared_per_model_name(monkeypatch):
+    """Test that Gemini agents reuse one GenerativeModel per model name."""
+    fake_genai = MagicMock()
+    fake_genai.GenerativeModel.side_effect = lambda name, **kwargs: MagicMock(name=name)
+    monkeypatch.setitem(sys.modules, "google.generativeai", fake_genai)
+    monkeypatch.setattr(AIAgent, "_CLIENTS", {})
+
+    first = AIAgent(provider="gemini", model="models/gemini-2.5-flash", api_key="key")
+    second = AIAgent(provider="google", model="gemini-2.5-flash", api_key="key")
+    other = AIAgent(provider="gemini", model="gemini-2.5-pro", api_key="key")
+
+    assert first._client is second._client
+    assert other._client is not first._client
+    assert fake_genai.GenerativeModel.call_args.kwargs["system_instruction"] == AIAgent.SYSTEM_PROMPT
+
+
+def test_openai_batch_round_trip():
+    """Test that batch submission builds chat requests and polling cleans the outputs."""
+    agent = AIAgent(provider="openai", model="gpt-4o-mini", api_key="sk-test")
+    client = MagicMock()
+    client.batches.create.return_value.id = "batch_123"
+    agent._client = client
+
+    batch_id = agent.submit_batch([{"task_id": "apex-001", "task_description": "Fix it", "context": {"temperature": 0}}])
+
+    assert batch_id == "batch_123"
+    uploaded = client.files.create.call_args.kwargs["file"][1]
+    request = json.loads(uploaded.splitlines()[0])
+    assert request["custom_id"] == "apex-001"
+    assert request["body"]["model"] == "gpt-4o-mini"
+    assert request["body"]["temperature"] == 0
+
+    client.batches.retrieve.return_value.status = "in_progress"
+    assert agent.poll_batch(batch_id) is None
+
+    client.batches.retrieve.return_value.status = "completed"
+    client.files.content.return_value.content = json.dumps({
+        "custom_id": "apex-001",
+        "response": {"status_code": 200, "body": {"choices": [{"message": {"content": "```diff\n--- a/x\n+++ b/x\n```"}}]}}
+    }).encode()
+    results = agent.poll_batch(batch_id)
+    assert results["apex-001"].startswith("diff --git a/x b/x")
+
+
+def test_agenerate_solution_runs_concurrently():
+    """Test that async generation can be gathered and returns results in order."""
+    agent = AIAgent(provider="local", model="test-model")
+    agent._generate = lambda task, context, files: f"patch for {task}"
+
+    async def run():
+        return await asyncio.gather(*(agent.agenerate_solution(f"task {i}") for i in range(2)))
+
+    assert asyncio.run(run()) == ["patch for task 0", "patch for task 1"]
+
+
+def test_agenerate_batch_returns_results_in_order():
+    """Test that async batches keep input order and map failures to None."""
+    def generate(task, context, files):
+        if task == "bad":
+            raise AIAgentError("boom")
+        return f"patch for {task}"
+
+    agent = _stub_agent(generate)
+    tasks = [{"task_description": "one"}, {"task_description": "bad"}, {"task_description": "two"}]
+
+    assert asyncio.run(agent.agenerate_batch(tasks, concurrency=2)) == ["patch for one", None, "patch for two"]
+
+
+def test_generate_solutions_multi_aligns_results_with_agents():
+    """Test that multi-agent fan-out returns per-agent results or exceptions in order."""
+    working = _stub_agent(lambda task, context, files: "PATCH")
+    failing = _stub_agent(_raise(AIAgentError("bad key", status_code=401)))
+
+    results = asyncio.run(generate_solutions_multi([working, failing], "Fix it"))
+
+    assert results[0] == "PATCH"
+    assert isinstance(results[1], AIAgentError)
+
+
+def test_generate_solutions_batch_falls_back_to_individual_calls():
+    """Test that non-batch providers return per-task results in order, None on failure."""
+    agent = AIAgent(provider="local", model="test-model")
+
+    def generate(task, context, files):
+        if task == "bad":
+            raise AIAgentError("boom")
+        return f"patch for {task}"
+
+    agent._generate = generate
+    tasks = [{"task_description": "one"}, {"task_description": "bad"}, {"task_description": "two"}]
+
+    assert agent.generate_solutions_batch(tasks) == ["patch for one", None, "patch for two"]
+
+
+def test_generator_reuses_prompt_built_for_cache_key(monkeypatch):
+    """Test that the prompt is built once per call, not again inside the generator."""
+    from sfbench.utils import ai_agent
+    builds = []
+    real_count_tokens = ai_agent.count_tokens
+    monkeypatch.setattr(ai_agent, "count_tokens", lambda text, model=None: builds.append(text) or real_count_tokens(text, model))
+    agent = AIAgent(provider="openrouter", model="test-model", api_key="sk-test")
+    agent._rate_limiter = TokenBucket(rate=1000, capacity=1000)
+    prompts = []
+    agent._generate = lambda task, context, files, prompt=None: prompts.append(prompt) or "PATCH"
+
+    agent.generate_solution("Fix it", {"type": "apex"}, {"Foo.cls": "public class Foo {}"})
+
+    assert len(builds) == 1
+    assert '{"type":"apex"}' in prompts[0]
+
+
+def test_concurrent_identical_requests_share_one_call():
+    """Test that identical in-flight requests wait for a single provider call."""
+    agent = AIAgent(provider="openrouter", model="test-model", api_key="sk-test")
+    agent._rate_limiter = TokenBucket(rate=1000, capacity=1000)
+    calls = []
+    release = threading.Event()
+
+    def generate(task, context, files, prompt=None):
+        calls.append(task)
+        release.wait(5)
+        return "PATCH"
+
+    agent._generate = generate
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(agent.generate_solution, "Fix it") for _ in range(4)]
+        while not calls:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert results == ["PATCH"] * 4
+    assert len(calls) == 1
+
+
+def _stub_agent(behaviour):
+    agent = AIAgent(provider="local", model="stub")
+    agent._generate = behaviour
+    agent._breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    agent._rate_limiter = TokenBucket(rate=1000, capacity=1000)
+    return agent
+
+
+def _raise(error):
+    def behaviour(task, context, files):
+        raise error
+    return behaviour
+
+
+def test_fallback_skips_retryable_errors():
+    """Test that transient provider failures move on to the next agent."""
+    failing = _stub_agent(_raise(AIAgentError("rate limited", status_code=429)))
+    working = _stub_agent(lambda task, context, files: "PATCH")
+
+    assert FallbackAgent([failing, working]).generate_solution("Fix it") == "PATCH"
+
+
+def test_fallback_raises_non_retryable_errors():
+    """Test that client errors such as 401 stop the chain."""
+    failing = _stub_agent(_raise(AIAgentError("bad key", status_code=401)))
+    working = _stub_agent(lambda task, context, files: "PATCH")
+
+    with pytest.raises(AIAgentError, match="bad key"):
+        FallbackAgent([failing, working]).generate_solution("Fix it")
+
+
+def test_open_circuit_is_skipped_without_calling_provider():
+    """Test that repeated transient failures open the breaker and later calls skip the endpoint."""
+    calls = []
+
+    def flaky(task, context, files):
+        calls.append(task)
+        raise AIAgentError("unavailable", status_code=503)
+
+    failing = _stub_agent(flaky)
+    working = _stub_agent(lambda task, context, files: "PATCH")
+    chain = FallbackAgent([failing, working])
+
+    for _ in range(3):
+        assert chain.generate_solution("Fix it") == "PATCH"
+
+    assert len(calls) == 2
+    assert failing._breaker.is_open
+
+
+def test_fallback_agent_is_a_standalone_chain():
+    """Test that the chain exposes only the generation entry points and works from async code."""
+    failing = _stub_agent(_raise(AIAgentError("rate limited", status_code=429)))
+    working = _stub_agent(lambda task, context, files: "PATCH")
+
+    with FallbackAgent([failing, working]) as chain:
+        assert not isinstance(chain, AIAgent)
+        assert asyncio.run(chain.agenerate_solution("Fix it")) == "PATCH"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
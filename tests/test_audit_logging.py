@@ -69,6 +69,25 @@ def test_log_api_call():
         assert audit.api_calls[0]["duration_ms"] == 1234.5
 
 
+def test_sanitize_request_redacts_nested_secrets():
+    """Test that secrets are redacted in headers and nested bodies without touching the input."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        logger = AuditLogger("test-eval-001", Path(tmpdir) / "audit")
+        request = {
+            "headers": {"Authorization": "Bearer sk-1", "Content-Type": "application/json"},
+            "body": {"api_key": "sk-2", "max_tokens": 100, "auth": [{"client_secret": "s3"}]}
+        }
+        
+        sanitized = logger._sanitize_request(request)
+        
+        assert sanitized["headers"] == {"Authorization": "***REDACTED***", "Content-Type": "application/json"}
+        assert sanitized["body"]["api_key"] == "***REDACTED***"
+        assert sanitized["body"]["max_tokens"] == 100
+        assert sanitized["body"]["auth"][0]["client_secret"] == "***REDACTED***"
+        assert request["body"]["api_key"] == "sk-2"
+        logger.close()
+
+
 def test_log_sfdx_command():
     """Test logging a Salesforce CLI command."""
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -96,6 +115,33 @@ def test_log_sfdx_command():
         assert audit.sfdx_commands[0]["exit_code"] == 0
 
 
+def test_log_sfdx_command_stream_matches_string_hashes():
+    """Test that hashing redirected output files gives the same hashes as the string API."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        logger = AuditLogger("test-eval-001", Path(tmpdir) / "audit")
+        audit = logger.create_audit(
+            model_name="gpt-4",
+            task_id="task-001",
+            input_data="test",
+            output_data="test"
+        )
+        stdout_path = Path(tmpdir) / "stdout.txt"
+        stderr_path = Path(tmpdir) / "stderr.txt"
+        stdout_path.write_text("Deploy Succeeded ✓\n" * 1000, encoding="utf-8")
+        stderr_path.write_text("", encoding="utf-8")
+        
+        logger.log_sfdx_command_stream(audit, "sf project deploy start", 0, stdout_path, stderr_path, 10.0)
+        logger.log_sfdx_command(
+            audit, "sf project deploy start", 0,
+            stdout_path.read_text(encoding="utf-8"), "", 10.0
+        )
+        
+        streamed, buffered = audit.sfdx_commands
+        assert streamed["stdout_hash"] == buffered["stdout_hash"]
+        assert streamed["stderr_hash"] == buffered["stderr_hash"]
+        logger.close()
+
+
 def test_audit_persistence():
     """Test that audit records are persisted to file."""
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -117,6 +163,7 @@ def test_audit_persistence():
             response_data={"result": "success"},
             duration_ms=1234.5
         )
+        logger.flush()
         
         # Check that file was created
         assert logger.audit_file.exists()
@@ -128,6 +175,105 @@ def test_audit_persistence():
         assert len(data) == 1
         assert data[0]["model_name"] == "gpt-4"
         assert len(data[0]["api_calls"]) == 1
+        assert not list(audit_dir.glob("*.tmp"))
+
+
+def test_audit_writes_are_batched():
+    """Test that audit.json is written every flush_interval events and finalize writes only its task."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        logger = AuditLogger("test-eval-001", Path(tmpdir) / "audit", flush_interval=3)
+        audit = logger.create_audit(
+            model_name="gpt-4",
+            task_id="task-001",
+            input_data="test",
+            output_data="test"
+        )
+        
+        logger.log_execution(audit, "one")
+        logger.log_execution(audit, "two")
+        assert not logger.audit_file.exists()
+        
+        logger.log_execution(audit, "three")
+        with open(logger.audit_file) as f:
+            assert len(json.load(f)[0]["execution_logs"]) == 3
+        
+        logger.log_execution(audit, "four")
+        logger.finalize_audit(audit, "passed")
+        with open(logger.audit_dir / "tasks" / "0_task-001.json") as f:
+            task = json.load(f)
+        assert len(task["execution_logs"]) == 4
+        assert task["final_status"] == "passed"
+        with open(logger.audit_file) as f:
+            assert json.load(f)[0]["final_status"] == "unknown"
+        
+        logger.close()
+        with open(logger.audit_file) as f:
+            assert json.load(f)[0]["final_status"] == "passed"
+
+
+def test_background_audit_writes_land_after_flush():
+    """Test that background audit.json writes are complete once flush returns."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with AuditLogger("test-eval-001", Path(tmpdir) / "audit", background=True) as logger:
+            audit = logger.create_audit(
+                model_name="gpt-4",
+                task_id="task-001",
+                input_data="test",
+                output_data="test"
+            )
+            logger.finalize_audit(audit, "passed")
+            logger.flush()
+            
+            with open(logger.audit_file) as f:
+                assert json.load(f)[0]["final_status"] == "passed"
+
+
+def test_audits_rebuilt_from_event_log():
+    """Test that events not yet aggregated into audit.json are replayed on restart."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        audit_dir = Path(tmpdir) / "audit"
+        logger = AuditLogger("test-eval-001", audit_dir)
+        audit = logger.create_audit(
+            model_name="gpt-4",
+            task_id="task-001",
+            input_data="test",
+            output_data="test"
+        )
+        logger.log_execution(audit, "started")
+        logger.update_validation_results(audit, {"deploy": True})
+        del logger, audit  # no flush: audit.json is never written
+        
+        restarted = AuditLogger("test-eval-001", audit_dir)
+        
+        assert len(restarted.audits) == 1
+        assert restarted.audits[0].execution_logs[0]["message"] == "started"
+        assert restarted.audits[0].validation_results == {"deploy": True}
+        restarted.close()
+
+
+def test_adopted_audit_events_replay_once():
+    """Test that a record built outside create_audit replays each logged event exactly once."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        audit_dir = Path(tmpdir) / "audit"
+        logger = AuditLogger("test-eval-001", audit_dir)
+        audit = EvaluationAudit(
+            evaluation_id="test-eval-001", timestamp=datetime(2026, 1, 1), model_name="gpt-4",
+            task_id="task-001", input_hash="i", output_hash="o"
+        )
+        logger.log_git_operation(audit, "clone", "git clone", True, 10.0)
+        logger.finalize_audit(audit, "passed")
+        assert len(audit.git_operations) == 1
+        report = logger.generate_audit_report()
+        logger._events.close()  # no flush of audit.json: only the event log survives
+        del logger
+        
+        restarted = AuditLogger("test-eval-001", audit_dir)
+        
+        assert len(restarted.audits) == 1
+        assert len(restarted.audits[0].git_operations) == 1
+        assert restarted.audits[0].final_status == "passed"
+        assert restarted.generate_audit_report()["total_git_operations"] == report["total_git_operations"] == 1
+        restarted.close()
 
 
 def test_audit_report_generation():
@@ -160,6 +306,56 @@ def test_audit_report_generation():
         assert report["status_counts"]["failed"] == 1
 
 
+def test_audit_report_totals_survive_restart():
+    """Test that running report totals match the audits, including after a reload."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        audit_dir = Path(tmpdir) / "audit"
+        with AuditLogger("test-eval-001", audit_dir) as logger:
+            audit = logger.create_audit(
+                model_name="gpt-4",
+                task_id="task-001",
+                input_data="test",
+                output_data="test"
+            )
+            logger.log_git_operation(audit, "apply_patch", "git apply", True, 5.0)
+            logger.log_sfdx_command(audit, "sf org display", 0, "ok", "", 50.0)
+            logger.finalize_audit(audit, "failed")
+            logger.finalize_audit(audit, "passed")
+            report = logger.generate_audit_report()
+        
+        assert report["status_counts"] == {"passed": 1}
+        assert report["total_git_operations"] == 1
+        assert report["total_sfdx_commands"] == 1
+        
+        with AuditLogger("test-eval-001", audit_dir) as reloaded:
+            assert reloaded.generate_audit_report() == report
+
+
+def test_event_timestamps_are_naive_utc_iso(monkeypatch):
+    """Test that event timestamps keep the naive UTC ISO format and are reused within a millisecond."""
+    from sfbench.utils import audit as audit_module
+    monkeypatch.setattr(audit_module, "_last_ts_ns", 0)
+    monkeypatch.setattr(audit_module.time, "time_ns", lambda: 1_700_000_000_000_000_000)
+    first = audit_module._now_iso()
+    monkeypatch.setattr(audit_module.time, "time_ns", lambda: 1_700_000_000_000_500_000)
+    
+    assert audit_module._now_iso() == first == "2023-11-14T22:13:20"
+
+
+def test_to_dict_covers_every_field():
+    """Test that to_dict emits every dataclass field and round-trips through from_dict."""
+    from dataclasses import fields
+    audit = EvaluationAudit(
+        evaluation_id="e", timestamp=datetime(2026, 1, 1), model_name="m", task_id="t",
+        input_hash="i", output_hash="o", api_calls=[{"provider": "openai"}]
+    )
+    
+    data = audit.to_dict()
+    
+    assert set(data) == {f.name for f in fields(EvaluationAudit)}
+    assert EvaluationAudit.from_dict(dict(data)) == audit
+
+
 def test_audit_hash_verification():
     """Test that audit hashes are correct."""
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -34,6 +34,7 @@ def test_checkpoint_creation():
         
         # Verify hash
         assert "checkpoint_hash" in checkpoint_data
+        assert checkpoint_data["checkpoint_hash"] == Path(checkpoint_file).with_suffix(".sha256").read_text()
         
         print("✅ Checkpoint creation and loading test passed")
 
@@ -64,9 +65,27 @@ def test_checkpoint_integrity():
         data2 = manager.load_checkpoint(checkpoint_file)
         assert data2 is None
         
+        # Valid JSON that does not match the sidecar hash fails too
+        with open(checkpoint_file, 'w') as f:
+            json.dump({"evaluation_id": "test-eval-002", "completed_tasks": ["task-1", "task-2"]}, f)
+        assert manager.load_checkpoint(checkpoint_file) is None
+        
         print("✅ Checkpoint integrity verification test passed")
 
 
+def test_checkpoint_with_legacy_hash_still_loads():
+    """Test that checkpoints hashed over the old indented encoding pass verification."""
+    import hashlib
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = CheckpointManager(Path(tmpdir))
+        data = {"evaluation_id": "old", "completed_tasks": ["task-1"], "results": {}, "metadata": {}}
+        data["checkpoint_hash"] = hashlib.sha256(json.dumps(data, indent=2, sort_keys=True).encode()).hexdigest()
+        checkpoint_file = Path(tmpdir) / "old_checkpoint.json"
+        checkpoint_file.write_text(json.dumps(data, indent=2, sort_keys=True))
+        
+        assert manager.load_checkpoint(str(checkpoint_file))["completed_tasks"] == ["task-1"]
+
+
 def test_evaluation_hash():
     """Test evaluation hash generation."""
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -100,6 +119,93 @@ def test_evaluation_hash():
         print("✅ Evaluation hash generation test passed")
 
 
+def test_tasks_file_hash_cached_until_file_changes(monkeypatch):
+    """Test that the tasks file is re-read only when its size or mtime changes."""
+    import os
+    from sfbench.utils import checkpoint
+    reads = []
+    real_read = checkpoint._read_file_sha256
+    monkeypatch.setattr(checkpoint, "_read_file_sha256", lambda path: reads.append(path) or real_read(path))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tasks_file = Path(tmpdir) / "tasks.json"
+        tasks_file.write_text('{"tasks": []}')
+        
+        first = generate_evaluation_hash("test-model", tasks_file, {})
+        assert generate_evaluation_hash("test-model", tasks_file, {}) == first
+        assert len(reads) == 1
+        
+        tasks_file.write_text('{"tasks": [1]}')
+        os.utime(tasks_file, ns=(0, 1))
+        assert generate_evaluation_hash("test-model", tasks_file, {}) != first
+        assert len(reads) == 2
+
+
+def test_background_writes_are_flushed():
+    """Test that queued checkpoint writes land on disk after flush."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        with CheckpointManager(Path(tmpdir), background=True) as manager:
+            for count in range(1, 4):
+                checkpoint_file = manager.create_checkpoint(
+                    evaluation_id="test-eval-003",
+                    completed_tasks=[f"task-{i}" for i in range(count)],
+                    results={}
+                )
+        
+        data = json.loads(Path(checkpoint_file).read_text())
+        assert len(data["completed_tasks"]) == 3
+        assert CheckpointManager(Path(tmpdir)).load_checkpoint(checkpoint_file) is not None
+
+
+def test_concurrent_atomic_writes_use_separate_temp_files():
+    """Test that writers of the same file never share a temp file or leave one behind."""
+    import threading
+    from sfbench.utils.background_io import atomic_write_bytes
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        target = Path(tmpdir) / "audit.json"
+        payloads = [bytes([i]) * 100_000 for i in range(8)]
+        errors = []
+        
+        def write(payload):
+            try:
+                for _ in range(20):
+                    atomic_write_bytes(target, payload)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=write, args=(p,)) for p in payloads]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert errors == []
+        assert target.read_bytes() in payloads
+        assert [p.name for p in Path(tmpdir).iterdir()] == ["audit.json"]
+
+
+def test_load_checkpoint_reuses_parsed_file_until_it_changes(monkeypatch):
+    """Test that repeated loads skip parsing and hashing while the file is unchanged."""
+    import os
+    from sfbench.utils import checkpoint
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = CheckpointManager(Path(tmpdir))
+        checkpoint_file = manager.create_checkpoint("test-eval-004", ["task-1"], {"task-1": {"status": "PASS"}})
+        parses = []
+        real_loads = checkpoint.json_utils.loads
+        monkeypatch.setattr(checkpoint.json_utils, "loads", lambda data: parses.append(1) or real_loads(data))
+        
+        completed, results = manager.bulk_load(checkpoint_file)
+        assert manager.get_completed_tasks(checkpoint_file) == completed == ["task-1"]
+        assert manager.get_results(checkpoint_file) == results
+        assert len(parses) == 1
+        
+        manager.create_checkpoint("test-eval-004", ["task-1", "task-2"], {})
+        os.utime(checkpoint_file, ns=(0, 1))
+        assert manager.get_completed_tasks(checkpoint_file) == ["task-1", "task-2"]
+        assert len(parses) == 2
+
+
 if __name__ == "__main__":
     test_checkpoint_creation()
     test_checkpoint_integrity()
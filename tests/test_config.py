@@ -106,3 +106,14 @@ def test_deterministic_mode():
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+def test_clone_full_disables_shallow_clones():
+    """Test that SF_BENCH_CLONE_FULL overrides the clone depth."""
+    assert Config().clone_depth == Config.DEFAULT_CLONE_DEPTH
+    
+    os.environ["SF_BENCH_CLONE_FULL"] = "1"
+    try:
+        assert Config().clone_depth == 0
+    finally:
+        del os.environ["SF_BENCH_CLONE_FULL"]
@@ -1,9 +1,13 @@
 """
 Tests for connection pooling in AI agent.
 """
+import gc
+import gzip
+import json
 import pytest
 from unittest.mock import Mock, patch, MagicMock
-from sfbench.utils.ai_agent import AIAgent
+from sfbench.utils import ai_agent
+from sfbench.utils.ai_agent import AIAgent, AIAgentError, list_openrouter_models
 
 
 def test_session_created_for_http_providers():
@@ -18,12 +22,113 @@ def test_session_created_for_http_providers():
 
 def test_session_not_created_for_non_http_providers():
     """Test that session is not created for non-HTTP providers."""
-    agent = AIAgent(provider="ollama", model="test-model")
+    agent = AIAgent(provider="local", model="test-model")
         
-    # Session should not be created for ollama
+    # Session should not be created for the local template provider
     assert agent.session is None
 
 
+def test_ollama_posts_through_session():
+    """Test that local HTTP providers reuse the pooled session."""
+    with patch('sfbench.utils.ai_agent.requests.Session') as mock_session_class:
+        mock_session = MagicMock()
+        mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.iter_lines.return_value = [
+            b'{"response": "--- a/x\\n", "done": false}',
+            b'{"response": "+++ b/x", "done": true}',
+        ]
+        mock_session_class.return_value = mock_session
+        
+        agent = AIAgent(provider="ollama", model="test-model")
+        
+        assert agent.generate_solution("Fix it") == "diff --git a/x b/x\n--- a/x\n+++ b/x"
+        assert mock_session.post.call_args.kwargs["stream"] is True
+        body = json.loads(mock_session.post.call_args.kwargs["data"])
+        assert body["system"] == AIAgent.SYSTEM_PROMPT
+        assert not body["prompt"].startswith(AIAgent.SYSTEM_PROMPT)
+
+
+def test_openrouter_streams_sse_chunks():
+    """Test that OpenRouter responses are streamed chunk by chunk from SSE events."""
+    with patch('sfbench.utils.ai_agent.requests.Session') as mock_session_class:
+        mock_session = MagicMock()
+        mock_session.post.return_value.status_code = 200
+        mock_session.post.return_value.iter_lines.return_value = [
+            b': OPENROUTER PROCESSING',
+            b'data: {"choices": [{"delta": {"content": "--- a/x\\n"}}]}',
+            b'',
+            b'data: {"choices": [{"delta": {"content": "+++ b/x"}}]}',
+            b'data: [DONE]',
+        ]
+        mock_session_class.return_value = mock_session
+        
+        agent = AIAgent(provider="openrouter", model="test-model", api_key="sk-test")
+        
+        assert list(agent.generate_solution_stream("Fix it")) == ["--- a/x\n", "+++ b/x"]
+        mock_session.post.return_value.close.assert_called()
+
+
+def test_openrouter_non_json_error_keeps_status():
+    """Test that an HTML error page still surfaces the HTTP status as a retryable error."""
+    with patch('sfbench.utils.ai_agent.requests.Session') as mock_session_class:
+        mock_session = MagicMock()
+        mock_session.post.return_value.status_code = 502
+        mock_session.post.return_value.headers = {"Content-Type": "text/html"}
+        mock_session.post.return_value.content = b'<html>Bad Gateway</html>'
+        mock_session.post.return_value.text = '<html>Bad Gateway</html>'
+        mock_session_class.return_value = mock_session
+        
+        agent = AIAgent(provider="openrouter", model="test-model", api_key="sk-test")
+        
+        with pytest.raises(AIAgentError) as excinfo:
+            agent._generate_openrouter("Fix it", None, None)
+        assert excinfo.value.status_code == 502
+        assert excinfo.value.retryable
+
+
+def test_routellm_json_error_message_extracted():
+    """Test that a JSON error body yields its message."""
+    with patch('sfbench.utils.ai_agent.requests.Session') as mock_session_class:
+        mock_session = MagicMock()
+        mock_session.post.return_value.status_code = 401
+        mock_session.post.return_value.headers = {"Content-Type": "application/json; charset=utf-8"}
+        mock_session.post.return_value.content = b'{"error": {"message": "Invalid API key"}}'
+        mock_session_class.return_value = mock_session
+        
+        agent = AIAgent(provider="routellm", model="test-model", api_key="sk-test")
+        
+        with pytest.raises(AIAgentError, match="Invalid API key") as excinfo:
+            agent._generate_routellm("Fix it", None, None)
+        assert not excinfo.value.retryable
+
+
+def test_large_request_bodies_are_gzipped():
+    """Test that large OpenRouter bodies are compressed and small ones are not."""
+    agent = AIAgent(provider="openrouter", model="test-model", api_key="sk-test")
+    data = {"messages": [{"role": "user", "content": "public class Foo {}\n" * 1000}]}
+    
+    headers = {}
+    body = agent._request_body(data, headers)
+    assert headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body)) == data
+    
+    headers = {}
+    agent._request_body({"messages": []}, headers)
+    assert "Content-Encoding" not in headers
+
+
+def test_context_manager_closes_session():
+    """Test that leaving the context manager closes the session."""
+    with patch('sfbench.utils.ai_agent.requests.Session') as mock_session_class:
+        mock_session = MagicMock()
+        mock_session_class.return_value = mock_session
+        
+        with AIAgent(provider="openrouter", model="test-model") as agent:
+            assert agent.session is mock_session
+        
+        mock_session.close.assert_called()
+
+
 def test_session_reused_across_calls():
     """Test that session is reused across multiple API calls."""
     with patch('sfbench.utils.ai_agent.requests.Session') as mock_session_class:
@@ -48,9 +153,10 @@ def test_session_cleanup():
         
         # Delete agent (simulate cleanup)
         del agent
+        gc.collect()
         
-        # Session close should be called (if __del__ works)
-        # Note: __del__ may not always be called in tests, so this is a best-effort check
+        # The weakref finalizer closes the session once the agent is collected
+        mock_session.close.assert_called_once()
 
 
 def test_http_adapter_configured():
@@ -70,5 +176,49 @@ def test_http_adapter_configured():
         assert mock_session.mount.called
 
 
+def test_session_retries_with_jittered_backoff():
+    """Test that the pooled session retries 429s with jitter and honours Retry-After."""
+    if not ai_agent._RETRY_SUPPORTS_JITTER:
+        pytest.skip("urllib3 < 2.0 has no backoff_jitter")
+    retries = ai_agent._build_session().get_adapter("https://openrouter.ai").max_retries
+    
+    assert 429 in retries.status_forcelist
+    assert retries.backoff_jitter > 0
+    assert retries.respect_retry_after_header
+
+
+def test_prewarm_heads_provider_host():
+    """Test that prewarm issues a HEAD to the provider through the session."""
+    with patch('sfbench.utils.ai_agent.requests.Session') as mock_session_class:
+        mock_session = MagicMock()
+        mock_session_class.return_value = mock_session
+        
+        AIAgent(provider="openrouter", model="test-model", prewarm=True)
+        
+        mock_session.head.assert_called_once_with("https://openrouter.ai/api/v1/models", timeout=5)
+        
+        mock_session.head.reset_mock()
+        AIAgent(provider="ollama", model="test-model", base_url="http://gpu:11434").prewarm()
+        mock_session.head.assert_called_once_with("http://gpu:11434/api/tags", timeout=5)
+
+
+def test_list_openrouter_models_revalidates_with_etag(monkeypatch):
+    """Test that a repeated model listing sends If-None-Match and reuses the list on 304."""
+    monkeypatch.setattr(ai_agent, "_models_cache", {"etag": None, "data": None})
+    session = MagicMock()
+    session.get.return_value.status_code = 200
+    session.get.return_value.headers = {"ETag": 'W/"abc"'}
+    session.get.return_value.content = b'{"data": [{"id": "test-model"}]}'
+    
+    assert list_openrouter_models(api_key="sk-test", session=session) == [{"id": "test-model"}]
+    assert "If-None-Match" not in session.get.call_args.kwargs["headers"]
+    
+    session.get.return_value.status_code = 304
+    session.get.return_value.content = b''
+    
+    assert list_openrouter_models(api_key="sk-test", session=session) == [{"id": "test-model"}]
+    assert session.get.call_args.kwargs["headers"]["If-None-Match"] == 'W/"abc"'
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,43 @@
+"""
+Tests for JSON helpers.
+"""
+import json
+import pytest
+from sfbench.utils import json_utils
+
+
+def test_round_trip():
+    """Test that dumps/loads round-trip regardless of backend."""
+    data = {"b": [1, 2.5, None], "a": {"nested": "värde"}, "flag": True}
+
+    assert json_utils.loads(json_utils.dumps(data)) == data
+    assert json_utils.loads(json_utils.dumps_bytes(data)) == data
+
+
+def test_sort_keys_and_indent():
+    """Test that sorting and indentation match the stdlib output structure."""
+    data = {"b": 1, "a": 2}
+
+    assert json_utils.dumps(data, sort_keys=True).index('"a"') < json_utils.dumps(data, sort_keys=True).index('"b"')
+    assert json_utils.dumps(data, indent=True) == json.dumps(data, indent=2)
+
+
+def test_non_serializable_values_use_str():
+    """Test that unknown types and non-string keys do not raise."""
+    from pathlib import Path
+
+    encoded = json_utils.loads(json_utils.dumps({1: Path("x")}))
+
+    assert encoded == {"1": "x"}
+
+
+def test_dumps_canonical_matches_stdlib_compact_sorted():
+    """Test that canonical bytes are the same whichever backend is installed."""
+    data = {"b": [1, 2.5, None], "a": {"nested": "värde"}}
+
+    expected = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    assert json_utils.dumps_canonical(data) == expected
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
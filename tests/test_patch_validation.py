@@ -2,7 +2,8 @@
 Tests for patch validation and cleaning.
 """
 from pathlib import Path
-from sfbench.utils.git import _clean_patch, apply_patch
+import pytest
+from sfbench.utils.git import _clean_patch, apply_patch, PatchApplicationError
 import tempfile
 import subprocess
 
@@ -94,6 +95,335 @@ def test_patch_validation():
             print("✅ Invalid patch rejection test passed")
 
 
+def test_failed_check_skips_strategies_that_cannot_succeed():
+    """Test that a clean patch forks once, and a failed strict apply skips the reject strategy."""
+    from unittest.mock import patch as mock_patch
+    from sfbench.utils import git
+    
+    patch_diff = "diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1 +1 @@\n-old line\n+new line\n"
+    calls = []
+    
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, returncode, b"", stderr)
+    
+    stderr = b"error: patch failed"
+    returncode = 0
+    with mock_patch.object(git.subprocess, "run", side_effect=fake_run):
+        apply_patch(Path("."), patch_diff, timeout=10)
+    assert len(calls) == 1
+    assert calls[0][:-1] == [*git._GIT_FAST, "apply", "--recount", "--whitespace=fix", "--ignore-whitespace"]
+    assert calls[0][-1].endswith(".patch")
+    
+    calls.clear()
+    returncode = 1
+    with mock_patch.object(git.subprocess, "run", side_effect=fake_run):
+        with pytest.raises(PatchApplicationError):
+            apply_patch(Path("."), patch_diff, timeout=10)
+    # The strict apply, then dry runs of the 3-way and fuzzy fallbacks; neither is applied
+    assert len(calls) == 3
+    assert "--reject" not in calls[0]
+    probes = sorted(calls[1:], key=lambda cmd: cmd[0] == git.PATCH)
+    assert "--3way" in probes[0] and "--check" in probes[0]
+    assert probes[1][0] == git.PATCH and "--dry-run" in probes[1]
+    # Every strategy reads the same patch file rather than its own stdin copy
+    assert len({cmd[-1] for cmd in calls}) == 1
+    
+    # A patch git cannot parse is not dry-run through the 3-way merge either
+    calls.clear()
+    stderr = b"error: corrupt patch at line 5"
+    with mock_patch.object(git.subprocess, "run", side_effect=fake_run):
+        with pytest.raises(PatchApplicationError):
+            apply_patch(Path("."), patch_diff, timeout=10)
+    assert len(calls) == 2
+    assert calls[1][0] == git.PATCH
+
+
+def test_miscounted_hunk_applies_with_strict_strategy():
+    """Test that a hunk whose @@ line counts are wrong still applies strictly."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        repo_dir = Path(tmpdir)
+        env_cmd = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(["git", "init", "-q"], cwd=repo_dir, check=True)
+        (repo_dir / "file.txt").write_text("a\nb\nc\n")
+        subprocess.run(["git", "add", "file.txt"], cwd=repo_dir, check=True)
+        subprocess.run(["git", *env_cmd, "commit", "-qm", "base"], cwd=repo_dir, check=True)
+        
+        miscounted = "diff --git a/file.txt b/file.txt\n--- a/file.txt\n+++ b/file.txt\n@@ -1,7 +1,9 @@\n a\n-b\n+B\n c\n"
+        apply_patch(repo_dir, miscounted, timeout=10)
+        assert (repo_dir / "file.txt").read_text() == "a\nB\nc\n"
+
+
+def test_conflicting_patch_leaves_tree_untouched():
+    """Test that fallbacks whose dry run fails are never applied to the working tree."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        repo_dir = Path(tmpdir)
+        env_cmd = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(["git", "init", "-q"], cwd=repo_dir, check=True)
+        (repo_dir / "file.txt").write_text("a\nb\nc\n")
+        subprocess.run(["git", "add", "file.txt"], cwd=repo_dir, check=True)
+        subprocess.run(["git", *env_cmd, "commit", "-qm", "base"], cwd=repo_dir, check=True)
+        (repo_dir / "file.txt").write_text("a\nB\nc\n")
+        patch_diff = subprocess.run(["git", "diff"], cwd=repo_dir, capture_output=True, text=True).stdout
+        (repo_dir / "file.txt").write_text("a\nX\nc\n")
+        subprocess.run(["git", *env_cmd, "commit", "-qam", "conflict"], cwd=repo_dir, check=True)
+        
+        with pytest.raises(PatchApplicationError) as excinfo:
+            apply_patch(repo_dir, patch_diff, timeout=10)
+        # The message names what ran and what was ruled out, not a fixed strategy count
+        message = str(excinfo.value)
+        assert "applied: git_apply_strict; ruled out by check or dry run: " in message
+        assert "git_apply_reject, git_apply_3way, patch_fuzzy" in message
+        assert (repo_dir / "file.txt").read_text() == "a\nX\nc\n"
+        status = subprocess.run(["git", "status", "--porcelain"], cwd=repo_dir, capture_output=True, text=True)
+        assert status.stdout == ""
+
+
+def test_checkout_validates_commit_with_persistent_worker():
+    """Test that checkout_commit resolves commits through one cat-file worker."""
+    from unittest.mock import patch as mock_patch
+    from sfbench.utils import git
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        repo_dir = Path(tmpdir)
+        env_cmd = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(["git", "init", "-q"], cwd=repo_dir, check=True)
+        (repo_dir / "file.txt").write_text("one\n")
+        subprocess.run(["git", "add", "file.txt"], cwd=repo_dir, check=True)
+        subprocess.run(["git", *env_cmd, "commit", "-qm", "one"], cwd=repo_dir, check=True)
+        first = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_dir, capture_output=True, text=True).stdout.strip()
+        (repo_dir / "file.txt").write_text("two\n")
+        subprocess.run(["git", *env_cmd, "commit", "-qam", "two"], cwd=repo_dir, check=True)
+        
+        with git.GitWorker(repo_dir, timeout=10) as worker:
+            assert worker.resolve(first[:10]) == first
+            assert worker.resolve("0" * 40) is None
+        
+        with pytest.raises(git.GitError, match="commit not found"):
+            git.checkout_commit(repo_dir, "0" * 40, timeout=10)
+        
+        started = []
+        real_popen = subprocess.Popen
+        def popen(cmd, *args, **kwargs):
+            proc = real_popen(cmd, *args, **kwargs)
+            if 'cat-file' in cmd:
+                started.append(proc)
+            return proc
+        with mock_patch.object(git.subprocess, "Popen", side_effect=popen):
+            git.checkout_commit(repo_dir, first, timeout=10)
+        assert (repo_dir / "file.txt").read_text() == "one\n"
+        # One worker served every lookup and is gone once checkout returns
+        assert len(started) == 1
+        assert started[0].poll() is not None
+
+
+def test_git_worker_falls_back_to_rev_parse_when_lookup_stalls():
+    """Test that a cat-file lookup with no answer within the timeout is killed and retried."""
+    from unittest.mock import patch as mock_patch
+    from sfbench.utils import git
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        repo_dir = Path(tmpdir)
+        env_cmd = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(["git", "init", "-q"], cwd=repo_dir, check=True)
+        (repo_dir / "file.txt").write_text("one\n")
+        subprocess.run(["git", "add", "file.txt"], cwd=repo_dir, check=True)
+        subprocess.run(["git", *env_cmd, "commit", "-qm", "one"], cwd=repo_dir, check=True)
+        head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_dir, capture_output=True, text=True).stdout.strip()
+        
+        with git.GitWorker(repo_dir, timeout=1) as worker:
+            with mock_patch.object(git.select, "select", return_value=([], [], [])):
+                assert worker.resolve("HEAD") == head
+            assert worker._proc is None
+            assert worker.resolve("HEAD") == head
+
+
+def test_shallow_clone_fetches_base_commit_on_checkout():
+    """Test that a depth-1 clone fetches an older base commit when checking it out."""
+    from sfbench.utils import git
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = Path(tmpdir) / "source"
+        source.mkdir()
+        env_cmd = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(["git", "init", "-q"], cwd=source, check=True)
+        commits = []
+        for content in ("one", "two", "three"):
+            (source / "file.txt").write_text(content + "\n")
+            subprocess.run(["git", "add", "file.txt"], cwd=source, check=True)
+            subprocess.run(["git", *env_cmd, "commit", "-qm", content], cwd=source, check=True)
+            commits.append(subprocess.run(
+                ["git", "rev-parse", "HEAD"], cwd=source, capture_output=True, text=True
+            ).stdout.strip())
+        
+        clone = Path(tmpdir) / "clone"
+        git.clone_repository(source.as_uri(), clone, timeout=30, depth=1)
+        assert (clone / ".git" / "shallow").exists()
+        
+        git.checkout_commit(clone, commits[0], timeout=30)
+        assert (clone / "file.txt").read_text() == "one\n"
+
+
+def test_clone_cache_mirror_is_reused_and_refreshed(monkeypatch):
+    """Test that clones are made from a cached mirror that is refreshed from origin."""
+    from sfbench.utils import git
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = Path(tmpdir) / "source"
+        source.mkdir()
+        env_cmd = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(["git", "init", "-q"], cwd=source, check=True)
+        cache_dir = Path(tmpdir) / "cache"
+        monkeypatch.setenv("SF_BENCH_CLONE_CACHE_DIR", str(cache_dir))
+        
+        clone = Path(tmpdir) / "clone"
+        for content in ("one", "two"):
+            (source / "file.txt").write_text(content + "\n")
+            subprocess.run(["git", "add", "file.txt"], cwd=source, check=True)
+            subprocess.run(["git", *env_cmd, "commit", "-qm", content], cwd=source, check=True)
+            
+            git.clone_repository(str(source), clone, timeout=30)
+            assert (clone / "file.txt").read_text() == content + "\n"
+            # Independent of the mirror, and origin still names the real remote
+            assert not (clone / ".git" / "objects" / "info" / "alternates").exists()
+            origin = subprocess.run(["git", "remote", "get-url", "origin"], cwd=clone, capture_output=True, text=True)
+            assert origin.stdout.strip() == str(source)
+        
+        assert len([p for p in cache_dir.iterdir() if p.is_dir()]) == 1
+
+
+def test_clean_patch_reuses_result_for_repeated_patch():
+    """Test that repeated patches are cleaned once and the cache stays bounded."""
+    from unittest.mock import patch as mock_patch
+    from sfbench.utils import git
+    
+    patch_diff = "diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1 +1 @@\n-old line\n+new line\n# cached\n"
+    git._clean_patch_cache.clear()
+    with mock_patch.object(git, "_clean_patch_uncached", wraps=git._clean_patch_uncached) as uncached:
+        first = _clean_patch(patch_diff)
+        assert _clean_patch(patch_diff) == first
+        assert uncached.call_count == 1
+        
+        # Rejected patches raise every time rather than being cached
+        for _ in range(2):
+            with pytest.raises(PatchApplicationError):
+                _clean_patch("--- a/x\n+++ b/x\n")
+        assert uncached.call_count == 3
+    
+    for i in range(git._CLEAN_PATCH_CACHE_SIZE + 10):
+        _clean_patch(patch_diff + f" ctx {i}\n")
+    assert len(git._clean_patch_cache) == git._CLEAN_PATCH_CACHE_SIZE
+    git._clean_patch_cache.clear()
+
+
+def test_well_formed_patch_skips_cleaning():
+    """Test that a patch cleaning would not change is returned without the cleaning pass."""
+    from unittest.mock import patch as mock_patch
+    from sfbench.utils import git
+    
+    well_formed = "diff --git a/x b/x\n--- a/x\n+++ b/x\n@@ -1,2 +1,2 @@\n context\n-old line\n+new line"
+    needs_cleaning = [
+        "```diff\n" + well_formed + "\n```",
+        well_formed + "   ",
+        well_formed + "\n+1. Deploy the bundle",
+        well_formed + "\ndiff --git a/y b/y",
+        well_formed + "\n@@ -5 +5 @@",
+    ]
+    git._clean_patch_cache.clear()
+    with mock_patch.object(git, "_clean_patch_uncached", wraps=git._clean_patch_uncached) as uncached:
+        assert _clean_patch(well_formed) == well_formed + "\n"
+        assert uncached.call_count == 0
+        
+        for patch_diff in needs_cleaning:
+            assert not git._is_well_formed_patch(patch_diff)
+            _clean_patch(patch_diff)
+        assert uncached.call_count == len(needs_cleaning)
+    git._clean_patch_cache.clear()
+
+
+def test_clone_target_is_removed_in_background():
+    """Test that an existing directory is moved aside at once and deleted off-thread."""
+    from sfbench.utils import git
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        target = Path(tmpdir) / "repo"
+        (target / "nested").mkdir(parents=True)
+        (target / "nested" / "file.txt").write_text("old checkout\n")
+        
+        thread = git._remove_tree_in_background(target)
+        assert not target.exists()
+        thread.join(timeout=10)
+        assert list(Path(tmpdir).iterdir()) == []
+        
+        # Trash an earlier run left behind is swept even when there is no checkout to move
+        stale = Path(tmpdir) / ".trash-repo-0123abcd"
+        (stale / "nested").mkdir(parents=True)
+        other = Path(tmpdir) / ".trash-other-0123abcd"
+        other.mkdir()
+        thread = git._remove_tree_in_background(target)
+        thread.join(timeout=10)
+        assert list(Path(tmpdir).iterdir()) == [other]
+        assert git._trash_removers == {}
+
+
+def test_reset_repository_restores_clean_tree():
+    """Test that reset_repository discards edits and untracked files without re-cloning."""
+    from sfbench.utils import git
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = Path(tmpdir) / "source"
+        source.mkdir()
+        env_cmd = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(["git", "init", "-q"], cwd=source, check=True)
+        (source / "file.txt").write_text("one\n")
+        subprocess.run(["git", "add", "file.txt"], cwd=source, check=True)
+        subprocess.run(["git", *env_cmd, "commit", "-qm", "one"], cwd=source, check=True)
+        base = subprocess.run(["git", "rev-parse", "HEAD"], cwd=source, capture_output=True, text=True).stdout.strip()
+        
+        clone = Path(tmpdir) / "clone"
+        git.clone_repository(source.as_uri(), clone, timeout=30)
+        (clone / "file.txt").write_text("patched\n")
+        (clone / "untracked.txt").write_text("left over\n")
+        
+        git.reset_repository(clone, base, repo_url=source.as_uri(), timeout=30)
+        assert (clone / "file.txt").read_text() == "one\n"
+        assert not (clone / "untracked.txt").exists()
+        
+        with pytest.raises(git.GitError, match="not a clone of"):
+            git.reset_repository(clone, base, repo_url="https://example.com/other.git", timeout=30)
+        
+        # A branch name is fetched from origin, never resolved through the clone's stale ref
+        branch = subprocess.run(["git", "rev-parse", "--abbrev-ref", "HEAD"], cwd=source, capture_output=True, text=True).stdout.strip()
+        (source / "file.txt").write_text("two\n")
+        subprocess.run(["git", *env_cmd, "commit", "-qam", "two"], cwd=source, check=True)
+        git.reset_repository(clone, branch, repo_url=source.as_uri(), timeout=30)
+        assert (clone / "file.txt").read_text() == "two\n"
+
+
+def test_clone_repositories_bulk_reports_failures_per_target():
+    """Test that bulk clones run together and a bad URL fails only its own target."""
+    from sfbench.utils import git
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = Path(tmpdir) / "source"
+        source.mkdir()
+        env_cmd = ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(["git", "init", "-q"], cwd=source, check=True)
+        (source / "file.txt").write_text("one\n")
+        subprocess.run(["git", "add", "file.txt"], cwd=source, check=True)
+        subprocess.run(["git", *env_cmd, "commit", "-qm", "one"], cwd=source, check=True)
+        
+        targets = [Path(tmpdir) / f"clone{i}" for i in range(3)]
+        missing = Path(tmpdir) / "missing"
+        errors = git.clone_repositories_bulk(
+            [(source.as_uri(), target) for target in targets] + [((Path(tmpdir) / "nope").as_uri(), missing)],
+            max_workers=4,
+            timeout=30
+        )
+        assert list(errors) == [missing]
+        assert all((target / "file.txt").read_text() == "one\n" for target in targets)
+
+
 if __name__ == "__main__":
     test_clean_patch_markdown()
     test_clean_patch_malformed()
@@ -0,0 +1,67 @@
+"""
+Tests for token-bucket rate limiting.
+"""
+import asyncio
+import time
+
+import pytest
+
+from sfbench.utils.ai_agent import AIAgent
+from sfbench.utils.rate_limiter import TokenBucket
+
+
+def test_capacity_one_spaces_calls():
+    """Test that a capacity-1 bucket spaces calls by 1/rate."""
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    assert elapsed >= 0.09  # two waits of 0.05s
+
+
+def test_burst_capacity_allows_immediate_calls():
+    """Test that a larger capacity lets a burst through without waiting."""
+    bucket = TokenBucket.per_minute(60, burst=5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+
+    assert time.monotonic() - start < 0.05
+
+
+def test_acquire_async_waits_for_tokens():
+    """Test that the async variant spaces calls like the blocking one."""
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    async def run():
+        for _ in range(3):
+            await bucket.acquire_async()
+
+    start = time.monotonic()
+    asyncio.run(run())
+
+    assert time.monotonic() - start >= 0.09
+
+
+def test_agents_share_limiter_per_account():
+    """Test that agents with the same provider and key draw from one bucket."""
+    first = AIAgent(provider="openrouter", model="a", api_key="sk-one")
+    second = AIAgent(provider="openrouter", model="b", api_key="sk-one")
+    other = AIAgent(provider="openrouter", model="a", api_key="sk-two")
+
+    assert first._rate_limiter is second._rate_limiter
+    assert first._rate_limiter is not other._rate_limiter
+
+
+def test_rejects_non_positive_rate():
+    """Test that a zero rate is rejected."""
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
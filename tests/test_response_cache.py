@@ -0,0 +1,109 @@
+"""
+Tests for the exact-match response cache.
+"""
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from sfbench.utils.ai_agent import AIAgent, AIAgentError
+from sfbench.utils.rate_limiter import TokenBucket
+from sfbench.utils.response_cache import ResponseCache, make_cache_key
+
+
+def test_put_get_round_trip():
+    """Test that stored responses are returned and misses return None."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResponseCache(Path(tmpdir))
+        key = make_cache_key("openai", "gpt-4", 0.1, "system", "prompt")
+
+        assert cache.get(key) is None
+        cache.put(key, "diff --git a/x b/x")
+        assert ResponseCache(Path(tmpdir)).get(key) == "diff --git a/x b/x"
+
+
+def test_max_entries_evicts_oldest():
+    """Test that a bounded cache keeps only the newest entries."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResponseCache(Path(tmpdir), max_entries=2)
+        for i in range(3):
+            cache.put(f"key{i}", f"response {i}")
+
+        assert len(cache) == 2
+        assert cache.get("key0") is None
+        assert cache.get("key2") == "response 2"
+
+
+def test_expired_entries_are_misses():
+    """Test that entries older than the TTL are not served."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResponseCache(Path(tmpdir), ttl=60)
+        cache.put("key", "response")
+        assert cache.get("key") == "response"
+
+        cache._db.execute("UPDATE responses SET created = created - 120")
+        assert cache.get("key") is None
+
+
+def test_cache_key_covers_all_inputs():
+    """Test that changing any request input changes the key."""
+    base = make_cache_key("openai", "gpt-4", 0.1, "system", "prompt")
+
+    assert base != make_cache_key("openai", "gpt-4", 0.0, "system", "prompt")
+    assert base != make_cache_key("openai", "gpt-4o", 0.1, "system", "prompt")
+    assert base != make_cache_key("openai", "gpt-4", 0.1, "system", "prompt2")
+
+
+def test_agent_skips_provider_on_cache_hit():
+    """Test that a second identical request is served without calling the provider."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        agent = AIAgent(
+            provider="openrouter",
+            model="test-model",
+            api_key="sk-test",
+            response_cache=ResponseCache(Path(tmpdir))
+        )
+        agent._rate_limiter = TokenBucket(rate=1000, capacity=1000)
+        calls = []
+        agent._generate = lambda task, context, files, prompt=None: calls.append(task) or "PATCH"
+
+        assert agent.generate_solution("Fix it") == "PATCH"
+        assert agent.generate_solution("Fix it") == "PATCH"
+        assert len(calls) == 1
+
+
+def test_use_cache_false_bypasses_cache():
+    """Test that opting out of the cache always calls the provider."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        agent = AIAgent(
+            provider="openrouter",
+            model="test-model",
+            api_key="sk-test",
+            response_cache=ResponseCache(Path(tmpdir))
+        )
+        agent._rate_limiter = TokenBucket(rate=1000, capacity=1000)
+        calls = []
+        agent._generate = lambda task, context, files, prompt=None: calls.append(task) or "PATCH"
+
+        agent.generate_solution("Fix it")
+        agent.generate_solution("Fix it", use_cache=False)
+        assert len(calls) == 2
+
+
+def test_failed_provider_call_is_not_cached():
+    """Test that a failing configured provider raises instead of caching the local template."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ResponseCache(Path(tmpdir))
+        agent = AIAgent(provider="huggingface", model="test-model", api_key="hf-test", response_cache=cache)
+        agent._rate_limiter = TokenBucket(rate=1000, capacity=1000)
+        agent.session.post = MagicMock(return_value=MagicMock(status_code=503, headers={}, text="overloaded"))
+
+        with pytest.raises(AIAgentError) as excinfo:
+            agent.generate_solution("Fix it")
+        assert excinfo.value.retryable
+        assert len(cache) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
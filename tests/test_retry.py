@@ -4,7 +4,7 @@ Tests for retry logic with exponential backoff.
 import pytest
 import time
 from unittest.mock import patch, MagicMock
-from sfbench.utils.retry import retry_with_backoff
+from sfbench.utils.retry import retry_with_backoff, CircuitBreaker
 
 
 class TransientError(Exception):
@@ -74,6 +74,22 @@ def test_retry_exponential_backoff():
         assert delay2 >= delay1 * 1.5  # Allow some tolerance
 
 
+def test_retry_jitter_randomizes_delay():
+    """Test that jittered backoff scales each delay into [0.5, 1.5) of the base delay."""
+    delays = []
+    
+    @retry_with_backoff(max_retries=2, initial_delay=1.0, retry_on=(TransientError,), jitter=True)
+    def always_fails():
+        raise TransientError("Always fails")
+    
+    with patch('sfbench.utils.retry.random.random', return_value=0.25), \
+         patch('sfbench.utils.retry.time.sleep', side_effect=delays.append):
+        with pytest.raises(TransientError):
+            always_fails()
+    
+    assert delays == [0.75]
+
+
 def test_retry_does_not_retry_non_retryable_errors():
     """Test that non-retryable errors are not retried."""
     call_count = [0]
@@ -115,5 +131,43 @@ def test_retry_respects_max_delay():
         assert delay <= 0.3  # Allow some tolerance
 
 
+def test_retry_gives_up_on_listed_exceptions():
+    """Test that give_up_on exceptions are raised at once even when retry_on matches."""
+    call_count = [0]
+    
+    class DeterministicError(TransientError):
+        pass
+    
+    @retry_with_backoff(max_retries=3, initial_delay=0.01, retry_on=(Exception,), give_up_on=(DeterministicError,))
+    def rejected():
+        call_count[0] += 1
+        raise DeterministicError("same result every time")
+    
+    with pytest.raises(DeterministicError):
+        rejected()
+    assert call_count[0] == 1
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Test that the breaker opens at the threshold and half-opens after the timeout."""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    
+    time.sleep(0.15)
+    assert breaker.allow()
+    
+    # A failed probe re-opens immediately; a success closes it
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.15)
+    breaker.record_success()
+    assert breaker.allow()
+    assert breaker.failure_count == 0
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,61 @@
+"""
+Tests for the semantic response cache.
+"""
+import tempfile
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sfbench.utils.ai_agent import AIAgent, AIAgentError
+from sfbench.utils.rate_limiter import TokenBucket
+from sfbench.utils.semantic_cache import SemanticCache
+
+
+VOCAB = ["fix", "apex", "trigger", "account", "contact", "flow", "lwc"]
+
+
+def fake_encoder(texts):
+    """Bag-of-words embedding over a tiny vocabulary."""
+    return np.array([[t.lower().split().count(w) for w in VOCAB] for t in texts], dtype=np.float32)
+
+
+def test_near_duplicate_hit_and_namespace_isolation():
+    """Test that similar texts hit within a namespace and miss across namespaces."""
+    cache = SemanticCache(encoder=fake_encoder, threshold=0.9)
+    cache.add("fix apex trigger account", "PATCH-1", namespace="openai|gpt-4")
+
+    assert cache.lookup("Fix Apex trigger account", namespace="openai|gpt-4") == "PATCH-1"
+    assert cache.lookup("fix apex trigger account", namespace="anthropic|claude") is None
+    assert cache.lookup("lwc flow contact", namespace="openai|gpt-4") is None
+
+
+def test_persistence():
+    """Test that entries survive a reload from disk."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_dir = Path(tmpdir) / "semantic"
+        SemanticCache(cache_dir, encoder=fake_encoder).add("fix flow", "PATCH-2", namespace="ns")
+
+        reloaded = SemanticCache(cache_dir, encoder=fake_encoder)
+
+        assert len(reloaded) == 1
+        assert reloaded.lookup("fix flow", namespace="ns") == "PATCH-2"
+
+
+def test_failed_provider_call_is_not_added():
+    """Test that a provider failure adds nothing that near-duplicate tasks could be served."""
+    cache = SemanticCache(encoder=fake_encoder, threshold=0.9)
+    agent = AIAgent(provider="huggingface", model="test-model", api_key="hf-test", semantic_cache=cache)
+    agent._rate_limiter = TokenBucket(rate=1000, capacity=1000)
+    agent.session.post = MagicMock(return_value=MagicMock(status_code=500, headers={}, text="boom"))
+
+    with pytest.raises(AIAgentError):
+        agent.generate_solution("fix apex trigger account")
+    assert len(cache) == 0
+    assert cache.lookup("Fix Apex trigger account", namespace="huggingface|test-model") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
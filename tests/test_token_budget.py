@@ -0,0 +1,41 @@
+"""
+Tests for prompt token budgeting.
+"""
+import pytest
+from sfbench.utils.ai_agent import AIAgent
+from sfbench.utils.token_budget import allocate_budget, count_tokens, truncate_to_tokens
+
+
+def test_allocate_budget_redistributes_unused_share():
+    """Test that small items keep their size and large ones split the rest."""
+    assert allocate_budget([10, 500, 1000], 610) == [10, 300, 300]
+    assert allocate_budget([10, 20], 100) == [10, 20]
+    assert allocate_budget([50, 50], 0) == [0, 0]
+
+
+def test_truncate_to_tokens_respects_budget():
+    """Test that truncation keeps a prefix within the token budget."""
+    text = "public class Foo { }\n" * 200
+    truncated = truncate_to_tokens(text, 50)
+
+    assert text.startswith(truncated)
+    assert count_tokens(truncated) <= 50
+    assert truncate_to_tokens("short", 50) == "short"
+
+
+def test_build_prompt_keeps_small_files_whole():
+    """Test that a large file is truncated without cutting small ones."""
+    agent = AIAgent(provider="local", model="test-model")
+    agent._file_token_budget = 200
+    small = "public class Small {}"
+    large = "x" * 10000
+
+    prompt = agent._build_prompt("Fix it", None, {"Small.cls": small, "Large.cls": large})
+
+    assert small in prompt
+    assert large not in prompt
+    assert "--- Large.cls ---" in prompt
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])